@@ -7,13 +7,28 @@ from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 
+from .cache import ResponseCache
+from .database import engine_options
+from .events import EventHub
+from .logs import init_logging
+from .metrics import Metrics
+from .replicas import ReplicaRouter, RoutingSession
+from .sql_audit import init_sql_audit
+from .security import PasswordHasher, PasswordHasherBusy
+
 # Chargement des variables d'environnement
 load_dotenv()
 
 # Initialisation des extensions
-db = SQLAlchemy()
+# Session qui lit sur un réplica dans les requêtes GET (voir replicas.py)
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 jwt = JWTManager()
+passwords = PasswordHasher()
+response_cache = ResponseCache()
+event_hub = EventHub()
+metrics = Metrics()
+replicas = ReplicaRouter()
 
 
 def create_app():
@@ -24,10 +39,9 @@ def create_app():
     app.config["JWT_SECRET_KEY"] = os.environ.get("JWT_SECRET_KEY",
                                                   "jwt_dev_key")
 
-    # Configuration des logs
-    import logging
-    logging.basicConfig(level=logging.INFO)
-    app.logger.setLevel(logging.INFO)
+    # Configuration des logs (LOG_LEVEL, LOG_FORMAT, LOG_SAMPLE_RATE,
+    # LOG_SAMPLING, LOG_QUEUE_SIZE)
+    init_logging(app)
 
     # Mode de développement sans base de données
     if os.environ.get("FLASK_ENV") == "development_no_db":
@@ -39,6 +53,19 @@ def create_app():
         )
         app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+        # Pool de connexions (DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT,
+        # DB_POOL_RECYCLE, DB_POOL_PRE_PING, DB_CONNECT_TIMEOUT,
+        # DB_READ_TIMEOUT, DB_WRITE_TIMEOUT)
+        app.config.setdefault(
+            "SQLALCHEMY_ENGINE_OPTIONS",
+            engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+        )
+
+        # Réplicas en lecture pour les requêtes GET (DATABASE_REPLICA_URLS,
+        # DATABASE_REPLICA_STICKY_SECONDS, DATABASE_REPLICA_STICKY_BACKEND,
+        # DATABASE_REPLICA_REDIS_URL), déclarés avant la création des moteurs
+        replicas.init_app(app)
+
         # Initialisation de la base de données
         db.init_app(app)
         migrate.init_app(app, db)
@@ -46,20 +73,47 @@ def create_app():
     # Initialisation de JWT et CORS
     jwt.init_app(app)
 
+    # Pool de hachage des mots de passe (BCRYPT_ROUNDS, BCRYPT_WORKERS,
+    # BCRYPT_QUEUE_SIZE, BCRYPT_TIMEOUT)
+    passwords.init_app(app)
+
+    # Cache des réponses GET (RESPONSE_CACHE_BACKEND, RESPONSE_CACHE_SIZE,
+    # RESPONSE_CACHE_TTL, RESPONSE_CACHE_REDIS_URL)
+    response_cache.init_app(app)
+
+    # Flux d'événements en direct (EVENT_STREAM_BACKEND, EVENT_STREAM_BUFFER,
+    # EVENT_STREAM_HEARTBEAT, EVENT_STREAM_REDIS_URL)
+    event_hub.init_app(app)
+
+    # Métriques Prometheus sur /metrics (METRICS_ENABLED,
+    # PROMETHEUS_MULTIPROC_DIR avec plusieurs workers)
+    metrics.init_app(app)
+
+    # Budget de requêtes SQL et détection des N+1 en test (SQL_AUDIT,
+    # SQL_AUDIT_N1_THRESHOLD)
+    init_sql_audit(app)
+
+    @app.errorhandler(PasswordHasherBusy)
+    def password_hasher_busy(error):
+        app.logger.warning("Pool de hachage des mots de passe saturé")
+        return {"error": "Serveur occupé, réessayez dans un instant"}, 503, {
+            "Retry-After": "1"
+        }
+
     # Gestionnaires d'erreurs JWT
     @jwt.expired_token_loader
     def expired_token_callback(jwt_header, jwt_payload):
-        app.logger.error(f"Token expiré - Header: {jwt_header}, Payload: {jwt_payload}")
+        app.logger.info("Token expiré - utilisateur %s", jwt_payload.get("sub"))
         return {"error": "Le token a expiré"}, 401
 
     @jwt.invalid_token_loader
     def invalid_token_callback(error):
-        app.logger.error(f"Token invalide - Erreur: {error}")
+        app.logger.info("Token invalide - Erreur: %s", error)
         return {"error": "Token invalide"}, 401
 
     @jwt.unauthorized_loader
     def missing_token_callback(error):
-        app.logger.error(f"Token manquant - Erreur: {error}")
+        app.logger.info("Token manquant - Erreur: %s", error)
         return {"error": "Token manquant"}, 401
 
     CORS(app, resources={
@@ -80,7 +134,9 @@ def create_app():
                 matches,
                 tournaments,
                 users,
-                rankings
+                rankings,
+                registrations,
+                search
             )
 
             # Enregistrement des blueprints
@@ -96,6 +152,8 @@ def create_app():
                 url_prefix="/api/characters"
             )
             app.register_blueprint(rankings.bp, url_prefix="/api/rankings")
+            app.register_blueprint(registrations.bp, url_prefix="/api")
+            app.register_blueprint(search.bp, url_prefix="/api/search")
 
             app.logger.info("All blueprints registered successfully")
         except ImportError as e:
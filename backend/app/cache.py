@@ -0,0 +1,251 @@
+"""Cache des réponses GET et requêtes conditionnelles (ETag / 304).
+
+Une réponse est mise en cache sous une clé (portée, version, route,
+paramètres). La portée est par exemple le tournoi concerné : chaque route
+d'écriture incrémente sa version avec `response_cache.invalidate`, ce qui
+rend obsolètes d'un coup toutes les réponses de ce tournoi.
+
+L'ETag combine la version et une empreinte du contenu. Un client qui
+renvoie l'ETag de l'entrée en cache reçoit un 304 sans requête SQL ni
+sérialisation.
+
+Deux backends (RESPONSE_CACHE_BACKEND) :
+- "memory" (défaut) : LRU + TTL dans le processus. Chaque worker gunicorn
+  a son propre cache, une invalidation ne touche que le worker qui a
+  traité l'écriture ; les autres se mettent à jour après
+  RESPONSE_CACHE_TTL secondes.
+- "redis" : cache et versions partagés entre workers via un Redis local
+  (RESPONSE_CACHE_REDIS_URL, paquet `redis` requis). L'éviction LRU est
+  celle de Redis (maxmemory-policy allkeys-lru).
+
+Avec des réplicas en lecture (app/replicas.py), une réponse calculée juste
+après une écriture pourrait venir d'un réplica en retard et rester en cache
+sous la nouvelle version. Pendant DATABASE_REPLICA_STICKY_SECONDS après
+chaque invalidation d'une portée, ses réponses sont donc calculées sur la
+base principale.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, make_response, request
+
+from .replicas import on_primary_after_write, read_from_primary
+
+
+class MemoryBackend:
+    """LRU borné avec expiration, propre au processus"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        # Jeton de démarrage : les versions repartent de zéro à chaque
+        # lancement, il évite de confondre deux "version 1"
+        self.epoch = uuid.uuid4().hex[:8]
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._fresh = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def version(self, scope):
+        return self._versions.get(scope, 0)
+
+    def bump(self, scope, fresh_seconds=0):
+        with self._lock:
+            self._versions[scope] = self._versions.get(scope, 0) + 1
+            if fresh_seconds:
+                self._fresh[scope] = time.monotonic() + fresh_seconds
+
+    def fresh(self, scope):
+        """Vrai si la portée vient d'être invalidée (fenêtre des réplicas)"""
+        until = self._fresh.get(scope)
+        if until is None:
+            return False
+        if until <= time.monotonic():
+            self._fresh.pop(scope, None)
+            return False
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+            self._fresh.clear()
+
+
+class RedisBackend:
+    """Cache partagé entre les workers via Redis"""
+
+    PREFIX = "smash:cache:"
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        # Versions conservées dans Redis : un redémarrage de l'API ne les
+        # remet pas à zéro, l'epoch reste donc fixe
+        self.epoch = "r"
+
+    def get(self, key):
+        raw = self.client.get(self.PREFIX + key)
+        if raw is None:
+            return None
+        header, body = raw.split(b"\n", 1)
+        etag, mimetype = json.loads(header)
+        return etag, mimetype, body
+
+    def set(self, key, value, ttl):
+        etag, mimetype, body = value
+        header = json.dumps([etag, mimetype]).encode("utf-8")
+        self.client.set(self.PREFIX + key, header + b"\n" + body, ex=ttl)
+
+    def version(self, scope):
+        return int(self.client.get(self.PREFIX + "version:" + scope) or 0)
+
+    def bump(self, scope, fresh_seconds=0):
+        pipeline = self.client.pipeline(transaction=False)
+        pipeline.incr(self.PREFIX + "version:" + scope)
+        if fresh_seconds:
+            pipeline.set(
+                self.PREFIX + "fresh:" + scope, 1,
+                px=max(int(fresh_seconds * 1000), 1)
+            )
+        pipeline.execute()
+
+    def fresh(self, scope):
+        return bool(self.client.exists(self.PREFIX + "fresh:" + scope))
+
+    def clear(self):
+        keys = list(self.client.scan_iter(self.PREFIX + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+
+class ResponseCache:
+    """Extension Flask : cache de réponses invalidé par version"""
+
+    def __init__(self, app=None):
+        self.backend = MemoryBackend()
+        self.ttl = 30
+        self.enabled = True
+        self.fresh_seconds = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault(
+            "RESPONSE_CACHE_BACKEND",
+            os.environ.get("RESPONSE_CACHE_BACKEND", "memory")
+        )
+        app.config.setdefault(
+            "RESPONSE_CACHE_SIZE",
+            int(os.environ.get("RESPONSE_CACHE_SIZE", 1024))
+        )
+        app.config.setdefault(
+            "RESPONSE_CACHE_TTL",
+            int(os.environ.get("RESPONSE_CACHE_TTL", 30))
+        )
+        app.config.setdefault(
+            "RESPONSE_CACHE_REDIS_URL",
+            os.environ.get(
+                "RESPONSE_CACHE_REDIS_URL", "redis://localhost:6379/0"
+            )
+        )
+
+        backend = app.config["RESPONSE_CACHE_BACKEND"]
+        if backend == "redis":
+            self.backend = RedisBackend(app.config["RESPONSE_CACHE_REDIS_URL"])
+        elif backend == "memory":
+            self.backend = MemoryBackend(app.config["RESPONSE_CACHE_SIZE"])
+        elif backend == "none":
+            self.enabled = False
+        else:
+            raise ValueError(f"RESPONSE_CACHE_BACKEND inconnu : {backend}")
+        self.ttl = app.config["RESPONSE_CACHE_TTL"]
+        # Déclarés par replicas.init_app, appelé avant
+        if app.config.get("DATABASE_REPLICA_URLS"):
+            self.fresh_seconds = app.config["DATABASE_REPLICA_STICKY_SECONDS"]
+
+    def invalidate(self, scope, ident=None):
+        """Rend obsolètes les réponses d'une portée (un tournoi, ...)"""
+        if self.enabled:
+            self.backend.bump(_scope_key(scope, ident), self.fresh_seconds)
+
+    def cached(self, scope, ident_arg=None):
+        """Met en cache une vue GET. `ident_arg` est le paramètre d'URL qui
+        identifie la portée (tournament_id pour un tournoi)"""
+        def decorator(view):
+            @wraps(view)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return view(*args, **kwargs)
+                return self._respond(
+                    _scope_key(scope, kwargs.get(ident_arg)),
+                    view, args, kwargs
+                )
+            return wrapper
+        return decorator
+
+    def _respond(self, scope, view, args, kwargs):
+        version = f"{self.backend.epoch}.{self.backend.version(scope)}"
+        key = "|".join((
+            scope, version, request.path,
+            # Paramètres triés : ?a=1&b=2 et ?b=2&a=1 partagent l'entrée
+            "&".join(
+                f"{name}={value}"
+                for name, value in sorted(request.args.items(multi=True))
+            )
+        ))
+
+        # Juste après ses propres écritures, un utilisateur relit la base
+        # principale : l'entrée a pu être calculée sur un réplica en retard
+        entry = None if on_primary_after_write() else self.backend.get(key)
+        if entry is None:
+            if self.fresh_seconds and self.backend.fresh(scope):
+                # Portée tout juste invalidée : l'entrée est calculée sur
+                # la base principale, un réplica peut être en retard
+                read_from_primary()
+            response = view(*args, **kwargs)
+            response = make_response(response)
+            if response.status_code != 200:
+                return response
+
+            body = response.get_data()
+            digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+            entry = (f"{version}-{digest}", response.mimetype, body)
+            self.backend.set(key, entry, self.ttl)
+
+        etag, mimetype, body = entry
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype=mimetype)
+        response.set_etag(etag)
+        # Réponses authentifiées : le client revalide à chaque fois
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+
+
+def _scope_key(scope, ident):
+    return scope if ident is None else f"{scope}:{ident}"
@@ -0,0 +1,144 @@
+"""Catalogue des personnages, chargé une fois et servi depuis la mémoire.
+
+Le roster ne change qu'à l'ajout de combattants : il est lu en une requête
+et gardé dans un instantané immuable, indexé par id et par jeu, avec le
+JSON déjà sérialisé et une empreinte du contenu qui sert de version.
+
+Sous gunicorn, l'instantané est construit au démarrage de chaque worker
+(`preload_catalog`, appelé par gunicorn.conf.py) : la première requête ne
+paie pas la lecture.
+
+Un commit qui modifie un personnage invalide l'instantané de ce processus,
+le suivant est construit à la demande et remplace l'ancien d'un bloc : une
+requête en cours garde l'instantané qu'elle a lu. Les autres processus
+(workers gunicorn, scripts) relisent la table toutes les
+CHARACTER_CATALOG_REFRESH secondes et ne changent d'instantané que si le
+contenu a changé.
+"""
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from types import MappingProxyType
+
+from sqlalchemy import event
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from app.models import Character
+
+logger = logging.getLogger(__name__)
+
+REFRESH_INTERVAL = int(os.environ.get("CHARACTER_CATALOG_REFRESH", 300))
+
+_PENDING = "character_catalog_changed"
+
+_lock = threading.Lock()
+_catalog = None
+
+
+def _dumps(value):
+    return json.dumps(
+        value, ensure_ascii=False, separators=(",", ":"), sort_keys=True
+    ).encode("utf-8")
+
+
+class CharacterCatalog:
+    """Instantané immuable du roster"""
+
+    __slots__ = (
+        "version", "by_id", "by_game", "json", "game_json", "loaded_at"
+    )
+
+    def __init__(self, characters):
+        characters = sorted(
+            (character.to_dict() for character in characters),
+            key=lambda character: character["id"]
+        )
+        self.json = _dumps(characters)
+        self.version = hashlib.sha256(self.json).hexdigest()[:16]
+        self.by_id = MappingProxyType({
+            character["id"]: character for character in characters
+        })
+
+        games = {}
+        for character in characters:
+            games.setdefault(character["game"], []).append(character)
+        self.by_game = MappingProxyType({
+            game: tuple(items) for game, items in games.items()
+        })
+        self.game_json = MappingProxyType({
+            game: _dumps(items) for game, items in games.items()
+        })
+        self.loaded_at = time.monotonic()
+
+    def character_json(self, character_id):
+        character = self.by_id.get(character_id)
+        return None if character is None else _dumps(character)
+
+
+def load_catalog():
+    """Relit la table et remplace l'instantané si le contenu a changé"""
+    global _catalog
+    catalog = CharacterCatalog(Character.query.all())
+    with _lock:
+        if _catalog is not None and _catalog.version == catalog.version:
+            # Même contenu : on garde l'objet, seule la date avance
+            _catalog.loaded_at = catalog.loaded_at
+        else:
+            _catalog = catalog
+        return _catalog
+
+
+def get_catalog():
+    """Instantané courant, chargé au premier appel"""
+    catalog = _catalog
+    if (
+        catalog is None
+        or catalog.loaded_at + REFRESH_INTERVAL <= time.monotonic()
+    ):
+        catalog = load_catalog()
+    return catalog
+
+
+def preload_catalog(app):
+    """Construit l'instantané avant la première requête. Renvoie None si
+    la table n'est pas encore lisible (base pas encore migrée) : il sera
+    alors chargé à la demande."""
+    with app.app_context():
+        from app import db
+        try:
+            return load_catalog()
+        except SQLAlchemyError as e:
+            logger.warning("Catalogue des personnages non préchargé : %s",
+                           e.__class__.__name__)
+            return None
+        finally:
+            db.session.remove()
+
+
+def invalidate_catalog():
+    global _catalog
+    with _lock:
+        _catalog = None
+
+
+@event.listens_for(Session, "after_flush")
+def _characters_flushed(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, Character):
+            session.info[_PENDING] = True
+            return
+
+
+@event.listens_for(Session, "after_commit")
+def _reload_committed(session):
+    if session.info.pop(_PENDING, False):
+        invalidate_catalog()
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session, previous_transaction):
+    session.info.pop(_PENDING, None)
@@ -0,0 +1,101 @@
+"""Options du pool de connexions et préchauffage des workers.
+
+Options des moteurs SQLAlchemy (principal et réplicas), lues dans
+l'environnement :
+- DB_POOL_SIZE : connexions gardées ouvertes par processus (10). Sous
+  gunicorn, vaut par défaut le nombre de threads du worker
+  (gunicorn.conf.py) : chaque thread tient au plus une connexion par base ;
+- DB_MAX_OVERFLOW : connexions supplémentaires en pointe, fermées ensuite
+  (10) ;
+- DB_POOL_TIMEOUT : attente maximale d'une connexion libre, en secondes
+  (30) ;
+- DB_POOL_RECYCLE : âge maximal d'une connexion, en secondes (1800). Doit
+  rester sous le wait_timeout de MySQL, sinon le serveur ferme les
+  connexions inactives avant le pool ;
+- DB_POOL_PRE_PING : vérifie chaque connexion à l'emprunt et la remplace si
+  elle est coupée (true) ;
+- DB_CONNECT_TIMEOUT, DB_READ_TIMEOUT, DB_WRITE_TIMEOUT : délais du pilote
+  MySQL en secondes (10, aucun, aucun) ;
+- DB_SQLITE_BUSY_TIMEOUT : attente d'un verrou d'écriture SQLite, en
+  secondes (5, la valeur du pilote), avant l'erreur « database is locked » ;
+- DB_POOL_WARMUP : connexions ouvertes au démarrage de chaque worker
+  (DB_POOL_SIZE), pour que les premières requêtes n'en paient pas
+  l'ouverture.
+
+SQLite en mémoire n'a pas de pool à dimensionner : seul pre-ping
+s'applique.
+"""
+import os
+
+from sqlalchemy.engine import make_url
+
+from .metrics import pool_stats
+
+
+def _flag(name, default):
+    return os.environ.get(name, default).lower() in ("1", "true", "yes")
+
+
+def _seconds(name, default=None):
+    value = os.environ.get(name, default)
+    return int(value) if value not in (None, "") else None
+
+
+def engine_options(url):
+    """Options de `create_engine` pour une URL de base de données"""
+    url = make_url(url)
+    options = {"pool_pre_ping": _flag("DB_POOL_PRE_PING", "true")}
+    if url.get_backend_name() == "sqlite" and url.database in (
+        None, "", ":memory:"
+    ):
+        return options
+
+    options.update(
+        pool_size=int(os.environ.get("DB_POOL_SIZE", 10)),
+        max_overflow=int(os.environ.get("DB_MAX_OVERFLOW", 10)),
+        pool_timeout=_seconds("DB_POOL_TIMEOUT", "30"),
+        pool_recycle=_seconds("DB_POOL_RECYCLE", "1800"),
+    )
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {
+            "timeout": _seconds("DB_SQLITE_BUSY_TIMEOUT", "5")
+        }
+    elif url.get_backend_name() == "mysql":
+        connect_args = {
+            "connect_timeout": _seconds("DB_CONNECT_TIMEOUT", "10")
+        }
+        for name, key in (("DB_READ_TIMEOUT", "read_timeout"),
+                          ("DB_WRITE_TIMEOUT", "write_timeout")):
+            if _seconds(name) is not None:
+                connect_args[key] = _seconds(name)
+        options["connect_args"] = connect_args
+    return options
+
+
+def warm_up(app):
+    """Ouvre les connexions du pool de chaque moteur avant la première
+    requête. Les connexions héritées du processus parent (gunicorn
+    --preload) sont abandonnées sans être fermées : elles lui
+    appartiennent."""
+    if "sqlalchemy" not in app.extensions:
+        return {}
+    warmed = {}
+    with app.app_context():
+        engines = app.extensions["sqlalchemy"].engines
+        for key, engine in engines.items():
+            engine.dispose(close=False)
+            stats = pool_stats(engine)
+            if stats is None:
+                continue
+            count = int(os.environ.get("DB_POOL_WARMUP", stats["size"]))
+            connections = []
+            try:
+                for _ in range(min(count, stats["size"])):
+                    connection = engine.connect()
+                    connection.exec_driver_sql("SELECT 1")
+                    connections.append(connection)
+            finally:
+                for connection in connections:
+                    connection.close()
+            warmed[key or "primary"] = len(connections)
+    return warmed
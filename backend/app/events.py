@@ -0,0 +1,440 @@
+"""Flux d'événements en direct des tournois (Server-Sent Events).
+
+Les changements validés (matchs, inscriptions, classements, tournoi) sont
+publiés en événements compacts sur le canal du tournoi, après le commit :
+une transaction annulée ne publie rien. Chaque événement est sérialisé une
+seule fois et ajouté au tampon circulaire du canal ; tous les abonnés du
+tournoi lisent ce même tampon, sans requête SQL ni copie par abonné.
+
+Les événements ont un id croissant par tournoi (`<epoch>.<numéro>`). Un
+client qui se reconnecte avec l'en-tête Last-Event-ID reçoit ce qu'il a
+manqué tant que c'est encore dans le tampon (EVENT_STREAM_BUFFER derniers
+événements) ; sinon il reçoit un événement `reset` et doit relire la page.
+
+Les matchs et le tournoi sont suivis par les événements de session
+SQLAlchemy. Les écritures groupées (inscriptions, classements, bracket)
+se font en SQL direct et échappent à ce suivi : les services les signalent
+avec `notify` et `notify_registrations`.
+
+Chaque abonné occupe un thread du worker gthread pendant toute sa
+connexion. EVENT_STREAM_MAX_CLIENTS (32 par défaut, la moitié des 64
+threads du Dockerfile) limite les flux ouverts par worker ; au-delà, la
+route répond 503 avec Retry-After et les autres routes de l'API gardent
+leurs threads. Pour servir des milliers de spectateurs, multiplier les
+workers (--workers) avec le backend "redis", ou donner au flux ses propres
+workers derrière le proxy. Le tampon d'un tournoi est libéré quand son
+dernier abonné du worker se déconnecte.
+
+Deux backends (EVENT_STREAM_BACKEND) :
+- "memory" (défaut) : canaux propres au processus. Avec plusieurs workers
+  gunicorn, un abonné ne voit que les écritures de son worker.
+- "redis" : les événements sont numérotés et diffusés par Redis
+  (EVENT_STREAM_REDIS_URL, paquet `redis` requis) ; chaque worker les relaie
+  à ses propres abonnés.
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_PENDING = "event_hub_pending"
+
+MATCH_FIELDS = (
+    "id", "round", "bracket_position", "player1_id", "player2_id",
+    "winner_id", "loser_id", "score", "status"
+)
+TOURNAMENT_FIELDS = ("id", "name", "status", "max_participants")
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"),
+                      default=str)
+
+
+def _snapshot(obj, fields):
+    # Valeurs déjà en mémoire : pas de rechargement pendant le flush
+    values = inspect(obj).dict
+    return {field: values.get(field) for field in fields}
+
+
+class Channel:
+    """Tampon des derniers événements d'un tournoi, partagé par ses
+    abonnés"""
+
+    def __init__(self, size):
+        self.frames = deque(maxlen=size)
+        self.seq = 0
+        self.listeners = 0
+        self.condition = threading.Condition()
+
+    def append(self, seq, frame):
+        with self.condition:
+            if seq <= self.seq:
+                return
+            self.seq = seq
+            self.frames.append((seq, frame))
+            self.condition.notify_all()
+
+    def read(self, cursor, timeout):
+        """(numéro, trame) publiés après `cursor`, en attendant au plus
+        `timeout` secondes. None si des événements manquants ne sont plus
+        dans le tampon."""
+        with self.condition:
+            if self.seq <= cursor:
+                self.condition.wait(timeout)
+            if not self.frames or self.frames[-1][0] <= cursor:
+                return []
+            if cursor < self.frames[0][0] - 1:
+                return None
+            return [(seq, frame) for seq, frame in self.frames if seq > cursor]
+
+
+class MemoryBackend:
+    """Numérotation et diffusion dans le processus"""
+
+    def __init__(self, hub):
+        self.hub = hub
+        self.epoch = uuid.uuid4().hex[:8]
+        # Dernier numéro par tournoi, conservé quand le canal est libéré
+        self._seqs = {}
+        self._lock = threading.Lock()
+
+    def publish(self, events):
+        with self._lock:
+            for tournament_id, type, data in events:
+                seq = self._seqs.get(tournament_id, 0) + 1
+                self._seqs[tournament_id] = seq
+                self.hub.deliver(tournament_id, seq, type, data)
+
+    def current(self, tournament_id):
+        return self._seqs.get(tournament_id, 0)
+
+    def start(self):
+        pass
+
+
+class RedisBackend:
+    """Numérotation et diffusion partagées entre les workers via Redis"""
+
+    PREFIX = "smash:events:"
+
+    # Numéro et diffusion dans le même script : les workers reçoivent les
+    # événements d'un tournoi dans l'ordre de leurs numéros
+    PUBLISH = """
+    local seq = redis.call('INCR', KEYS[1])
+    redis.call('PUBLISH', KEYS[2], seq .. '\\n' .. ARGV[1])
+    return seq
+    """
+
+    def __init__(self, hub, url):
+        import redis
+        self.hub = hub
+        self.client = redis.Redis.from_url(url)
+        self.epoch = "r"
+        self._publish = self.client.register_script(self.PUBLISH)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, events):
+        pipeline = self.client.pipeline(transaction=False)
+        for tournament_id, type, data in events:
+            self._publish(
+                keys=[
+                    f"{self.PREFIX}seq:{tournament_id}",
+                    f"{self.PREFIX}{tournament_id}"
+                ],
+                args=[f"{type}\n{data}"],
+                client=pipeline
+            )
+        pipeline.execute()
+
+    def current(self, tournament_id):
+        return int(
+            self.client.get(f"{self.PREFIX}seq:{tournament_id}") or 0
+        )
+
+    def start(self):
+        # Démarré au premier abonné, après le fork des workers
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="event-hub-redis", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.PREFIX + "*")
+                for message in pubsub.listen():
+                    tournament_id = int(
+                        message["channel"].decode()[len(self.PREFIX):]
+                    )
+                    seq, type, data = message["data"].decode().split("\n", 2)
+                    self.hub.deliver(tournament_id, int(seq), type, data)
+            except Exception:
+                # Connexion perdue : les abonnés recevront un reset si des
+                # événements ont été manqués
+                time.sleep(1)
+
+
+class EventHub:
+    """Extension Flask : canaux d'événements par tournoi"""
+
+    def __init__(self, app=None):
+        self.backend = None
+        self.buffer_size = 256
+        self.heartbeat = 15
+        self.max_streams = 32
+        self._streams = 0
+        self._channels = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault(
+            "EVENT_STREAM_BACKEND",
+            os.environ.get("EVENT_STREAM_BACKEND", "memory")
+        )
+        app.config.setdefault(
+            "EVENT_STREAM_BUFFER",
+            int(os.environ.get("EVENT_STREAM_BUFFER", 256))
+        )
+        app.config.setdefault(
+            "EVENT_STREAM_HEARTBEAT",
+            int(os.environ.get("EVENT_STREAM_HEARTBEAT", 15))
+        )
+        app.config.setdefault(
+            "EVENT_STREAM_MAX_CLIENTS",
+            int(os.environ.get("EVENT_STREAM_MAX_CLIENTS", 32))
+        )
+        app.config.setdefault(
+            "EVENT_STREAM_REDIS_URL",
+            os.environ.get(
+                "EVENT_STREAM_REDIS_URL", "redis://localhost:6379/0"
+            )
+        )
+
+        backend = app.config["EVENT_STREAM_BACKEND"]
+        if backend == "redis":
+            self.backend = RedisBackend(
+                self, app.config["EVENT_STREAM_REDIS_URL"]
+            )
+        elif backend == "memory":
+            self.backend = MemoryBackend(self)
+        elif backend == "none":
+            self.backend = None
+        else:
+            raise ValueError(f"EVENT_STREAM_BACKEND inconnu : {backend}")
+        self.buffer_size = app.config["EVENT_STREAM_BUFFER"]
+        self.heartbeat = app.config["EVENT_STREAM_HEARTBEAT"]
+        self.max_streams = app.config["EVENT_STREAM_MAX_CLIENTS"]
+
+        for name, listener in (
+            ("after_flush", self._after_flush),
+            ("after_commit", self._after_commit),
+            ("after_soft_rollback", self._after_soft_rollback),
+            ("after_transaction_end", self._after_transaction_end),
+        ):
+            if not event.contains(Session, name, listener):
+                event.listen(Session, name, listener)
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def _subscribe(self, tournament_id):
+        with self._lock:
+            channel = self._channels.get(tournament_id)
+            if channel is None:
+                channel = self._channels[tournament_id] = Channel(
+                    self.buffer_size
+                )
+            channel.listeners += 1
+        return channel
+
+    def _unsubscribe(self, tournament_id, channel):
+        # Plus d'abonné dans ce worker : le tampon est libéré
+        with self._lock:
+            channel.listeners -= 1
+            if (channel.listeners == 0 and
+                    self._channels.get(tournament_id) is channel):
+                del self._channels[tournament_id]
+
+    def deliver(self, tournament_id, seq, type, data):
+        """Ajoute un événement numéroté au canal local du tournoi, s'il a
+        des abonnés dans ce worker"""
+        channel = self._channels.get(tournament_id)
+        if channel is None:
+            return
+        frame = (
+            f"id: {self.backend.epoch}.{seq}\n"
+            f"event: {type}\n"
+            f"data: {data}\n\n"
+        ).encode("utf-8")
+        channel.append(seq, frame)
+
+    def acquire_stream(self):
+        """Réserve un flux pour ce worker ; False si la limite
+        EVENT_STREAM_MAX_CLIENTS est atteinte. Chaque réservation est
+        rendue par `release_stream`."""
+        with self._lock:
+            if self.max_streams and self._streams >= self.max_streams:
+                return False
+            self._streams += 1
+            return True
+
+    def release_stream(self):
+        with self._lock:
+            self._streams -= 1
+
+    def publish(self, events):
+        """Publie une liste de (tournoi, type, données)"""
+        if not self.enabled or not events:
+            return
+        try:
+            self.backend.publish([
+                (tournament_id, type, _dumps(data))
+                for tournament_id, type, data in events
+            ])
+        except Exception:
+            # La transaction est déjà validée : un événement perdu ne doit
+            # pas faire échouer la requête
+            logger.exception("Publication des événements impossible")
+
+    # Événements en attente du commit
+
+    def _pending(self, session):
+        return session.info.setdefault(_PENDING, {})
+
+    def notify(self, tournament_id, type, data=None, session=None):
+        """Publie un événement au commit de la transaction en cours. Un même
+        type n'est publié qu'une fois par tournoi et par transaction."""
+        if not self.enabled:
+            return
+        if session is None:
+            from app import db
+            session = db.session
+        self._pending(session)[(tournament_id, type)] = (
+            tournament_id, type, data or {}
+        )
+
+    def notify_registrations(self, tournament_id, status, user_ids,
+                             session=None):
+        """Publie au commit un événement `registrations` regroupant les
+        joueurs passés au même statut"""
+        if not self.enabled:
+            return
+        if session is None:
+            from app import db
+            session = db.session
+        data = self._pending(session).setdefault(
+            (tournament_id, "registrations", status),
+            (tournament_id, "registrations",
+             {"status": status, "user_ids": []})
+        )[2]
+        data["user_ids"].extend(user_ids)
+
+    def _after_flush(self, session, flush_context):
+        if not self.enabled:
+            return
+        from app.models import Match, Tournament
+        pending = None
+        for obj, deleted in [
+            *((obj, False) for obj in session.new),
+            *((obj, False) for obj in session.dirty),
+            *((obj, True) for obj in session.deleted),
+        ]:
+            if isinstance(obj, Match):
+                type, fields, tournament_id = (
+                    "match", MATCH_FIELDS, obj.tournament_id
+                )
+            elif isinstance(obj, Tournament):
+                type, fields, tournament_id = (
+                    "tournament", TOURNAMENT_FIELDS, obj.id
+                )
+            else:
+                continue
+            if not deleted and not session.is_modified(obj):
+                continue
+            data = (
+                {"id": obj.id, "deleted": True} if deleted
+                else _snapshot(obj, fields)
+            )
+            if pending is None:
+                pending = self._pending(session)
+            pending[(tournament_id, type, obj.id)] = (
+                tournament_id, type, data
+            )
+
+    def _after_commit(self, session):
+        pending = session.info.pop(_PENDING, None)
+        if pending:
+            self.publish(list(pending.values()))
+
+    def _after_soft_rollback(self, session, previous_transaction):
+        session.info.pop(_PENDING, None)
+
+    def _after_transaction_end(self, session, transaction):
+        # Transaction terminée sans commit (session.close(), fin de
+        # requête) : ses événements ne doivent pas partir au commit suivant
+        if transaction.parent is None:
+            session.info.pop(_PENDING, None)
+
+    # Abonnés
+
+    def _cursor(self, tournament_id, last_event_id):
+        """Numéro à partir duquel reprendre, None s'il est inconnu"""
+        if not last_event_id:
+            return self.backend.current(tournament_id)
+        epoch, _, seq = last_event_id.partition(".")
+        if epoch != self.backend.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def stream(self, tournament_id, last_event_id=None):
+        """Générateur des trames SSE d'un tournoi, à partir de
+        Last-Event-ID s'il est donné. N'utilise ni la base ni le contexte
+        de l'application."""
+        backend, heartbeat = self.backend, self.heartbeat
+        backend.start()
+        channel = self._subscribe(tournament_id)
+        try:
+            cursor = self._cursor(tournament_id, last_event_id)
+            if (last_event_id and cursor is not None and
+                    cursor < backend.current(tournament_id) and
+                    not channel.read(cursor, 0)):
+                # Événements manqués publiés avant que ce worker ne les
+                # relaie, ou tampon libéré depuis
+                cursor = None
+
+            yield b"retry: 3000\n\n"
+            while True:
+                frames = None
+                if cursor is not None:
+                    frames = channel.read(cursor, heartbeat)
+                if frames is None:
+                    # Reprise impossible : le client relit la page puis
+                    # suit les événements à partir d'ici
+                    cursor = backend.current(tournament_id)
+                    yield (
+                        f"id: {backend.epoch}.{cursor}\n"
+                        "event: reset\ndata: {}\n\n"
+                    ).encode("utf-8")
+                elif frames:
+                    cursor = frames[-1][0]
+                    yield b"".join(frame for _, frame in frames)
+                else:
+                    yield b": ping\n\n"
+        finally:
+            self._unsubscribe(tournament_id, channel)
@@ -0,0 +1,248 @@
+"""Journalisation structurée, échantillonnée et non bloquante.
+
+Les enregistrements passent par une file (QueueHandler) et sont formatés
+puis écrits par un thread dédié : la requête ne paie ni la mise en forme ni
+l'écriture. Si la file est pleine, l'enregistrement est abandonné et compté
+plutôt que de bloquer la requête.
+
+Chaque requête échantillonnée produit un enregistrement d'accès (méthode,
+route, statut, durée, identifiant de requête). Le taux d'échantillonnage
+est réglable par route ; dans une requête non échantillonnée, les messages
+sous WARNING sont ignorés. Les avertissements, les erreurs et les réponses
+5xx sont toujours écrits.
+
+Variables d'environnement :
+- LOG_LEVEL : niveau minimal (INFO) ;
+- LOG_FORMAT : "json" (une ligne JSON par enregistrement) ou "text" ;
+- LOG_SAMPLE_RATE : taux par défaut des requêtes (1.0) ;
+- LOG_SAMPLING : taux par route, par exemple
+  "tournaments.get_tournaments=0.01,matches.get_matches=0.05" ;
+- LOG_QUEUE_SIZE : taille de la file (10000).
+
+Les valeurs d'en-têtes d'authentification (Bearer, Basic) et les JWT sont
+masqués dans les enregistrements qui passent par ce module (journaux de
+l'application). Le journal d'accès de gunicorn a ses propres handlers : il
+est configuré sans chaîne de requête dans gunicorn.conf.py.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+from flask import g, has_request_context, request
+
+REDACTED = "[REDACTED]"
+
+# Valeurs d'en-têtes Authorization ("Bearer <token>", "Basic <...>") et
+# JWT nus, par exemple passés en ?jwt= (trois segments base64url)
+_TOKENS = re.compile(
+    r"((?:Bearer|Basic)\s+)[\w\-.~+/]+=*|eyJ[\w-]+\.[\w-]+\.[\w-]*",
+    re.IGNORECASE
+)
+
+# Attributs standard d'un LogRecord : le reste vient de `extra=`
+_RESERVED = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime", "request_id"
+}
+
+access_logger = logging.getLogger("app.access")
+
+_handler = None
+_listener = None
+_sampling = {}
+_default_rate = 1.0
+
+
+def redact(text):
+    """Masque les tokens d'un texte"""
+    return _TOKENS.sub(lambda m: (m.group(1) or "") + REDACTED, text)
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objet JSON par ligne, avec les champs passés en `extra=`"""
+
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(
+                record.created, timezone.utc
+            ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": redact(record.getMessage()),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = redact(self.formatException(record.exc_info))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Format texte lisible, tokens masqués"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    def format(self, record):
+        return redact(super().format(record))
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler qui abandonne l'enregistrement si la file est pleine"""
+
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Message résolu tout de suite (les arguments peuvent changer
+        # ensuite) ; la mise en forme se fait dans le thread d'écriture
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestFilter(logging.Filter):
+    """Écarte les messages sous WARNING des requêtes non échantillonnées
+    et ajoute l'identifiant de la requête"""
+
+    def filter(self, record):
+        if not has_request_context():
+            return True
+        record.request_id = g.get("request_id")
+        return record.levelno >= logging.WARNING or g.get("log_sampled", True)
+
+
+def parse_sampling(value):
+    """"endpoint=taux,endpoint=taux" -> {endpoint: taux}"""
+    rates = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        endpoint, _, rate = item.partition("=")
+        try:
+            rates[endpoint.strip()] = float(rate)
+        except ValueError:
+            raise ValueError(f"LOG_SAMPLING invalide : {item}")
+    return rates
+
+
+def dropped_records():
+    """Nombre d'enregistrements abandonnés faute de place dans la file"""
+    return _handler.dropped if _handler is not None else 0
+
+
+def _start_listener(formatter, queue_size):
+    global _handler, _listener
+    if _listener is not None:
+        _listener.stop()
+    log_queue = queue.Queue(queue_size)
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(formatter)
+    _handler = NonBlockingQueueHandler(log_queue)
+    _handler.addFilter(RequestFilter())
+    _listener = QueueListener(log_queue, output, respect_handler_level=False)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # Le thread d'écriture n'existe pas dans le processus enfant
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+def _stop_listener():
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
+
+
+atexit.register(_stop_listener)
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def _before_request():
+    g.request_started = time.perf_counter()
+    g.request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    rate = _sampling.get(request.endpoint, _default_rate)
+    g.log_sampled = (
+        access_logger.isEnabledFor(logging.INFO) and
+        (rate >= 1 or random.random() < rate)
+    )
+
+
+def _after_request(response):
+    response.headers.setdefault("X-Request-ID", g.get("request_id", ""))
+    status = response.status_code
+    if not g.get("log_sampled") and status < 500:
+        return response
+    access_logger.log(
+        logging.ERROR if status >= 500 else logging.INFO,
+        "%s %s %s", request.method, request.path, status,
+        extra={
+            "method": request.method,
+            "path": request.path,
+            "endpoint": request.endpoint,
+            "status": status,
+            "duration_ms": round(
+                (time.perf_counter() - g.get("request_started", 0)) * 1000, 2
+            ),
+            "remote_addr": request.remote_addr,
+        }
+    )
+    return response
+
+
+def init_logging(app):
+    """Installe la file de journalisation et l'échantillonnage des requêtes"""
+    global _sampling, _default_rate
+    app.config.setdefault(
+        "LOG_LEVEL", os.environ.get("LOG_LEVEL", "INFO").upper()
+    )
+    app.config.setdefault("LOG_FORMAT", os.environ.get("LOG_FORMAT", "json"))
+    app.config.setdefault(
+        "LOG_SAMPLE_RATE", float(os.environ.get("LOG_SAMPLE_RATE", 1.0))
+    )
+    app.config.setdefault(
+        "LOG_SAMPLING", parse_sampling(os.environ.get("LOG_SAMPLING", ""))
+    )
+    app.config.setdefault(
+        "LOG_QUEUE_SIZE", int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+    )
+
+    log_format = app.config["LOG_FORMAT"]
+    if log_format not in ("json", "text"):
+        raise ValueError(f"LOG_FORMAT inconnu : {log_format}")
+    _start_listener(
+        JsonFormatter() if log_format == "json" else TextFormatter(),
+        app.config["LOG_QUEUE_SIZE"]
+    )
+    _sampling = app.config["LOG_SAMPLING"]
+    _default_rate = app.config["LOG_SAMPLE_RATE"]
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_handler)
+    root.setLevel(app.config["LOG_LEVEL"])
+    app.logger.setLevel(app.config["LOG_LEVEL"])
+
+    app.before_request(_before_request)
+    app.after_request(_after_request)
@@ -0,0 +1,232 @@
+"""Métriques Prometheus, exposées en texte sur GET /metrics.
+
+Collectées par des hooks de requête Flask et des événements SQLAlchemy :
+- requêtes HTTP par blueprint, route, méthode et statut ;
+- latence des requêtes par route (histogramme) ;
+- nombre de requêtes SQL et temps SQL par requête HTTP (histogrammes) ;
+- attente pour obtenir une connexion du pool, état du pool (connexions
+  empruntées, libres, en débordement) et connexions ouvertes ou
+  invalidées (déconnexion détectée par pre-ping ou par une erreur) ;
+- durée des calculs bcrypt (voir `PasswordHasher`).
+
+Avec plusieurs workers gunicorn, chaque processus écrit ses valeurs dans
+le dossier PROMETHEUS_MULTIPROC_DIR (à définir avant le démarrage) et
+/metrics agrège tous les workers. Le dossier est vidé au démarrage du
+maître et les workers arrêtés sont retirés (gunicorn.conf.py). Sans cette
+variable, /metrics ne voit que le processus qui répond.
+
+METRICS_ENABLED=false désactive la collecte et la route. La route n'est pas
+authentifiée : elle est à réserver au réseau interne (proxy).
+"""
+import os
+import time
+
+from flask import Response, g, has_request_context, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (
+    .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+WAIT_BUCKETS = (.0005, .001, .005, .01, .025, .05, .1, .5, 1, 5, 30)
+BCRYPT_BUCKETS = (.01, .05, .1, .25, .5, 1, 2.5, 5, 10)
+
+REQUESTS = Counter(
+    "smash_http_requests_total", "Requêtes HTTP traitées",
+    ["blueprint", "endpoint", "method", "status"]
+)
+LATENCY = Histogram(
+    "smash_http_request_duration_seconds", "Durée des requêtes HTTP",
+    ["blueprint", "endpoint"], buckets=LATENCY_BUCKETS
+)
+SQL_QUERIES = Histogram(
+    "smash_db_queries_per_request", "Requêtes SQL par requête HTTP",
+    ["blueprint", "endpoint"], buckets=QUERY_BUCKETS
+)
+SQL_TIME = Histogram(
+    "smash_db_time_per_request_seconds", "Temps SQL par requête HTTP",
+    ["blueprint", "endpoint"], buckets=LATENCY_BUCKETS
+)
+POOL_WAIT = Histogram(
+    "smash_db_pool_checkout_wait_seconds",
+    "Attente d'une connexion du pool", buckets=WAIT_BUCKETS
+)
+POOL_CONNECTIONS = Gauge(
+    "smash_db_pool_connections", "Connexions du pool par état",
+    ["engine", "state"], multiprocess_mode="livesum"
+)
+POOL_SIZE = Gauge(
+    "smash_db_pool_size", "Taille du pool (hors débordement)",
+    ["engine"], multiprocess_mode="livesum"
+)
+POOL_OPENED = Counter(
+    "smash_db_pool_connects_total", "Connexions ouvertes par le pool",
+    ["engine"]
+)
+POOL_INVALIDATED = Counter(
+    "smash_db_pool_invalidated_total",
+    "Connexions invalidées (déconnexion détectée)", ["engine"]
+)
+BCRYPT_TIME = Histogram(
+    "smash_bcrypt_seconds", "Durée des calculs bcrypt (file comprise)",
+    ["operation"], buckets=BCRYPT_BUCKETS
+)
+
+_QUERY_STARTED = "metrics_query_started"
+
+
+def observe_bcrypt(operation, seconds):
+    BCRYPT_TIME.labels(operation).observe(seconds)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    conn.info[_QUERY_STARTED] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    if has_request_context() and "sql_queries" in g:
+        g.sql_queries += 1
+        g.sql_time += time.perf_counter() - conn.info[_QUERY_STARTED]
+
+
+def pool_stats(engine):
+    """État du pool d'un moteur, None s'il ne tient pas de compteurs
+    (SQLite en mémoire)"""
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return None
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "idle": pool.checkedin(),
+        "overflow": max(pool.overflow(), 0),
+    }
+
+
+def _watch_pool(engine, name):
+    def update(*args, returning=0):
+        stats = pool_stats(engine)
+        if stats is None:
+            return
+        # `checkin` précède le retour de la connexion dans le pool
+        stats["checked_out"] -= returning
+        stats["idle"] += returning
+        POOL_SIZE.labels(name).set(stats.pop("size"))
+        for state, value in stats.items():
+            POOL_CONNECTIONS.labels(name, state).set(value)
+
+    def checkin(*args):
+        update(returning=1)
+
+    def connect(*args):
+        POOL_OPENED.labels(name).inc()
+        update()
+
+    def invalidate(*args):
+        POOL_INVALIDATED.labels(name).inc()
+        update()
+
+    # Événements du moteur : conservés quand dispose() recrée le pool
+    event.listen(engine, "connect", connect)
+    event.listen(engine, "checkout", update)
+    event.listen(engine, "checkin", checkin)
+    event.listen(engine, "invalidate", invalidate)
+    event.listen(engine, "soft_invalidate", invalidate)
+
+
+def instrument_engine(engine, name="primary"):
+    """Compte les requêtes SQL d'un moteur, mesure l'attente du pool et
+    suit son état"""
+    if event.contains(engine, "before_cursor_execute",
+                      _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    _watch_pool(engine, name)
+
+    # Pas d'événement avant l'attente du pool : on chronomètre l'appel
+    # qui emprunte la connexion (le pool est recréé par dispose(), pas le
+    # moteur)
+    raw_connection = engine.raw_connection
+
+    def timed_raw_connection(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return raw_connection(*args, **kwargs)
+        finally:
+            POOL_WAIT.observe(time.perf_counter() - started)
+
+    engine.raw_connection = timed_raw_connection
+
+
+def _labels():
+    return request.blueprint or "", request.endpoint or "unmatched"
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    g.sql_queries = 0
+    g.sql_time = 0.0
+
+
+def _after_request(response):
+    if "metrics_started" not in g:
+        return response
+    blueprint, endpoint = _labels()
+    REQUESTS.labels(
+        blueprint, endpoint, request.method, str(response.status_code)
+    ).inc()
+    LATENCY.labels(blueprint, endpoint).observe(
+        time.perf_counter() - g.metrics_started
+    )
+    SQL_QUERIES.labels(blueprint, endpoint).observe(g.sql_queries)
+    SQL_TIME.labels(blueprint, endpoint).observe(g.sql_time)
+    return response
+
+
+def metrics_view():
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(
+        generate_latest(registry),
+        headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
+
+
+class Metrics:
+    """Extension Flask : hooks de collecte et route /metrics"""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault(
+            "METRICS_ENABLED",
+            os.environ.get("METRICS_ENABLED", "true").lower() == "true"
+        )
+        if not app.config["METRICS_ENABLED"]:
+            return
+        if "sqlalchemy" in app.extensions:
+            with app.app_context():
+                engines = app.extensions["sqlalchemy"].engines
+                for key, engine in engines.items():
+                    instrument_engine(engine, key or "primary")
+        app.before_request(_before_request)
+        app.after_request(_after_request)
+        app.add_url_rule("/metrics", "metrics", metrics_view)
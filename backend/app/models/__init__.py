@@ -3,7 +3,10 @@ from .tournament import Tournament
 from .registration import Registration
 from .match import Match, Bracket
 from .character import Character
+from .character_usage import CharacterUsage
 from .ranking import Ranking
+from .leaderboard import LeaderboardEntry
+from .rating import Rating
 
 __all__ = [
     'User',
@@ -13,5 +16,8 @@ __all__ = [
     'Match',
     'Bracket',
     'Character',
-    'Ranking'
+    'CharacterUsage',
+    'Ranking',
+    'LeaderboardEntry',
+    'Rating'
 ]
@@ -1,4 +1,5 @@
 from app import db
+from app.models.character_usage import CharacterUsage, usage_scope
 
 
 class Character(db.Model):
@@ -35,14 +36,18 @@ class Character(db.Model):
             "image_url": self.image_url,
         }
 
-    def get_usage_stats(self):
-        """Get character usage statistics"""
-        # Pour l'instant, retourner des statistiques fictives
-        # TODO: Implémenter la logique de statistiques réelle
+    def get_usage_stats(self, tournament_id=None, player_id=None):
+        """Get character usage statistics (see app/services/character_usage.py).
+        Raises UsageScopeError when both filters are given"""
+        usage = db.session.get(
+            CharacterUsage, (self.id, *usage_scope(tournament_id, player_id))
+        )
+        if usage is None:
+            return {"total_matches": 0, "wins": 0, "win_rate": 0}
         return {
-            "total_matches": 0,
-            "wins": 0,
-            "win_rate": 0,
+            "total_matches": usage.matches,
+            "wins": usage.wins,
+            "win_rate": round(usage.win_rate * 100, 2),
         }
 
 
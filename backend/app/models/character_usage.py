@@ -0,0 +1,59 @@
+from app import db
+
+# Valeur de tournament_id / player_id pour « tous les tournois / joueurs »
+ALL = 0
+
+
+class UsageScopeError(ValueError):
+    """Niveau de statistiques non tenu par la table"""
+
+
+def usage_scope(tournament_id=None, player_id=None):
+    """Clés (tournament_id, player_id) d'un niveau de statistiques. Le
+    croisement tournoi et joueur n'est pas agrégé : UsageScopeError plutôt
+    que des zéros trompeurs."""
+    if tournament_id and player_id:
+        raise UsageScopeError(
+            'Filtrer par tournament_id ou par player_id, pas les deux'
+        )
+    return tournament_id or ALL, player_id or ALL
+
+
+class CharacterUsage(db.Model):
+    """Utilisation et victoires d'un personnage, tenues à jour à chaque
+    résultat de match. Une ligne par personnage pour l'ensemble des matchs,
+    une par tournoi et une par joueur (l'autre clé valant ALL)."""
+    __tablename__ = "character_usage"
+    __table_args__ = (
+        # Statistiques de tout le roster d'un niveau en une lecture, avec
+        # ou sans filtre sur le jeu
+        db.Index(
+            'ix_character_usage_scope',
+            'tournament_id', 'player_id', 'game', 'matches'
+        ),
+    )
+
+    character_id = db.Column(
+        db.Integer, db.ForeignKey("characters.id"), primary_key=True
+    )
+    tournament_id = db.Column(db.Integer, primary_key=True, default=ALL)
+    player_id = db.Column(db.Integer, primary_key=True, default=ALL)
+    game = db.Column(db.String(50), nullable=False)
+    matches = db.Column(db.Integer, nullable=False, default=0)
+    wins = db.Column(db.Integer, nullable=False, default=0)
+    win_rate = db.Column(db.Float, nullable=False, default=0.0)
+
+    # Relationships
+    character = db.relationship('Character')
+
+    def to_dict(self):
+        """Convert character usage to dictionary"""
+        return {
+            "character_id": self.character_id,
+            "game": self.game,
+            "tournament_id": self.tournament_id or None,
+            "player_id": self.player_id or None,
+            "total_matches": self.matches,
+            "wins": self.wins,
+            "win_rate": round(self.win_rate * 100, 2)
+        }
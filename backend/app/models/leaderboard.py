@@ -0,0 +1,37 @@
+from app import db
+
+
+class LeaderboardEntry(db.Model):
+    """Classement global précalculé, mis à jour avec les classements"""
+    __tablename__ = "leaderboard"
+    __table_args__ = (
+        db.Index('ix_leaderboard_average_rank', 'average_rank', 'user_id'),
+    )
+
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), primary_key=True
+    )
+    tournaments_participated = db.Column(db.Integer, nullable=False)
+    # Double précision : les bornes relues doivent être exactes
+    average_rank = db.Column(db.Float(precision=53), nullable=False)
+    position = db.Column(db.Integer, nullable=False, index=True)
+
+    # Relationships
+    user = db.relationship('User')
+
+    def __init__(
+        self, user_id, tournaments_participated, average_rank, position=0
+    ):
+        self.user_id = user_id
+        self.tournaments_participated = tournaments_participated
+        self.average_rank = average_rank
+        self.position = position
+
+    def to_dict(self):
+        """Convert leaderboard entry to dictionary"""
+        return {
+            "user_id": self.user_id,
+            "tournaments_participated": self.tournaments_participated,
+            "average_rank": self.average_rank,
+            "position": self.position
+        }
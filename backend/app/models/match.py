@@ -3,22 +3,47 @@ from app import db
 
 class Match(db.Model):
     __tablename__ = 'matches'
+    __table_args__ = (
+        # Matchs d'un tournoi filtrés par round et statut
+        db.Index(
+            'ix_matches_tournament_round_status',
+            'tournament_id', 'round', 'status'
+        ),
+        # Matchs suivants d'un bracket (advance_match)
+        db.Index(
+            'ix_matches_tournament_position',
+            'tournament_id', 'bracket_position'
+        ),
+        # Matchs et statistiques d'un joueur : un index par côté de
+        # `player1_id = ? OR player2_id = ?`
+        db.Index('ix_matches_player1_status', 'player1_id', 'status'),
+        db.Index('ix_matches_player2_status', 'player2_id', 'status'),
+        db.Index('ix_matches_winner_status', 'winner_id', 'status'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     tournament_id = db.Column(db.Integer, db.ForeignKey('tournaments.id'), nullable=False)
-    player1_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    player2_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    bracket_id = db.Column(db.Integer, db.ForeignKey('brackets.id'))
+    # Nullables : les matchs des rounds suivants sont créés avant que les joueurs soient connus
+    player1_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    player2_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     winner_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     loser_id = db.Column(db.Integer, db.ForeignKey('users.id'))
     score = db.Column(db.String(50))  # Format: "2-1" ou similaire
     round = db.Column(db.Integer)  # Numéro du round dans le bracket
     bracket_position = db.Column(db.Integer)  # Position dans le bracket
-    status = db.Column(db.String(20), default='pending')  # pending, ongoing, completed
+    # Match (bracket_position) et slot (1 ou 2) où avancent le gagnant et le perdant
+    next_match_position = db.Column(db.Integer)
+    next_match_slot = db.Column(db.Integer)
+    loser_match_position = db.Column(db.Integer)
+    loser_match_slot = db.Column(db.Integer)
+    status = db.Column(db.String(20), default='pending')  # pending, ongoing, completed, bye
     start_time = db.Column(db.DateTime)
     end_time = db.Column(db.DateTime)
 
     # Relations
     tournament = db.relationship('Tournament', back_populates='matches')
+    bracket = db.relationship('Bracket', back_populates='matches')
     player1 = db.relationship('User', foreign_keys=[player1_id], back_populates='matches_as_player1')
     player2 = db.relationship('User', foreign_keys=[player2_id], back_populates='matches_as_player2')
     winner = db.relationship('User', foreign_keys=[winner_id], back_populates='matches_won')
@@ -43,6 +68,7 @@ class Match(db.Model):
         return {
             'id': self.id,
             'tournament_id': self.tournament_id,
+            'bracket_id': self.bracket_id,
             'player1': {
                 'id': self.player1.id,
                 'name': self.player1.name
@@ -62,6 +88,8 @@ class Match(db.Model):
             'score': self.score,
             'round': self.round,
             'bracket_position': self.bracket_position,
+            'next_match_position': self.next_match_position,
+            'loser_match_position': self.loser_match_position,
             'status': self.status,
             'start_time': self.start_time.isoformat() if self.start_time else None,
             'end_time': self.end_time.isoformat() if self.end_time else None
@@ -71,14 +99,15 @@ class Bracket(db.Model):
     __tablename__ = 'brackets'
 
     id = db.Column(db.Integer, primary_key=True)
-    tournament_id = db.Column(db.Integer, db.ForeignKey('tournaments.id'), nullable=False)
-    type = db.Column(db.String(50))  # winners, losers (pour double elimination)
+    tournament_id = db.Column(db.Integer, db.ForeignKey('tournaments.id'), nullable=False, index=True)
+    type = db.Column(db.String(50))  # winners, losers, grand_final, round_robin
     round_count = db.Column(db.Integer)
     current_round = db.Column(db.Integer, default=1)
     status = db.Column(db.String(20), default='preparation')  # preparation, ongoing, completed
 
     # Relations
     tournament = db.relationship('Tournament', back_populates='brackets')
+    matches = db.relationship('Match', back_populates='bracket', lazy=True)
 
     def __init__(self, tournament_id, type, round_count, **kwargs):
         self.tournament_id = tournament_id
@@ -3,6 +3,18 @@ from app import db
 
 class Ranking(db.Model):
     __tablename__ = "rankings"
+    __table_args__ = (
+        db.UniqueConstraint(
+            "tournament_id", "user_id", name="uq_rankings_tournament_user"
+        ),
+        # Classement d'un tournoi et classements d'un joueur, dans l'ordre
+        db.Index("ix_rankings_tournament_rank", "tournament_id", "rank"),
+        db.Index("ix_rankings_user_rank", "user_id", "rank"),
+    )
+
+    # Points attribués par match
+    WIN_POINTS = 3
+    LOSS_POINTS = 1
 
     id = db.Column(db.Integer, primary_key=True)
     tournament_id = db.Column(
@@ -47,9 +59,9 @@ class Ranking(db.Model):
     def calculate_points(self, match_result):
         """Calcule les points en fonction du résultat du match"""
         if match_result == 'win':
-            self.points += 3
+            self.points += self.WIN_POINTS
             self.matches_won += 1
         elif match_result == 'loss':
-            self.points += 1
+            self.points += self.LOSS_POINTS
             self.matches_lost += 1
         self.matches_played += 1
\ No newline at end of file
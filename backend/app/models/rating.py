@@ -0,0 +1,58 @@
+from datetime import datetime
+
+from app import db
+
+
+class Rating(db.Model):
+    """Classement Glicko-2 d'un joueur, toutes compétitions confondues"""
+    __tablename__ = "ratings"
+
+    DEFAULT_RATING = 1500.0
+    DEFAULT_DEVIATION = 350.0
+    DEFAULT_VOLATILITY = 0.06
+
+    user_id = db.Column(
+        db.Integer, db.ForeignKey("users.id"), primary_key=True
+    )
+    rating = db.Column(
+        db.Float, nullable=False, default=DEFAULT_RATING, index=True
+    )
+    rating_deviation = db.Column(
+        db.Float, nullable=False, default=DEFAULT_DEVIATION
+    )
+    volatility = db.Column(
+        db.Float, nullable=False, default=DEFAULT_VOLATILITY
+    )
+    matches_played = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(
+        db.DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow
+    )
+
+    # Relationships
+    user = db.relationship('User')
+
+    def __init__(
+        self, user_id, rating=DEFAULT_RATING,
+        rating_deviation=DEFAULT_DEVIATION,
+        volatility=DEFAULT_VOLATILITY, matches_played=0
+    ):
+        self.user_id = user_id
+        self.rating = rating
+        self.rating_deviation = rating_deviation
+        self.volatility = volatility
+        self.matches_played = matches_played
+
+    def to_dict(self):
+        """Convert rating to dictionary"""
+        return {
+            "user_id": self.user_id,
+            "rating": round(self.rating, 1),
+            "rating_deviation": round(self.rating_deviation, 1),
+            "volatility": self.volatility,
+            "matches_played": self.matches_played,
+            "updated_at": (
+                self.updated_at.isoformat() if self.updated_at else None
+            )
+        }
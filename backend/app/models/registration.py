@@ -4,6 +4,17 @@ from app import db
 
 class Registration(db.Model):
     __tablename__ = 'registrations'
+    __table_args__ = (
+        db.UniqueConstraint(
+            'user_id', 'tournament_id',
+            name='uq_registrations_user_tournament'
+        ),
+        # Tête de la liste d'attente sans parcourir les inscriptions
+        db.Index(
+            'ix_registrations_waitlist',
+            'tournament_id', 'status', 'registration_date', 'id'
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -13,7 +24,7 @@ class Registration(db.Model):
     registration_date = db.Column(
         db.DateTime, nullable=False, default=datetime.utcnow
     )
-    status = db.Column(db.String(20), default='registered')  # registered, cancelled
+    status = db.Column(db.String(20), default='registered')  # registered, confirmed, waiting_list, cancelled
     seed = db.Column(db.Integer)  # Pour le placement dans le bracket
 
     # Relations
@@ -4,6 +4,10 @@ from app import db
 
 class Tournament(db.Model):
     __tablename__ = 'tournaments'
+    __table_args__ = (
+        # Recherche plein texte sous MySQL (voir app/search.py)
+        db.Index('ix_tournaments_name_fulltext', 'name', mysql_prefix='FULLTEXT'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -13,7 +17,7 @@ class Tournament(db.Model):
     registration_deadline = db.Column(db.DateTime, nullable=True)
     max_participants = db.Column(db.Integer)
     current_participants = db.Column(db.Integer, default=0)
-    status = db.Column(db.String(20), default='pending')  # pending, ongoing, completed, cancelled
+    status = db.Column(db.String(20), default='pending', index=True)  # pending, ongoing, completed, cancelled
     format = db.Column(
         db.String(20),
         default='single_elimination'
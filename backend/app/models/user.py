@@ -1,8 +1,8 @@
 from datetime import datetime
 
-import bcrypt
+from sqlalchemy import inspect
 
-from app import db
+from app import db, passwords
 
 # Association table for user-role relationship
 user_role = db.Table(
@@ -45,6 +45,10 @@ user_tournaments = db.Table(
 
 class User(db.Model):
     __tablename__ = "users"
+    __table_args__ = (
+        # Recherche plein texte sous MySQL (voir app/search.py)
+        db.Index("ix_users_name_fulltext", "name", mysql_prefix="FULLTEXT"),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -101,35 +105,20 @@ class User(db.Model):
 
     def set_password(self, password):
         """Hash and store the password"""
-        self.password = bcrypt.hashpw(
-            password.encode("utf-8"),
-            bcrypt.gensalt()
-        ).decode("utf-8")
+        self.password = passwords.hash(password)
 
     def check_password(self, password):
         """Verify the password"""
-        return bcrypt.checkpw(
-            password.encode("utf-8"),
-            self.password.encode("utf-8")
-        )
+        return passwords.verify(password, self.password)
+
+    def password_needs_rehash(self):
+        """Check if the password was hashed with another bcrypt cost"""
+        return passwords.needs_rehash(self.password)
 
     def has_role(self, role_name, tournament_id=None):
-        """Check if user has a specific role"""
-        for role in self.roles:
-            if role.name == role_name:
-                if tournament_id:
-                    assoc = (
-                        db.session.query(user_role)
-                        .filter_by(
-                            user_id=self.id,
-                            role_id=role.id,
-                            tournament_id=tournament_id,
-                        )
-                        .first()
-                    )
-                    return assoc is not None
-                return True
-        return False
+        """Check if user has a specific role (cached, see app/permissions.py)"""
+        from app.permissions import permissions_for
+        return permissions_for(self.id).allows(role_name, tournament_id)
 
     def to_dict(self):
         """Convert user to dictionary"""
@@ -145,9 +134,22 @@ class User(db.Model):
             "country": self.country,
             "state": self.state,
             "is_active": self.is_active,
-            "roles": [role.to_dict() for role in self.roles]
+            "roles": self._roles_dict()
         }
 
+    def _roles_dict(self):
+        # Les listes préchargent les rôles ; sinon le cache des permissions
+        # évite une requête par profil affiché
+        if 'roles' not in inspect(self).unloaded:
+            return [role.to_dict() for role in self.roles]
+
+        from app.permissions import permissions_for, role_catalog
+        catalog = role_catalog()
+        return [
+            catalog[name] for name in sorted(permissions_for(self.id).roles)
+            if name in catalog
+        ]
+
 
 class Role(db.Model):
     __tablename__ = "roles"
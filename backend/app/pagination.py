@@ -0,0 +1,91 @@
+"""Pagination par curseur (keyset).
+
+Alternative optionnelle à `paginate()` : au lieu d'un OFFSET et d'un
+COUNT(*) à chaque page, la page suivante reprend après la dernière clé
+renvoyée, ce qui coûte le même prix quelle que soit la profondeur. Le
+curseur est signé avec la SECRET_KEY et lié à la route qui l'a émis.
+"""
+from flask import current_app, request
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import and_, or_
+
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 100
+
+
+class InvalidCursor(ValueError):
+    """Curseur illisible, falsifié ou émis par une autre route"""
+
+
+def _serializer():
+    return URLSafeSerializer(
+        current_app.config["SECRET_KEY"], salt="pagination-cursor"
+    )
+
+
+def encode_cursor(values):
+    return _serializer().dumps([request.endpoint, list(values)])
+
+
+def decode_cursor(cursor):
+    try:
+        endpoint, values = _serializer().loads(cursor)
+    except (BadSignature, ValueError, TypeError):
+        raise InvalidCursor('Curseur invalide')
+    if endpoint != request.endpoint:
+        raise InvalidCursor('Curseur invalide')
+    return values
+
+
+def cursor_requested(args):
+    """La pagination par curseur est activée par le paramètre `cursor`"""
+    return 'cursor' in args
+
+
+def _after(order_by, values):
+    """Condition "strictement après `values`" pour un tri multi-colonnes"""
+    if len(values) != len(order_by):
+        raise InvalidCursor('Curseur invalide')
+    clauses = []
+    for i, (column, descending) in enumerate(order_by):
+        equal = [c == v for (c, _), v in zip(order_by[:i], values[:i])]
+        step = column < values[i] if descending else column > values[i]
+        clauses.append(and_(*equal, step))
+    return or_(*clauses)
+
+
+def keyset_paginate(query, order_by, args, key=None):
+    """Page suivante d'une requête triée par une clé unique et indexée.
+
+    `order_by` est une liste de (colonne, décroissant). Retourne les
+    éléments de la page et les métadonnées de pagination à renvoyer.
+    """
+    limit = min(max(args.get('limit', DEFAULT_LIMIT, type=int), 1), MAX_LIMIT)
+    if key is None:
+        def key(item):
+            return tuple(getattr(item, column.key) for column, _ in order_by)
+
+    total = None
+    if args.get('count', 'false').lower() == 'true':
+        total = query.order_by(None).count()
+
+    cursor = args.get('cursor')
+    if cursor:
+        query = query.filter(_after(order_by, decode_cursor(cursor)))
+    query = query.order_by(*[
+        column.desc() if descending else column.asc()
+        for column, descending in order_by
+    ])
+
+    # Une ligne de plus indique s'il existe une page suivante
+    items = query.limit(limit + 1).all()
+    has_more = len(items) > limit
+    items = items[:limit]
+
+    meta = {
+        'next_cursor': encode_cursor(key(items[-1])) if has_more else None,
+        'limit': limit
+    }
+    if total is not None:
+        meta['total'] = total
+    return items, meta
@@ -0,0 +1,304 @@
+"""Permissions des utilisateurs : rôles globaux et rôles par tournoi.
+
+Les rôles d'un utilisateur sont lus en une seule requête puis gardés en
+mémoire (LRU de PERMISSION_CACHE_SIZE utilisateurs, PERMISSION_CACHE_TTL
+secondes). Ils sont aussi embarqués dans le
+token JWT à la connexion : tant que le token a moins de
+PERMISSION_CLAIMS_MAX_AGE secondes et qu'aucun changement de rôle n'a été
+vu depuis son émission, une vérification ne fait aucune requête.
+
+Les changements passant par `User.roles` (ou `Role.users`) invalident le
+cache au commit. Une écriture directe dans la table user_role doit appeler
+`invalidate_permissions`. Le cache est propre à chaque processus :
+- avec PERMISSION_REDIS_URL, chaque invalidation est diffusée aux autres
+  workers par Redis (pub/sub) et y prend effet aussitôt ; après une coupure
+  de la connexion, un worker oublie toutes les permissions connues ;
+- sans Redis, un changement n'est visible dans un autre worker qu'au plus
+  tard après PERMISSION_CLAIMS_MAX_AGE (token) ou PERMISSION_CACHE_TTL
+  (cache), soit 15 minutes par défaut.
+"""
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+
+from app import db
+from app.models import Role, User
+from app.models.user import user_role
+
+CACHE_TTL = int(os.environ.get("PERMISSION_CACHE_TTL", 300))
+CACHE_SIZE = int(os.environ.get("PERMISSION_CACHE_SIZE", 1024))
+CLAIMS_MAX_AGE = int(os.environ.get("PERMISSION_CLAIMS_MAX_AGE", 900))
+REDIS_URL = os.environ.get("PERMISSION_REDIS_URL", "")
+REDIS_CHANNEL = "smash:permissions"
+
+logger = logging.getLogger(__name__)
+
+# Clé de session.info : utilisateurs dont les rôles changent au commit
+_PENDING = "permissions_changed"
+_ALL = "*"
+
+_lock = threading.Lock()
+_cache = OrderedDict()
+_roles = None
+# Date du dernier changement de rôle vu par ce processus, par utilisateur,
+# du plus ancien au plus récent ; oubliée après CLAIMS_MAX_AGE, quand les
+# tokens émis avant ne sont plus crus de toute façon
+_changed = OrderedDict()
+_all_changed = 0.0
+_broadcast = None
+
+
+class Permissions:
+    """Rôles d'un utilisateur, globaux et par tournoi"""
+
+    __slots__ = ("roles", "tournaments")
+
+    def __init__(self, roles=(), tournaments=None):
+        # Tous les rôles, qu'ils soient liés à un tournoi ou non
+        self.roles = frozenset(roles)
+        self.tournaments = {
+            int(tournament_id): frozenset(names)
+            for tournament_id, names in (tournaments or {}).items()
+        }
+
+    def allows(self, role_name, tournament_id=None):
+        """Même règle que `User.has_role`"""
+        if tournament_id:
+            return role_name in self.tournaments.get(int(tournament_id), ())
+        return role_name in self.roles
+
+    def to_claims(self):
+        """Forme compacte embarquée dans le token"""
+        claims = {"r": sorted(self.roles)}
+        if self.tournaments:
+            claims["t"] = {
+                str(tournament_id): sorted(names)
+                for tournament_id, names in self.tournaments.items()
+            }
+        return claims
+
+    @classmethod
+    def from_claims(cls, claims):
+        return cls(claims.get("r", ()), claims.get("t"))
+
+
+def _load(user_id):
+    rows = db.session.query(Role.name, user_role.c.tournament_id).join(
+        user_role, user_role.c.role_id == Role.id
+    ).filter(user_role.c.user_id == user_id)
+
+    roles, tournaments = set(), {}
+    for name, tournament_id in rows:
+        roles.add(name)
+        if tournament_id:
+            tournaments.setdefault(tournament_id, set()).add(name)
+    return Permissions(roles, tournaments)
+
+
+def permissions_for(user_id):
+    """Permissions d'un utilisateur, depuis le cache si possible"""
+    _start_broadcast()
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get(user_id)
+        if entry is not None:
+            if entry[0] > now:
+                _cache.move_to_end(user_id)
+                return entry[1]
+            del _cache[user_id]
+
+    loaded_at = time.time()
+    permissions = _load(user_id)
+    with _lock:
+        # Un changement vu pendant la lecture la rend peut-être obsolète :
+        # elle sert à cette vérification mais n'est pas gardée
+        if max(_changed.get(user_id, 0.0), _all_changed) < loaded_at:
+            _cache[user_id] = (now + CACHE_TTL, permissions)
+            while len(_cache) > CACHE_SIZE:
+                _cache.popitem(last=False)
+    return permissions
+
+
+def role_catalog():
+    """Rôles existants indexés par nom, sous forme de dictionnaires"""
+    global _roles
+    roles = _roles
+    if roles is None or roles[0] <= time.monotonic():
+        roles = (
+            time.monotonic() + CACHE_TTL,
+            {role.name: role.to_dict() for role in Role.query}
+        )
+        _roles = roles
+    return roles[1]
+
+
+def invalidate_permissions(user_id=None):
+    """Oublie les permissions d'un utilisateur, ou de tous si `user_id`
+    vaut None. Les tokens émis avant sont ignorés dans ce processus, et
+    dans les autres workers avec PERMISSION_REDIS_URL"""
+    changed_at = time.time()
+    _forget(user_id, changed_at)
+    broadcast = _start_broadcast()
+    if broadcast is not None:
+        try:
+            broadcast.publish(user_id, changed_at)
+        except Exception as error:
+            # Les autres workers se mettront à jour après les délais
+            # d'expiration, comme sans Redis
+            logger.warning("Invalidation des permissions non diffusée : %s",
+                           type(error).__name__)
+
+
+def _forget(user_id, changed_at):
+    global _roles, _all_changed
+    with _lock:
+        if user_id is None:
+            _cache.clear()
+            _changed.clear()
+            _roles = None
+            _all_changed = max(_all_changed, changed_at)
+            return
+        _cache.pop(user_id, None)
+        _changed[user_id] = max(_changed.pop(user_id, 0.0), changed_at)
+        expired = time.time() - CLAIMS_MAX_AGE
+        while _changed and next(iter(_changed.values())) < expired:
+            _changed.popitem(last=False)
+
+
+class _Broadcast:
+    """Diffusion des invalidations entre les workers via Redis"""
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, user_id, changed_at):
+        target = _ALL if user_id is None else user_id
+        self.client.publish(REDIS_CHANNEL, f"{target} {changed_at!r}")
+
+    def start(self):
+        # Démarré à la première vérification, après le fork des workers
+        if self._listener is not None:
+            return
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(
+                    target=self._listen, name="permissions-redis", daemon=True
+                )
+                self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(REDIS_CHANNEL)
+                # Abonné : les invalidations manquées avant (démarrage,
+                # coupure) sont couvertes en oubliant tout
+                _forget(None, time.time())
+                for message in pubsub.listen():
+                    target, changed_at = message["data"].decode().split()
+                    _forget(
+                        None if target == _ALL else int(target),
+                        float(changed_at)
+                    )
+            except Exception:
+                time.sleep(1)
+
+
+def _start_broadcast():
+    global _broadcast
+    if not REDIS_URL:
+        return None
+    if _broadcast is None:
+        with _lock:
+            if _broadcast is None:
+                _broadcast = _Broadcast(REDIS_URL)
+    _broadcast.start()
+    return _broadcast
+
+
+def permission_claims(user_id):
+    """Claims additionnels pour `create_access_token`"""
+    return {"perm": permissions_for(user_id).to_claims()}
+
+
+def current_permissions():
+    """Permissions de l'utilisateur du token de la requête en cours"""
+    _start_broadcast()
+    claims = get_jwt()
+    user_id = int(get_jwt_identity())
+    issued_at = claims.get("iat", 0)
+
+    # Les claims sont fiables s'ils sont récents et postérieurs au dernier
+    # changement connu (iat est arrondi à la seconde, d'où le >)
+    if (
+        "perm" in claims
+        and issued_at + CLAIMS_MAX_AGE > time.time()
+        and issued_at > max(_changed.get(user_id, 0.0), _all_changed)
+    ):
+        return Permissions.from_claims(claims["perm"])
+    return permissions_for(user_id)
+
+
+def has_permission(role_name, tournament_id=None):
+    """Vérifie un rôle de l'utilisateur courant"""
+    return current_permissions().allows(role_name, tournament_id)
+
+
+def can_manage_tournament(tournament):
+    """L'utilisateur courant gère le tournoi : il en est l'organisateur,
+    il est administrateur ou il a le rôle organisateur sur ce tournoi"""
+    if tournament.organizer_id == int(get_jwt_identity()):
+        return True
+    return (
+        has_permission("admin") or
+        has_permission("organisateur", tournament.id)
+    )
+
+
+# Invalidation automatique
+
+def _mark(session, user_id):
+    if session is not None:
+        session.info.setdefault(_PENDING, set()).add(user_id)
+
+
+@event.listens_for(User.roles, "append")
+@event.listens_for(User.roles, "remove")
+def _roles_changed(user, role, initiator):
+    if user.id is not None:
+        _mark(object_session(user), user.id)
+
+
+@event.listens_for(Session, "after_flush")
+def _roles_flushed(session, flush_context):
+    for obj in session.new | session.dirty | session.deleted:
+        if isinstance(obj, Role):
+            _mark(session, _ALL)
+        elif isinstance(obj, User) and obj in session.deleted:
+            _mark(session, obj.id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session):
+    changed = session.info.pop(_PENDING, None)
+    if not changed:
+        return
+    if _ALL in changed:
+        invalidate_permissions()
+    else:
+        for user_id in changed:
+            invalidate_permissions(user_id)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_pending(session, previous_transaction):
+    session.info.pop(_PENDING, None)
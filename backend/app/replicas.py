@@ -0,0 +1,226 @@
+"""Lecture sur des réplicas de la base pour les requêtes GET.
+
+DATABASE_REPLICA_URLS (URL séparées par des virgules) déclare un ou
+plusieurs réplicas en lecture. Sans cette variable, tout passe par
+DATABASE_URL comme avant.
+
+Les vues GET et HEAD lisent sur un réplica tiré au hasard pour la durée de
+la requête. Restent sur la base principale :
+- les écritures (flush, INSERT, UPDATE, DELETE), quelle que soit la vue ;
+- les requêtes POST, PUT et DELETE ;
+- les vues GET marquées `@use_primary` ;
+- les réponses mises en cache juste après une invalidation de leur portée
+  (app/cache.py) ;
+- les requêtes d'un utilisateur qui vient d'écrire : après une écriture
+  réussie, ses lectures vont sur la base principale pendant
+  DATABASE_REPLICA_STICKY_SECONDS secondes (5), le temps que les réplicas
+  rattrapent leur retard. Il relit donc toujours ses propres écritures.
+
+Cette fenêtre est suivie par processus ("memory", défaut) ou dans Redis
+(DATABASE_REPLICA_STICKY_BACKEND="redis", DATABASE_REPLICA_REDIS_URL) :
+avec plusieurs workers gunicorn, seul Redis garantit qu'une lecture
+traitée par un autre worker que l'écriture va aussi sur la base
+principale.
+
+Pour un essai local, une copie du fichier SQLite ou une seconde instance
+MySQL peut servir de réplica.
+"""
+import os
+import random
+import threading
+import time
+
+from flask import current_app, g, has_app_context, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+from flask_sqlalchemy.session import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+from .database import engine_options
+
+READ_METHODS = ("GET", "HEAD")
+WRITE_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+BIND_PREFIX = "replica_"
+
+
+def use_primary(view):
+    """Vue qui lit toujours sur la base principale. À placer juste sous
+    `@bp.route`."""
+    view.use_primary = True
+    return view
+
+
+def _marked_primary(view):
+    while view is not None:
+        if getattr(view, "use_primary", False):
+            return True
+        view = getattr(view, "__wrapped__", None)
+    return False
+
+
+class RoutingSession(Session):
+    """Session qui envoie les lectures d'une requête GET au réplica choisi
+    pour la requête, et tout le reste à la base principale"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and not self._flushing and
+                not isinstance(clause, UpdateBase) and has_app_context()):
+            replica = g.get("db_replica")
+            if replica is not None:
+                return replica
+        return super().get_bind(
+            mapper=mapper, clause=clause, bind=bind, **kwargs
+        )
+
+
+class MemoryBackend:
+    """Dernières écritures par utilisateur, propres au processus"""
+
+    def __init__(self):
+        self._writes = {}
+        self._lock = threading.Lock()
+
+    def mark(self, user_id, seconds):
+        now = time.monotonic()
+        with self._lock:
+            self._writes[user_id] = now + seconds
+            if len(self._writes) > 10000:
+                # Purge des fenêtres expirées
+                self._writes = {
+                    key: until for key, until in self._writes.items()
+                    if until > now
+                }
+
+    def recent(self, user_id):
+        return self._writes.get(user_id, 0) > time.monotonic()
+
+
+class RedisBackend:
+    """Dernières écritures partagées entre les workers via Redis"""
+
+    PREFIX = "smash:replica:sticky:"
+
+    def __init__(self, url):
+        import redis
+        self.client = redis.Redis.from_url(url)
+
+    def mark(self, user_id, seconds):
+        self.client.set(
+            f"{self.PREFIX}{user_id}", 1, px=max(int(seconds * 1000), 1)
+        )
+
+    def recent(self, user_id):
+        return bool(self.client.exists(f"{self.PREFIX}{user_id}"))
+
+
+def _identity():
+    """Utilisateur authentifié de la requête, None sinon (jeton absent ou
+    invalide : la vue le refusera elle-même)"""
+    try:
+        verify_jwt_in_request(optional=True)
+        return get_jwt_identity()
+    except Exception:
+        return None
+
+
+class ReplicaRouter:
+    """Extension Flask : choix de la base pour chaque requête"""
+
+    def __init__(self, app=None):
+        self.urls = []
+        self._keys = []
+        self.sticky_seconds = 5
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        """Déclare les réplicas comme binds Flask-SQLAlchemy : à appeler
+        avant `db.init_app`"""
+        app.config.setdefault(
+            "DATABASE_REPLICA_URLS",
+            [
+                url.strip() for url in
+                os.environ.get("DATABASE_REPLICA_URLS", "").split(",")
+                if url.strip()
+            ]
+        )
+        app.config.setdefault(
+            "DATABASE_REPLICA_STICKY_SECONDS",
+            float(os.environ.get("DATABASE_REPLICA_STICKY_SECONDS", 5))
+        )
+        app.config.setdefault(
+            "DATABASE_REPLICA_STICKY_BACKEND",
+            os.environ.get("DATABASE_REPLICA_STICKY_BACKEND", "memory")
+        )
+        app.config.setdefault(
+            "DATABASE_REPLICA_REDIS_URL",
+            os.environ.get(
+                "DATABASE_REPLICA_REDIS_URL", "redis://localhost:6379/0"
+            )
+        )
+        self.urls = app.config["DATABASE_REPLICA_URLS"]
+        if not self.urls:
+            return
+        self._keys = [
+            f"{BIND_PREFIX}{index}" for index in range(len(self.urls))
+        ]
+        binds = app.config.setdefault("SQLALCHEMY_BINDS", {})
+        for key, url in zip(self._keys, self.urls):
+            binds[key] = {"url": url, **engine_options(url)}
+
+        backend = app.config["DATABASE_REPLICA_STICKY_BACKEND"]
+        if backend == "redis":
+            self.backend = RedisBackend(
+                app.config["DATABASE_REPLICA_REDIS_URL"]
+            )
+        elif backend == "memory":
+            self.backend = MemoryBackend()
+        else:
+            raise ValueError(
+                f"DATABASE_REPLICA_STICKY_BACKEND inconnu : {backend}"
+            )
+        self.sticky_seconds = app.config["DATABASE_REPLICA_STICKY_SECONDS"]
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    @property
+    def enabled(self):
+        return self.backend is not None
+
+    def _before_request(self):
+        # Contexte d'application partagé entre requêtes (client de test)
+        g.db_replica = None
+        g.db_sticky = False
+        if request.method not in READ_METHODS:
+            return
+        if _marked_primary(current_app.view_functions.get(request.endpoint)):
+            return
+        user_id = _identity()
+        if user_id is not None and self.backend.recent(user_id):
+            # Lecture de ses propres écritures : base principale
+            g.db_sticky = True
+            return
+        engines = current_app.extensions["sqlalchemy"].engines
+        g.db_replica = engines[random.choice(self._keys)]
+
+    def _after_request(self, response):
+        if (request.method not in WRITE_METHODS or
+                response.status_code >= 400):
+            return response
+        user_id = _identity()
+        if user_id is not None:
+            self.backend.mark(user_id, self.sticky_seconds)
+        return response
+
+
+def read_from_primary():
+    """Envoie les lectures suivantes de la requête à la base principale"""
+    if has_app_context():
+        g.db_replica = None
+
+
+def on_primary_after_write():
+    """Vrai si la requête lit sur la base principale parce que
+    l'utilisateur vient d'écrire"""
+    return has_app_context() and g.get("db_sticky", False)
@@ -5,6 +5,7 @@ from . import (
     characters,
     rankings,
     registrations,
+    search,
     tournaments,
     users
 )
@@ -14,6 +15,7 @@ __all__ = [
     'characters',
     'rankings',
     'registrations',
+    'search',
     'tournaments',
     'users'
 ]
@@ -7,6 +7,8 @@ from flask_jwt_extended import (
 )
 from app import db
 from app.models import User
+from app.permissions import permission_claims
+from app.sql_audit import query_budget
 
 # Création du Blueprint pour les routes d'authentification
 bp = Blueprint("auth", __name__)
@@ -63,10 +65,17 @@ def login():
     if not user or not user.check_password(data['password']):
         return jsonify({'error': 'Email ou mot de passe incorrect'}), 401
 
-    # Création du token JWT
+    # Mise à niveau transparente des hashs calculés avec un ancien coût
+    if user.password_needs_rehash():
+        user.set_password(data['password'])
+        db.session.commit()
+
+    # Création du token JWT, avec les rôles pour les vérifications
+    # d'autorisation sans requête
     access_token = create_access_token(
         identity=str(user.id),
-        expires_delta=timedelta(days=1)
+        expires_delta=timedelta(days=1),
+        additional_claims=permission_claims(user.id)
     )
 
     return jsonify({
@@ -84,6 +93,7 @@ def logout():
 
 
 @bp.route("/me", methods=["GET"])
+@query_budget(3)
 @jwt_required()
 def get_current_user():
     user_id = int(get_jwt_identity())
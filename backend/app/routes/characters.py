@@ -1,36 +1,97 @@
-from flask import Blueprint, jsonify
+from flask import Blueprint, Response, jsonify, request
 from flask_jwt_extended import jwt_required
-from app.models.character import Character
+from app.catalog import get_catalog
+from app.models import Character
+from app.models.character_usage import UsageScopeError
+from app.services.character_usage import roster_usage
+from app.sql_audit import query_budget
 
 # Création du Blueprint pour les routes des personnages
 bp = Blueprint("characters", __name__)
 
+# Une URL avec ?version=<empreinte> ne change jamais de contenu
+IMMUTABLE = "private, max-age=31536000, immutable"
+REVALIDATE = "private, no-cache"
+
+
+def catalog_response(catalog, body):
+    """Réponse JSON pré-sérialisée, avec ETag et en-têtes de cache"""
+    response = Response(body, mimetype="application/json")
+    response.set_etag(catalog.version)
+    if request.args.get('version') == catalog.version:
+        response.headers["Cache-Control"] = IMMUTABLE
+    else:
+        response.headers["Cache-Control"] = REVALIDATE
+    return response.make_conditional(request)
+
 
 # Route pour obtenir tous les personnages
 @bp.route("", methods=["GET"])
+@query_budget(1)
 @jwt_required()
 def get_all_characters():
-    characters = Character.query.all()
-    return jsonify([character.to_dict() for character in characters]), 200
+    catalog = get_catalog()
+
+    game = request.args.get('game')
+    if game:
+        return catalog_response(catalog, catalog.game_json.get(game, b"[]"))
+    return catalog_response(catalog, catalog.json)
+
+
+# Version du catalogue, à passer en ?version= pour un cache long
+@bp.route("/version", methods=["GET"])
+@jwt_required()
+def get_catalog_version():
+    catalog = get_catalog()
+    return jsonify({
+        'version': catalog.version,
+        'count': len(catalog.by_id),
+        'games': sorted(catalog.by_game)
+    }), 200
+
+
+# Statistiques d'utilisation de tout le roster, les plus joués d'abord
+@bp.route("/usage", methods=["GET"])
+@query_budget(1)
+@jwt_required()
+def get_roster_usage():
+    try:
+        usage = roster_usage(
+            game=request.args.get('game'),
+            tournament_id=request.args.get('tournament_id', type=int),
+            player_id=request.args.get('player_id', type=int)
+        )
+    except UsageScopeError as e:
+        return jsonify({'error': str(e)}), 400
+    catalog = get_catalog()
+    return jsonify([{
+        **entry.to_dict(),
+        'character': catalog.by_id.get(entry.character_id)
+    } for entry in usage]), 200
 
 
 # Route pour obtenir un personnage spécifique
 @bp.route("/<int:character_id>", methods=["GET"])
+@query_budget(1)
 @jwt_required()
 def get_character(character_id):
+    catalog = get_catalog()
+    body = catalog.character_json(character_id)
+    if body is None:
+        return jsonify({'error': 'Personnage non trouvé'}), 404
+    return catalog_response(catalog, body)
+
+
+# Statistiques d'utilisation d'un personnage
+@bp.route("/<int:character_id>/usage", methods=["GET"])
+@jwt_required()
+def get_character_usage(character_id):
+    character = Character.query.get_or_404(character_id)
     try:
-        character = Character.query.get_or_404(character_id)
-        return jsonify({
-            'id': character.id,
-            'name': character.name,
-            'image_url': character.image_url,
-            'description': character.description
-        })
-    except ValueError:
-        return jsonify({
-            'error': 'ID de personnage invalide'
-        }), 400
-    except Exception as e:
-        return jsonify({
-            'error': f'Erreur lors de la récupération du personnage: {str(e)}'
-        }), 500
+        stats = character.get_usage_stats(
+            tournament_id=request.args.get('tournament_id', type=int),
+            player_id=request.args.get('player_id', type=int)
+        )
+    except UsageScopeError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'character_id': character.id, **stats}), 200
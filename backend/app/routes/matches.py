@@ -1,15 +1,31 @@
 from datetime import datetime
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
+from flask_jwt_extended import jwt_required
+from app import db, response_cache
 from app.models import Match, Tournament, User
+from app.pagination import InvalidCursor, cursor_requested, keyset_paginate
+from app.permissions import can_manage_tournament
+from app.serializers import MATCH, MATCH_FIELDS
+from app.services.bracket import BracketError, advance_match
+from app.services.character_usage import (
+    CharacterUsageError,
+    record_match_usage,
+    remove_match_usage,
+    set_match_characters
+)
+from app.services.match_results import MatchResultError, report_results
+from app.services.rankings import record_match_result
+from app.services.ratings import record_match_rating
+from app.sql_audit import query_budget
 
 
 bp = Blueprint("matches", __name__)
 
 
 @bp.route("/tournaments/<int:tournament_id>/matches", methods=["GET"])
+@query_budget(2)
 @jwt_required()
+@response_cache.cached("tournament", "tournament_id")
 def get_matches(tournament_id):
     # Pagination
     page = request.args.get('page', 1, type=int)
@@ -25,36 +41,19 @@ def get_matches(tournament_id):
     if status:
         query = query.filter_by(status=status)
 
-    pagination = query.paginate(page=page, per_page=per_page)
-    matches = pagination.items
+    if cursor_requested(request.args):
+        try:
+            items, meta = keyset_paginate(
+                MATCH.query(query), [(Match.id, False)], request.args
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'matches': MATCH.many(items), **meta}), 200
+
+    pagination = MATCH.query(query).paginate(page=page, per_page=per_page)
 
     return jsonify({
-        'matches': [{
-            'id': m.id,
-            'tournament_id': m.tournament_id,
-            'round': m.round,
-            'player1_id': m.player1_id,
-            'player2_id': m.player2_id,
-            'winner_id': m.winner_id,
-            'score': m.score,
-            'status': m.status,
-            'scheduled_time': m.scheduled_time.isoformat() if m.scheduled_time else None,
-            'player1': {
-                'id': m.player1.id,
-                'name': m.player1.name,
-                'profile_picture': m.player1.profile_picture
-            } if m.player1 else None,
-            'player2': {
-                'id': m.player2.id,
-                'name': m.player2.name,
-                'profile_picture': m.player2.profile_picture
-            } if m.player2 else None,
-            'winner': {
-                'id': m.winner.id,
-                'name': m.winner.name,
-                'profile_picture': m.winner.profile_picture
-            } if m.winner else None
-        } for m in matches],
+        'matches': MATCH.many(pagination.items),
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
@@ -62,42 +61,19 @@ def get_matches(tournament_id):
 
 
 @bp.route("/matches/<int:match_id>", methods=["GET"])
+@query_budget(1)
 @jwt_required()
 def get_match(match_id):
-    match = Match.query.get_or_404(match_id)
-
-    return jsonify({
-        'id': match.id,
-        'tournament_id': match.tournament_id,
-        'round': match.round,
-        'player1_id': match.player1_id,
-        'player2_id': match.player2_id,
-        'winner_id': match.winner_id,
-        'score': match.score,
-        'status': match.status,
-        'scheduled_time': match.scheduled_time.isoformat() if match.scheduled_time else None,
-        'player1': {
-            'id': match.player1.id,
-            'name': match.player1.name,
-            'profile_picture': match.player1.profile_picture
-        } if match.player1 else None,
-        'player2': {
-            'id': match.player2.id,
-            'name': match.player2.name,
-            'profile_picture': match.player2.profile_picture
-        } if match.player2 else None,
-        'winner': {
-            'id': match.winner.id,
-            'name': match.winner.name,
-            'profile_picture': match.winner.profile_picture
-        } if match.winner else None
-    }), 200
+    match = MATCH.get_or_404(match_id)
+    return jsonify(MATCH.dump(match)), 200
 
 
 @bp.route("/tournaments/<int:tournament_id>/matches", methods=["POST"])
 @jwt_required()
 def create_match(tournament_id):
-    current_user_id = int(get_jwt_identity())
+    tournament = Tournament.query.get_or_404(tournament_id)
+    if not can_manage_tournament(tournament):
+        return jsonify({'error': 'Unauthorized'}), 403
     data = request.get_json()
 
     # Validate required fields
@@ -112,32 +88,26 @@ def create_match(tournament_id):
         round=data['round'],
         player1_id=data['player1_id'],
         player2_id=data['player2_id'],
+        bracket_position=data.get('bracket_position'),
         status='scheduled',
-        scheduled_time=datetime.fromisoformat(data['scheduled_time']) if 'scheduled_time' in data else None
+        start_time=datetime.fromisoformat(data['scheduled_time']) if 'scheduled_time' in data else None
     )
 
     db.session.add(match)
     db.session.commit()
+    response_cache.invalidate("tournament", tournament_id)
 
-    return jsonify({
-        'id': match.id,
-        'tournament_id': match.tournament_id,
-        'round': match.round,
-        'player1_id': match.player1_id,
-        'player2_id': match.player2_id,
-        'winner_id': match.winner_id,
-        'score': match.score,
-        'status': match.status,
-        'scheduled_time': match.scheduled_time.isoformat() if match.scheduled_time else None
-    }), 201
+    return jsonify(MATCH_FIELDS.dump(match)), 201
 
 
 @bp.route("/matches/<int:match_id>", methods=["PUT"])
 @jwt_required()
 def update_match(match_id):
-    current_user_id = int(get_jwt_identity())
     match = Match.query.get_or_404(match_id)
+    if not can_manage_tournament(match.tournament):
+        return jsonify({'error': 'Unauthorized'}), 403
     data = request.get_json()
+    previous_winner_id = match.winner_id
 
     # Update fields
     if 'round' in data:
@@ -148,6 +118,8 @@ def update_match(match_id):
         match.player2_id = data['player2_id']
     if 'winner_id' in data:
         match.winner_id = data['winner_id']
+        # Date du résultat : ordre des matchs pour le classement Glicko-2
+        match.end_time = datetime.utcnow() if match.winner_id else None
     if 'score' in data:
         match.score = data['score']
     if 'status' in data:
@@ -155,30 +127,95 @@ def update_match(match_id):
             return jsonify({'error': 'Invalid status'}), 400
         match.status = data['status']
     if 'scheduled_time' in data:
-        match.scheduled_time = datetime.fromisoformat(data['scheduled_time'])
+        match.start_time = datetime.fromisoformat(data['scheduled_time'])
+
+    # Advance winner and loser to their next bracket matches
+    if 'winner_id' in data:
+        try:
+            advance_match(match)
+        except BracketError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
+        record_match_result(match, previous_winner_id)
+        record_match_rating(match, previous_winner_id)
+        record_match_usage(match, previous_winner_id)
 
     db.session.commit()
+    response_cache.invalidate("tournament", match.tournament_id)
 
-    return jsonify({
-        'id': match.id,
-        'tournament_id': match.tournament_id,
-        'round': match.round,
-        'player1_id': match.player1_id,
-        'player2_id': match.player2_id,
-        'winner_id': match.winner_id,
-        'score': match.score,
-        'status': match.status,
-        'scheduled_time': match.scheduled_time.isoformat() if match.scheduled_time else None
-    }), 200
+    return jsonify(MATCH_FIELDS.dump(match)), 200
+
+
+# Saisie groupée des résultats : {"results": [{match_id, winner_id, score,
+# status}, ...]}, appliquée en une transaction ou refusée entièrement
+@bp.route("/matches/results", methods=["POST"])
+@jwt_required()
+def report_match_results():
+    data = request.get_json() or {}
+
+    if 'results' not in data:
+        return jsonify({'error': 'Missing required field: results'}), 400
+
+    # Tous les tournois touchés par le lot doivent être gérés par
+    # l'utilisateur, lus en une requête
+    results = data['results']
+    match_ids = [
+        update['match_id'] for update in (
+            results if isinstance(results, list) else ()
+        )
+        if isinstance(update, dict) and isinstance(update.get('match_id'), int)
+    ]
+    if match_ids:
+        tournaments = Tournament.query.join(Tournament.matches).filter(
+            Match.id.in_(match_ids)
+        ).distinct()
+        if not all(can_manage_tournament(t) for t in tournaments):
+            return jsonify({'error': 'Unauthorized'}), 403
+
+    try:
+        matches = report_results(data['results'])
+    except MatchResultError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e), 'errors': e.errors}), 400
+    db.session.commit()
+    for tournament_id in {match.tournament_id for match in matches}:
+        response_cache.invalidate("tournament", tournament_id)
+
+    return jsonify(MATCH_FIELDS.many(matches)), 200
 
 
 @bp.route("/matches/<int:match_id>", methods=["DELETE"])
 @jwt_required()
 def delete_match(match_id):
-    current_user_id = int(get_jwt_identity())
     match = Match.query.get_or_404(match_id)
+    if not can_manage_tournament(match.tournament):
+        return jsonify({'error': 'Unauthorized'}), 403
 
+    remove_match_usage(match)
     db.session.delete(match)
     db.session.commit()
+    response_cache.invalidate("tournament", match.tournament_id)
+
+    return jsonify({'message': 'Match deleted successfully'}), 200
+
+
+@bp.route("/matches/<int:match_id>/characters", methods=["PUT"])
+@jwt_required()
+def update_match_characters(match_id):
+    match = Match.query.get_or_404(match_id)
+    data = request.get_json() or {}
+
+    if not isinstance(data.get('characters'), list):
+        return jsonify({'error': 'Missing required field: characters'}), 400
+
+    try:
+        set_match_characters(match, data['characters'])
+    except CharacterUsageError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    db.session.commit()
 
-    return jsonify({'message': 'Match deleted successfully'}), 200
\ No newline at end of file
+    return jsonify({
+        'match_id': match.id,
+        'characters': data['characters']
+    }), 200
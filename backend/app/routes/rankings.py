@@ -1,65 +1,123 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity, jwt_required
-from app import db
-from app.models import Ranking, Tournament, User, Match, Registration
+from app import db, response_cache
+from app.models import LeaderboardEntry, Ranking, Rating, Tournament, User
+from app.pagination import InvalidCursor, cursor_requested, keyset_paginate
+from app.permissions import can_manage_tournament
+from app.serializers import TOURNAMENT_RANKING, USER_RANKING
+from app.services.rankings import (
+    ranking_discrepancies,
+    recompute_tournament_rankings
+)
+from app.sql_audit import query_budget
 
 
 bp = Blueprint('rankings', __name__)
 
-# Configuration des points
-POINTS_CONFIG = {
-    'victory': 3,
-    'defeat': 0,
-    'bye': 1
-}
-
 
 @bp.route('', methods=['GET'])
+@query_budget(2)
 @jwt_required()
 def get_global_rankings():
     # Pagination
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
-    # Récupération des utilisateurs avec leur nombre de victoires
-    query = db.session.query(
-        User,
-        db.func.count(Ranking.id).label('tournaments_participated'),
-        db.func.avg(Ranking.rank).label('average_rank')
-    ).join(
-        Ranking, User.id == Ranking.user_id
-    ).group_by(
-        User.id
+    query = db.session.query(LeaderboardEntry, User).join(
+        User, User.id == LeaderboardEntry.user_id
+    )
+
+    def serialize(rankings):
+        return [{
+            'user': {
+                'id': u.id,
+                'name': u.name,
+                'profile_picture': u.profile_picture
+            },
+            'position': entry.position,
+            'tournaments_participated': entry.tournaments_participated,
+            'average_rank': entry.average_rank
+        } for entry, u in rankings]
+
+    if cursor_requested(request.args):
+        try:
+            items, meta = keyset_paginate(
+                query, [(LeaderboardEntry.position, False)], request.args,
+                key=lambda row: (row[0].position,)
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'rankings': serialize(items), **meta}), 200
+
+    # Lecture du classement précalculé : les positions sont contiguës, la
+    # page est donc une plage de l'index sur `position`
+    rankings = query.filter(
+        LeaderboardEntry.position > (page - 1) * per_page
     ).order_by(
-        db.func.avg(Ranking.rank).asc()
+        LeaderboardEntry.position.asc()
+    ).limit(per_page).all()
+    total = db.session.query(db.func.count(LeaderboardEntry.user_id)).scalar()
+
+    return jsonify({
+        'rankings': serialize(rankings),
+        'total': total,
+        'pages': -(-total // per_page) if per_page > 0 else 0,
+        'current_page': page
+    }), 200
+
+
+@bp.route('/ratings', methods=['GET'])
+@query_budget(2)
+@jwt_required()
+def get_ratings():
+    # Pagination
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 10, type=int)
+
+    query = db.session.query(Rating, User).join(
+        User, User.id == Rating.user_id
+    ).order_by(
+        Rating.rating.desc(),
+        Rating.user_id.asc()
     )
 
     pagination = query.paginate(page=page, per_page=per_page)
-    rankings = pagination.items
 
     return jsonify({
-        'rankings': [{
+        'ratings': [{
+            **rating.to_dict(),
             'user': {
-                'id': r[0].id,
-                'name': r[0].name,
-                'profile_picture': r[0].profile_picture
-            },
-            'tournaments_participated': r[1],
-            'average_rank': float(r[2]) if r[2] else None
-        } for r in rankings],
+                'id': u.id,
+                'name': u.name,
+                'profile_picture': u.profile_picture
+            }
+        } for rating, u in pagination.items],
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
     }), 200
 
 
+@bp.route('/ratings/users/<int:user_id>', methods=['GET'])
+@query_budget(2)
+@jwt_required()
+def get_user_rating(user_id):
+    # Vérification si l'utilisateur existe
+    User.query.get_or_404(user_id)
+
+    rating = Rating.query.get(user_id) or Rating(user_id=user_id)
+    return jsonify(rating.to_dict()), 200
+
+
 @bp.route('/tournaments/<int:tournament_id>', methods=['GET'])
+@query_budget(2)
+@response_cache.cached('tournament', 'tournament_id')
 def get_tournament_rankings(tournament_id):
     # Vérification si le tournoi existe
     tournament = Tournament.query.get_or_404(tournament_id)
 
     # Récupération des classements du tournoi
-    rankings = Ranking.query.filter_by(
+    rankings = TOURNAMENT_RANKING.query().filter_by(
         tournament_id=tournament_id
     ).order_by(
         Ranking.rank.asc()
@@ -72,24 +130,18 @@ def get_tournament_rankings(tournament_id):
             'start_date': tournament.start_date.isoformat(),
             'end_date': tournament.end_date.isoformat()
         },
-        'rankings': [{
-            'rank': r.rank,
-            'user': {
-                'id': r.user.id,
-                'name': r.user.name,
-                'profile_picture': r.user.profile_picture
-            }
-        } for r in rankings]
+        'rankings': TOURNAMENT_RANKING.many(rankings)
     }), 200
 
 
 @bp.route('/users/<int:user_id>', methods=['GET'])
+@query_budget(2)
 def get_user_rankings(user_id):
     # Vérification si l'utilisateur existe
     user = User.query.get_or_404(user_id)
 
     # Récupération des classements de l'utilisateur
-    rankings = Ranking.query.filter_by(
+    rankings = USER_RANKING.query().filter_by(
         user_id=user_id
     ).order_by(
         Ranking.rank.asc()
@@ -101,126 +153,47 @@ def get_user_rankings(user_id):
             'name': user.name,
             'profile_picture': user.profile_picture
         },
-        'rankings': [{
-            'tournament': {
-                'id': r.tournament.id,
-                'name': r.tournament.name,
-                'start_date': r.tournament.start_date.isoformat(),
-                'end_date': r.tournament.end_date.isoformat()
-            },
-            'rank': r.rank
-        } for r in rankings]
+        'rankings': USER_RANKING.many(rankings)
     }), 200
 
 
 @bp.route('/tournaments/<int:tournament_id>/calculate', methods=['POST'])
+@jwt_required()
 def calculate_tournament_rankings(tournament_id):
     # Vérification si le tournoi existe
     tournament = Tournament.query.get_or_404(tournament_id)
+    if not can_manage_tournament(tournament):
+        return jsonify({'error': 'Unauthorized'}), 403
 
-    # Vérification si le tournoi est terminé
-    if tournament.status != 'finished':
+    # Les classements sont tenus à jour à chaque résultat : ce calcul
+    # complet sert à les vérifier (verify=true) ou à les réparer
+    if request.args.get('verify', 'false').lower() == 'true':
+        discrepancies = ranking_discrepancies(tournament_id)
         return jsonify({
-            'error': ('Le classement ne peut être calculé que pour un '
-                     'tournoi terminé')
-        }), 400
-
-    # Récupération des matchs du tournoi
-    matches = Match.query.filter_by(
-        tournament_id=tournament_id,
-        winner_id=None
-    ).all()
+            'valid': not discrepancies,
+            'discrepancies': discrepancies
+        }), 200
 
-    if matches:
-        error_msg = ('Tous les matchs doivent être terminés pour '
-                    'calculer le classement')
-        return jsonify({'error': error_msg}), 400
+    recompute_tournament_rankings(tournament_id)
+    response_cache.invalidate('tournament', tournament_id)
 
-    # Récupération des inscriptions au tournoi
-    registrations = Registration.query.filter_by(
-        tournament_id=tournament_id,
-        status='confirmed'
+    rankings = db.session.query(Ranking, User).join(
+        User, User.id == Ranking.user_id
+    ).filter(
+        Ranking.tournament_id == tournament_id
+    ).order_by(
+        Ranking.rank.asc()
     ).all()
 
-    # Création d'un dictionnaire pour stocker les points de chaque joueur
-    points = {r.user_id: 0 for r in registrations}
-
-    # Calcul des points pour chaque match
-    for match in matches:
-        if match.winner_id:
-            winner = match.winner_id
-            loser = match.player2_id if match.player1_id == winner else match.player1_id
-
-            # Attribution des points
-            winner_points = POINTS_CONFIG['victory']
-            loser_points = POINTS_CONFIG['defeat']
-
-            # Mise à jour ou création du classement pour le gagnant
-            winner_ranking = Ranking.query.filter_by(
-                user_id=winner,
-                tournament_id=tournament_id
-            ).first()
-
-            if not winner_ranking:
-                winner_ranking = Ranking(
-                    user_id=winner,
-                    tournament_id=tournament_id,
-                    points=winner_points
-                )
-                db.session.add(winner_ranking)
-            else:
-                winner_ranking.points += winner_points
-
-            # Mise à jour ou création du classement pour le perdant
-            loser_ranking = Ranking.query.filter_by(
-                user_id=loser,
-                tournament_id=tournament_id
-            ).first()
-
-            if not loser_ranking:
-                loser_ranking = Ranking(
-                    user_id=loser,
-                    tournament_id=tournament_id,
-                    points=loser_points
-                )
-                db.session.add(loser_ranking)
-            else:
-                loser_ranking.points += loser_points
-
-    # Création des classements
-    rankings = []
-    for user_id, score in points.items():
-        ranking = Ranking(
-            user_id=user_id,
-            tournament_id=tournament_id,
-            points=score,
-            rank=0  # Sera mis à jour après le tri
-        )
-        rankings.append(ranking)
-
-    # Tri des classements par points décroissants
-    rankings.sort(key=lambda x: x.points, reverse=True)
-
-    # Attribution des rangs
-    for i, ranking in enumerate(rankings, 1):
-        ranking.rank = i
-
-    # Suppression des anciens classements
-    Ranking.query.filter_by(tournament_id=tournament_id).delete()
-
-    # Ajout des nouveaux classements
-    db.session.add_all(rankings)
-    db.session.commit()
-
     return jsonify({
         'message': 'Classement calculé avec succès',
         'rankings': [{
             'rank': r.rank,
             'points': r.points,
             'user': {
-                'id': r.user.id,
-                'name': r.user.name,
-                'profile_picture': r.user.profile_picture
+                'id': u.id,
+                'name': u.name,
+                'profile_picture': u.profile_picture
             }
-        } for r in rankings]
-    }), 200
\ No newline at end of file
+        } for r, u in rankings]
+    }), 200
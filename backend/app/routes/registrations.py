@@ -1,12 +1,27 @@
-from datetime import datetime
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
+from app import db, response_cache
 from app.models import Registration, Tournament, User
+from app.pagination import InvalidCursor, cursor_requested, keyset_paginate
+from app.permissions import can_manage_tournament
+from app.serializers import REGISTRATION, REGISTRATION_DETAIL
+from app.services.registrations import (
+    WAITING,
+    RegistrationError,
+    change_registration_status,
+    register_player,
+    unregister_player
+)
+from app.services.registration_import import (
+    ImportFormatError,
+    import_registrations
+)
+from app.sql_audit import query_budget
 
 bp = Blueprint('registrations', __name__)
 
 @bp.route('/tournaments/<int:tournament_id>/registrations', methods=['GET'])
+@query_budget(2)
 @jwt_required()
 def get_tournament_registrations(tournament_id):
     # Pagination
@@ -20,23 +35,27 @@ def get_tournament_registrations(tournament_id):
     if status:
         query = query.filter_by(status=status)
 
-    pagination = query.paginate(page=page, per_page=per_page)
-    registrations = pagination.items
+    if cursor_requested(request.args):
+        try:
+            items, meta = keyset_paginate(
+                REGISTRATION.query(query), [(Registration.id, False)],
+                request.args
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'registrations': REGISTRATION.many(items), **meta}), 200
+
+    if status == WAITING:
+        # Ordre de la file d'attente
+        query = query.order_by(
+            Registration.registration_date, Registration.id
+        )
+    pagination = REGISTRATION.query(query).paginate(
+        page=page, per_page=per_page
+    )
 
     return jsonify({
-        'registrations': [{
-            'id': r.id,
-            'user_id': r.user_id,
-            'tournament_id': r.tournament_id,
-            'registration_date': r.registration_date.isoformat(),
-            'status': r.status,
-            'seed': r.seed,
-            'user': {
-                'id': r.user.id,
-                'name': r.user.name,
-                'profile_picture': r.user.profile_picture
-            }
-        } for r in registrations],
+        'registrations': REGISTRATION.many(pagination.items),
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
@@ -50,60 +69,58 @@ def register_for_tournament(tournament_id):
     # Check if tournament exists
     tournament = Tournament.query.get_or_404(tournament_id)
 
-    # Check if user is already registered
-    existing_registration = Registration.query.filter_by(
-        user_id=current_user_id,
-        tournament_id=tournament_id
-    ).first()
-
-    if existing_registration:
-        return jsonify({'error': 'You are already registered for this tournament'}), 400
-
-    # Create registration
-    registration = Registration(
-        user_id=current_user_id,
-        tournament_id=tournament_id,
-        registration_date=datetime.utcnow(),
-        status='confirmed'
-    )
+    # Create registration, claiming a spot atomically
+    try:
+        registration = register_player(
+            tournament, current_user_id, status='confirmed'
+        )
+    except RegistrationError as e:
+        return jsonify({'error': str(e)}), 400
 
-    db.session.add(registration)
     db.session.commit()
+    response_cache.invalidate('tournament', tournament_id)
 
-    return jsonify({
-        'id': registration.id,
-        'user_id': registration.user_id,
-        'tournament_id': registration.tournament_id,
-        'registration_date': registration.registration_date.isoformat(),
-        'status': registration.status,
-        'seed': registration.seed
-    }), 201
+    return jsonify(registration.to_dict()), 201
 
-@bp.route('/registrations/<int:registration_id>', methods=['GET'])
+@bp.route('/tournaments/<int:tournament_id>/registrations/import', methods=['POST'])
 @jwt_required()
-def get_registration(registration_id):
-    registration = Registration.query.get_or_404(registration_id)
+def import_tournament_registrations(tournament_id):
+    tournament = Tournament.query.get_or_404(tournament_id)
+
+    # Permission check
+    if not can_manage_tournament(tournament):
+        return jsonify({'error': 'Unauthorized'}), 403
 
+    # CSV (colonnes email, seed) ou NDJSON ({"email": ..., "seed": ...})
+    format = request.args.get('format')
+    if not format:
+        format = 'ndjson' if 'json' in request.mimetype else 'csv'
+
+    # Corps lu ligne à ligne, sans le charger entièrement en mémoire
+    try:
+        report = import_registrations(
+            tournament, iter(request.stream.readline, b''), format
+        )
+    except ImportFormatError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    response_cache.invalidate('tournament', tournament_id)
+
+    statuses = [row['status'] for row in report]
     return jsonify({
-        'id': registration.id,
-        'user_id': registration.user_id,
-        'tournament_id': registration.tournament_id,
-        'registration_date': registration.registration_date.isoformat(),
-        'status': registration.status,
-        'seed': registration.seed,
-        'user': {
-            'id': registration.user.id,
-            'name': registration.user.name,
-            'profile_picture': registration.user.profile_picture
-        },
-        'tournament': {
-            'id': registration.tournament.id,
-            'name': registration.tournament.name,
-            'start_date': registration.tournament.start_date.isoformat(),
-            'end_date': registration.tournament.end_date.isoformat()
-        }
+        'registered': statuses.count('registered'),
+        'waiting_list': statuses.count(WAITING),
+        'errors': statuses.count('error'),
+        'rows': report
     }), 200
 
+@bp.route('/registrations/<int:registration_id>', methods=['GET'])
+@query_budget(1)
+@jwt_required()
+def get_registration(registration_id):
+    registration = REGISTRATION_DETAIL.get_or_404(registration_id)
+    return jsonify(REGISTRATION_DETAIL.dump(registration)), 200
+
 @bp.route('/registrations/<int:registration_id>', methods=['PUT'])
 @jwt_required()
 def update_registration(registration_id):
@@ -120,20 +137,18 @@ def update_registration(registration_id):
     if 'status' in data:
         if data['status'] not in ['confirmed', 'cancelled', 'waiting_list']:
             return jsonify({'error': 'Invalid status'}), 400
-        registration.status = data['status']
+        try:
+            change_registration_status(registration, data['status'])
+        except RegistrationError as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 400
     if 'seed' in data:
         registration.seed = data['seed']
 
     db.session.commit()
+    response_cache.invalidate('tournament', registration.tournament_id)
 
-    return jsonify({
-        'id': registration.id,
-        'user_id': registration.user_id,
-        'tournament_id': registration.tournament_id,
-        'registration_date': registration.registration_date.isoformat(),
-        'status': registration.status,
-        'seed': registration.seed
-    }), 200
+    return jsonify(registration.to_dict()), 200
 
 @bp.route('/registrations/<int:registration_id>', methods=['DELETE'])
 @jwt_required()
@@ -145,7 +160,9 @@ def cancel_registration(registration_id):
     if registration.user_id != current_user_id:
         return jsonify({'error': 'Unauthorized'}), 403
 
-    db.session.delete(registration)
+    tournament_id = registration.tournament_id
+    unregister_player(tournament_id, registration.user_id)
     db.session.commit()
+    response_cache.invalidate('tournament', tournament_id)
 
     return jsonify({'message': 'Registration cancelled successfully'}), 200
\ No newline at end of file
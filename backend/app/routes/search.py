@@ -0,0 +1,47 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+from app import db
+from app.models import Tournament, User
+from app.search import apply_search
+from app.sql_audit import query_budget
+
+# Création du Blueprint pour la recherche
+bp = Blueprint("search", __name__)
+
+MAX_SUGGESTIONS = 20
+
+
+# Route d'autocomplétion : tournois et joueurs dont le nom commence par
+# les mots saisis, triés par pertinence
+@bp.route("", methods=["GET"])
+@query_budget(2)
+@jwt_required()
+def suggest():
+    text = request.args.get('q', '')
+    limit = min(
+        max(request.args.get('limit', 5, type=int), 1), MAX_SUGGESTIONS
+    )
+
+    tournaments = apply_search(
+        db.session.query(Tournament.id, Tournament.name, Tournament.status),
+        Tournament,
+        text
+    ).limit(limit).all() if text else []
+    users = apply_search(
+        db.session.query(User.id, User.name, User.profile_picture),
+        User,
+        text
+    ).limit(limit).all() if text else []
+
+    return jsonify({
+        'tournaments': [{
+            'id': t.id,
+            'name': t.name,
+            'status': t.status
+        } for t in tournaments],
+        'users': [{
+            'id': u.id,
+            'name': u.name,
+            'profile_picture': u.profile_picture
+        } for u in users]
+    }), 200
@@ -1,46 +1,133 @@
 from datetime import datetime
-from flask import Blueprint, request, jsonify, current_app
+from flask import Blueprint, Response, request, jsonify, current_app
 from flask_jwt_extended import get_jwt_identity, jwt_required
-from app import db
+from app import db, event_hub, response_cache
 from app.models.tournament import Tournament
-from app.models.registration import Registration
+from app.pagination import InvalidCursor, cursor_requested, keyset_paginate
+from app.permissions import can_manage_tournament
+from app.serializers import (
+    TOURNAMENT_SUMMARY_FIELDS,
+    requested_tournament_serializer
+)
+from app.search import apply_search
+from app.services.bracket import BracketError, generate_bracket
+from app.services.registrations import (
+    WAITING,
+    RegistrationError,
+    promote_waitlist,
+    register_player,
+    unregister_player,
+    unregister_players,
+    waitlist_position
+)
+from app.sql_audit import query_budget
 
 bp = Blueprint("tournaments", __name__)
 
 @bp.route("", methods=["GET"])
+@query_budget(3)
 @jwt_required()
 def get_tournaments():
-    current_app.logger.info("=== DÉBUT DE LA ROUTE GET /tournaments ===")
-    current_app.logger.info(f"Headers de la requête: {dict(request.headers)}")
-
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
     search = request.args.get('search', '')
     status = request.args.get('status', '')
 
-    current_app.logger.info(f"Paramètres de la requête - page: {page}, per_page: {per_page}, search: {search}, status: {status}")
+    current_app.logger.debug(
+        "Paramètres de la requête - page: %s, per_page: %s, search: %s, status: %s",
+        page, per_page, search, status
+    )
 
     query = Tournament.query
     if search:
-        query = query.filter(Tournament.name.ilike(f'%{search}%'))
+        # Le tri par pertinence ne s'applique pas à la pagination par curseur
+        query = apply_search(
+            query, Tournament, search,
+            order=not cursor_requested(request.args)
+        )
     if status and status != 'all':
         query = query.filter(Tournament.status == status)
 
-    pagination = query.paginate(page=page, per_page=per_page)
-    tournaments = pagination.items
+    # Les listes renvoient un résumé sans inscriptions ni textes longs
+    try:
+        serializer = requested_tournament_serializer(
+            request.args, fields=TOURNAMENT_SUMMARY_FIELDS
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if cursor_requested(request.args):
+        try:
+            items, meta = keyset_paginate(
+                serializer.query(query), [(Tournament.id, False)],
+                request.args
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'tournaments': serializer.many(items), **meta}), 200
+
+    pagination = serializer.query(query).paginate(
+        page=page, per_page=per_page
+    )
 
     return jsonify({
-        'tournaments': [t.to_dict() for t in tournaments],
+        'tournaments': serializer.many(pagination.items),
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
     }), 200
 
 @bp.route("/<int:tournament_id>", methods=["GET"])
+@query_budget(2)
 @jwt_required()
+@response_cache.cached("tournament", "tournament_id")
 def get_tournament(tournament_id):
-    tournament = Tournament.query.get_or_404(tournament_id)
-    return jsonify(tournament.to_dict()), 200
+    try:
+        serializer = requested_tournament_serializer(
+            request.args, include=('registrations',)
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    tournament = serializer.get_or_404(tournament_id)
+    return jsonify(serializer.dump(tournament)), 200
+
+# Événements en direct du tournoi (Server-Sent Events). EventSource
+# n'envoyant pas d'en-têtes, le token peut être passé en ?jwt=
+@bp.route("/<int:tournament_id>/stream", methods=["GET"])
+@jwt_required(locations=["headers", "query_string"])
+def stream_tournament(tournament_id):
+    if not event_hub.enabled:
+        return jsonify({'error': 'Live events are disabled'}), 404
+    if db.session.get(Tournament, tournament_id) is None:
+        return jsonify({'error': 'Tournament not found'}), 404
+    # Le flux ne lit pas la base : la connexion est rendue au pool tout
+    # de suite plutôt qu'à la fin du flux
+    db.session.close()
+
+    # Un flux occupe un thread du worker : nombre limité par worker
+    # (EVENT_STREAM_MAX_CLIENTS), pour laisser les autres routes répondre
+    if not event_hub.acquire_stream():
+        return jsonify({'error': 'Too many live streams, retry later'}), \
+            503, {'Retry-After': '5'}
+
+    last_event_id = (
+        request.headers.get('Last-Event-ID') or
+        request.args.get('last_event_id')
+    )
+    response = Response(
+        event_hub.stream(tournament_id, last_event_id),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            # Pas de mise en tampon par nginx
+            'X-Accel-Buffering': 'no'
+        }
+    )
+    # Appelé par le serveur à la fermeture, même si le flux n'a jamais
+    # été lu
+    response.call_on_close(event_hub.release_stream)
+    return response
 
 @bp.route("", methods=["POST"])
 @jwt_required()
@@ -72,6 +159,7 @@ def create_tournament():
 
         db.session.add(tournament)
         db.session.commit()
+        response_cache.invalidate("tournament", tournament.id)
 
         return jsonify(tournament.to_dict()), 201
     except Exception as e:
@@ -98,6 +186,9 @@ def update_tournament(tournament_id):
             tournament.registration_deadline = datetime.fromisoformat(data['registration_deadline'])
         if 'max_participants' in data:
             tournament.max_participants = data['max_participants']
+            # Places ajoutées : la liste d'attente en profite tout de suite
+            db.session.flush()
+            promote_waitlist(tournament_id)
         if 'status' in data:
             tournament.status = data['status']
         if 'format' in data:
@@ -112,6 +203,7 @@ def update_tournament(tournament_id):
             tournament.address = data['address']
 
         db.session.commit()
+        response_cache.invalidate("tournament", tournament_id)
         return jsonify(tournament.to_dict()), 200
     except Exception as e:
         db.session.rollback()
@@ -125,6 +217,7 @@ def delete_tournament(tournament_id):
     try:
         db.session.delete(tournament)
         db.session.commit()
+        response_cache.invalidate("tournament", tournament_id)
         return jsonify({'message': 'Tournament deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -135,85 +228,92 @@ def delete_tournament(tournament_id):
 @jwt_required()
 def register_to_tournament(tournament_id):
     current_user_id = int(get_jwt_identity())
-    current_app.logger.info(f"Tentative d'inscription - User ID: {current_user_id}, Tournament ID: {tournament_id}")
 
     tournament = Tournament.query.get_or_404(tournament_id)
-    current_app.logger.info(f"Tournoi trouvé: {tournament.name}")
-
-    # Vérifier si l'utilisateur est déjà inscrit
-    existing_registration = Registration.query.filter_by(
-        user_id=current_user_id,
-        tournament_id=tournament_id
-    ).first()
-
-    if existing_registration:
-        current_app.logger.info(f"L'utilisateur {current_user_id} est déjà inscrit au tournoi {tournament_id}")
-        return jsonify({'error': 'Already registered'}), 400
-
-    # Vérifier si le tournoi est complet
-    if (tournament.max_participants and
-            len(tournament.registrations) >= tournament.max_participants):
-        current_app.logger.info(f"Le tournoi {tournament_id} est complet")
-        return jsonify({'error': 'Tournament is full'}), 400
-
-    # Vérifier si la date limite d'inscription est dépassée
-    if (tournament.registration_deadline and
-            datetime.utcnow() > tournament.registration_deadline):
-        current_app.logger.info(f"La date limite d'inscription est dépassée pour le tournoi {tournament_id}")
-        return jsonify({'error': 'Registration deadline has passed'}), 400
 
+    # Place prise par un UPDATE conditionnel : pas de surréservation même
+    # si plusieurs inscriptions arrivent en même temps
     try:
-        registration = Registration(
-            user_id=current_user_id,
-            tournament_id=tournament_id
-        )
-        db.session.add(registration)
-
-        # Initialiser current_participants s'il est None
-        if tournament.current_participants is None:
-            tournament.current_participants = 0
-            current_app.logger.info(f"Initialisation de current_participants à 0 pour le tournoi {tournament_id}")
-
-        # Log avant l'incrémentation
-        current_app.logger.info(f"État avant incrémentation - current_participants: {tournament.current_participants}")
-
-        tournament.current_participants += 1
-
-        # Log après l'incrémentation
-        current_app.logger.info(f"État après incrémentation - current_participants: {tournament.current_participants}")
-
+        registration = register_player(tournament, current_user_id)
         db.session.commit()
-        current_app.logger.info(f"Inscription réussie - User ID: {current_user_id}, Tournament ID: {tournament_id}")
-        return jsonify({'message': 'Successfully registered'}), 201
+    except RegistrationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(f"Error registering to tournament: {str(e)}")
-        current_app.logger.error(f"Type d'erreur: {type(e)}")
-        current_app.logger.error(f"État du tournoi - current_participants: {tournament.current_participants}, max_participants: {tournament.max_participants}")
-
-        # Si c'est une erreur de base de données SQLAlchemy
-        if hasattr(e, 'orig'):
-            current_app.logger.error(f"Erreur SQL originale: {e.orig}")
-
         return jsonify({'error': str(e)}), 422
 
+    response_cache.invalidate("tournament", tournament_id)
+    current_app.logger.info(
+        "Inscription %s", registration.status,
+        extra={'user_id': current_user_id, 'tournament_id': tournament_id}
+    )
+    if registration.status == WAITING:
+        return jsonify({
+            'message': 'Tournament is full, added to waiting list',
+            'status': WAITING,
+            'waitlist_position': waitlist_position(registration)
+        }), 201
+    return jsonify({'message': 'Successfully registered'}), 201
+
 @bp.route("/<int:tournament_id>/unregister", methods=["POST"])
 @jwt_required()
 def unregister_from_tournament(tournament_id):
     current_user_id = int(get_jwt_identity())
-    registration = Registration.query.filter_by(
-        user_id=current_user_id,
-        tournament_id=tournament_id
-    ).first_or_404()
 
     try:
-        db.session.delete(registration)
-        registration.tournament.current_participants -= 1
+        if not unregister_player(tournament_id, current_user_id):
+            return jsonify({'error': 'Registration not found'}), 404
         db.session.commit()
+        response_cache.invalidate("tournament", tournament_id)
         return jsonify({'message': 'Successfully unregistered'}), 200
     except Exception as e:
         db.session.rollback()
         current_app.logger.error(
             f"Error unregistering from tournament: {str(e)}"
         )
-        return jsonify({'error': str(e)}), 422
\ No newline at end of file
+        return jsonify({'error': str(e)}), 422
+
+@bp.route("/<int:tournament_id>/registrations/cancel", methods=["POST"])
+@jwt_required()
+def cancel_registrations(tournament_id):
+    tournament = Tournament.query.get_or_404(tournament_id)
+
+    if not can_manage_tournament(tournament):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    data = request.get_json(silent=True) or {}
+    user_ids = data.get('user_ids')
+    if not isinstance(user_ids, list):
+        return jsonify({'error': 'Le champ user_ids est requis'}), 400
+
+    # Retrait groupé (une équipe) : une seule promotion de la liste d'attente
+    cancelled = unregister_players(tournament_id, user_ids)
+    db.session.commit()
+    response_cache.invalidate("tournament", tournament_id)
+
+    return jsonify({'cancelled': cancelled}), 200
+
+@bp.route("/<int:tournament_id>/bracket", methods=["POST"])
+@jwt_required()
+def create_bracket(tournament_id):
+    tournament = Tournament.query.get_or_404(tournament_id)
+
+    if not can_manage_tournament(tournament):
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    data = request.get_json(silent=True) or {}
+
+    try:
+        brackets, match_count = generate_bracket(
+            tournament,
+            reset=bool(data.get('reset'))
+        )
+    except BracketError as e:
+        return jsonify({'error': str(e)}), 400
+    response_cache.invalidate("tournament", tournament_id)
+
+    return jsonify({
+        'brackets': [b.to_dict() for b in brackets],
+        'match_count': match_count
+    }), 201
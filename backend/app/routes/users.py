@@ -1,7 +1,16 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from app import db
-from app.models import User, Tournament, Match
+from app.models import User, Tournament, Match, Registration
+from app.pagination import InvalidCursor, cursor_requested, keyset_paginate
+from app.search import apply_search
+from app.serializers import (
+    MATCH_DETAIL,
+    TOURNAMENT_SUMMARY_FIELDS,
+    USER,
+    requested_tournament_serializer
+)
+from app.sql_audit import query_budget
 from sqlalchemy import or_
 
 # Création du Blueprint pour les routes utilisateurs
@@ -10,6 +19,7 @@ bp = Blueprint("users", __name__)
 
 # Route pour obtenir le profil de l'utilisateur
 @bp.route("/profile", methods=["GET"])
+@query_budget(1)
 @jwt_required()
 def get_profile():
     current_user_id = int(get_jwt_identity())
@@ -39,6 +49,7 @@ def update_profile():
 
 
 @bp.route('', methods=['GET'])
+@query_budget(3)
 @jwt_required()
 def get_users():
     # Pagination
@@ -48,15 +59,26 @@ def get_users():
     # Filtres
     search = request.args.get('search', '')
 
-    query = User.query
+    query = USER.query()
     if search:
-        query = query.filter(User.name.ilike(f'%{search}%'))
+        # Le tri par pertinence ne s'applique pas à la pagination par curseur
+        query = apply_search(
+            query, User, search, order=not cursor_requested(request.args)
+        )
+
+    if cursor_requested(request.args):
+        try:
+            items, meta = keyset_paginate(
+                query, [(User.id, False)], request.args
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'users': USER.many(items), **meta}), 200
 
     pagination = query.paginate(page=page, per_page=per_page)
-    users = pagination.items
 
     return jsonify({
-        'users': [user.to_dict() for user in users],
+        'users': USER.many(pagination.items),
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
@@ -64,6 +86,7 @@ def get_users():
 
 
 @bp.route('/<int:user_id>', methods=['GET'])
+@query_budget(2)
 @jwt_required()
 def get_user(user_id):
     user = User.query.get_or_404(user_id)
@@ -96,22 +119,39 @@ def update_user(user_id):
 
 
 @bp.route('/<int:user_id>/tournaments', methods=['GET'])
+@query_budget(3)
 @jwt_required()
 def get_user_tournaments(user_id):
     # Pagination
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
 
-    # Récupération des tournois via les inscriptions
-    query = Tournament.query.join(Tournament.registrations).filter(
-        Tournament.registrations.any(user_id=user_id)
+    try:
+        serializer = requested_tournament_serializer(
+            request.args, fields=TOURNAMENT_SUMMARY_FIELDS
+        )
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Récupération des tournois via les inscriptions ; une inscription au
+    # plus par joueur et par tournoi, la jointure ne duplique rien
+    query = serializer.query().join(Tournament.registrations).filter(
+        Registration.user_id == user_id
     )
 
+    if cursor_requested(request.args):
+        try:
+            items, meta = keyset_paginate(
+                query, [(Tournament.id, False)], request.args
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'tournaments': serializer.many(items), **meta}), 200
+
     pagination = query.paginate(page=page, per_page=per_page)
-    tournaments = pagination.items
 
     return jsonify({
-        'tournaments': [t.to_dict() for t in tournaments],
+        'tournaments': serializer.many(pagination.items),
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
@@ -119,6 +159,7 @@ def get_user_tournaments(user_id):
 
 
 @bp.route('/<int:user_id>/stats', methods=['GET'])
+@query_budget(3)
 @jwt_required()
 def get_user_stats(user_id):
     # Statistiques des matchs
@@ -138,10 +179,8 @@ def get_user_stats(user_id):
     win_rate = (victories / total_matches * 100) if total_matches > 0 else 0
 
     # Statistiques des tournois
-    tournaments_participated = Tournament.query.join(
-        Tournament.registrations
-    ).filter(
-        Tournament.registrations.any(user_id=user_id)
+    tournaments_participated = Registration.query.filter_by(
+        user_id=user_id
     ).count()
 
     return jsonify({
@@ -158,6 +197,7 @@ def get_user_stats(user_id):
 
 
 @bp.route('/<int:user_id>/matches', methods=['GET'])
+@query_budget(2)
 @jwt_required()
 def get_user_matches(user_id):
     # Pagination
@@ -167,13 +207,25 @@ def get_user_matches(user_id):
     # Récupération des matchs où l'utilisateur est joueur1 ou joueur2
     query = Match.query.filter(
         (Match.player1_id == user_id) | (Match.player2_id == user_id)
-    ).order_by(Match.id.desc())
+    )
 
-    pagination = query.paginate(page=page, per_page=per_page)
-    matches = pagination.items
+    if cursor_requested(request.args):
+        try:
+            items, meta = keyset_paginate(
+                MATCH_DETAIL.query(query), [(Match.id, True)],
+                request.args
+            )
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+        return jsonify({'matches': MATCH_DETAIL.many(items), **meta}), 200
+
+    query = query.order_by(Match.id.desc())
+    pagination = MATCH_DETAIL.query(query).paginate(
+        page=page, per_page=per_page
+    )
 
     return jsonify({
-        'matches': [m.to_dict() for m in matches],
+        'matches': MATCH_DETAIL.many(pagination.items),
         'total': pagination.total,
         'pages': pagination.pages,
         'current_page': page
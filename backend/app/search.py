@@ -0,0 +1,125 @@
+"""Recherche plein texte sur les noms des tournois et des joueurs.
+
+Sous MySQL, les colonnes sont couvertes par un index FULLTEXT (déclaré sur
+les modèles) interrogé en mode booléen. Sous SQLite, une table FTS5 à
+contenu externe est créée avec la table et tenue à jour par des triggers.
+Les autres moteurs retombent sur un LIKE.
+
+Chaque mot saisi est cherché comme préfixe, ce qui permet l'autocomplétion,
+et les résultats sont triés par pertinence.
+"""
+import re
+
+from sqlalchemy import DDL, event, literal_column, table
+from sqlalchemy.dialects.mysql import match
+
+from app import db
+from app.models import Tournament, User
+
+# Modèles indexés et colonne couverte
+SEARCHABLE = {
+    Tournament: 'name',
+    User: 'name',
+}
+
+_WORD = re.compile(r'\w+', re.UNICODE)
+
+# Instructions de création des index FTS5, par modèle
+_FTS_DDL = {}
+
+
+def _fts_name(model):
+    return f'{model.__tablename__}_fts'
+
+
+def _register_fts(model, column):
+    """Table FTS5 et triggers de synchronisation, créés avec la table"""
+    source, fts = model.__tablename__, _fts_name(model)
+    statements = [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+        f"{column}, content='{source}', content_rowid='id', prefix='2 3')",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {source} "
+        f"BEGIN INSERT INTO {fts}(rowid, {column}) "
+        f"VALUES (new.id, new.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {source} "
+        f"BEGIN INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.id, old.{column}); END",
+        f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {column} "
+        f"ON {source} BEGIN "
+        f"INSERT INTO {fts}({fts}, rowid, {column}) "
+        f"VALUES ('delete', old.id, old.{column}); "
+        f"INSERT INTO {fts}(rowid, {column}) "
+        f"VALUES (new.id, new.{column}); END",
+    ]
+    _FTS_DDL[model] = statements
+    for statement in statements:
+        event.listen(
+            model.__table__, 'after_create',
+            DDL(statement).execute_if(dialect='sqlite')
+        )
+    event.listen(
+        model.__table__, 'before_drop',
+        DDL(f"DROP TABLE IF EXISTS {fts}").execute_if(dialect='sqlite')
+    )
+
+
+for _model, _column in SEARCHABLE.items():
+    _register_fts(_model, _column)
+
+
+def search_terms(text):
+    """Mots de la saisie, sans la syntaxe des moteurs plein texte"""
+    return _WORD.findall(text or '')
+
+
+def apply_search(query, model, text, order=True):
+    """Filtre une requête sur `model` par la saisie `text`.
+
+    Avec `order`, les résultats sont triés par pertinence.
+    """
+    terms = search_terms(text)
+    if not terms:
+        return query
+    column = getattr(model, SEARCHABLE[model])
+    dialect = db.engine.dialect.name
+
+    if dialect == 'mysql':
+        # Tous les mots sont requis, chacun comme préfixe
+        relevance = match(
+            column, against=' '.join(f'+{term}*' for term in terms)
+        ).in_boolean_mode()
+        query = query.filter(relevance)
+        return query.order_by(relevance.desc()) if order else query
+
+    if dialect == 'sqlite':
+        fts = _fts_name(model)
+        index = table(fts, literal_column('rowid'))
+        query = query.join(
+            index, literal_column(f'{fts}.rowid') == model.id
+        ).filter(
+            literal_column(fts).op('MATCH')(
+                ' '.join(f'"{term}"*' for term in terms)
+            )
+        )
+        if order:
+            query = query.order_by(literal_column(f'{fts}.rank'))
+        return query
+
+    for term in terms:
+        query = query.filter(column.ilike(f'%{term}%'))
+    return query
+
+
+def rebuild_search_index():
+    """Crée si besoin et reconstruit les tables FTS5 (SQLite) à partir des
+    tables sources, par exemple pour une base créée avant leur ajout"""
+    if db.engine.dialect.name != 'sqlite':
+        return
+    for model in SEARCHABLE:
+        for statement in _FTS_DDL[model]:
+            db.session.execute(db.text(statement))
+        fts = _fts_name(model)
+        db.session.execute(
+            db.text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')")
+        )
+    db.session.commit()
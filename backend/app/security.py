@@ -0,0 +1,117 @@
+"""Hachage des mots de passe hors du thread de la requête.
+
+bcrypt coûte des centaines de millisecondes par appel. Les calculs passent
+par un pool de threads de taille fixe avec une file d'attente bornée : au
+delà, ou si l'attente dépasse le délai, la requête échoue vite avec
+`PasswordHasherBusy` au lieu d'occuper un worker.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+import bcrypt
+
+from .metrics import observe_bcrypt
+
+
+class PasswordHasherBusy(Exception):
+    """Le pool de hachage est saturé ou n'a pas répondu à temps"""
+
+
+class PasswordHasher:
+    """Extension Flask : pool borné pour bcrypt"""
+
+    def __init__(self, app=None):
+        self.rounds = 12
+        self.workers = 2
+        self.queue_size = 32
+        self.timeout = 5.0
+        self._executor = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.rounds = app.config.setdefault(
+            "BCRYPT_ROUNDS", int(os.environ.get("BCRYPT_ROUNDS", 12))
+        )
+        self.workers = app.config.setdefault(
+            "BCRYPT_WORKERS", int(os.environ.get("BCRYPT_WORKERS", 2))
+        )
+        self.queue_size = app.config.setdefault(
+            "BCRYPT_QUEUE_SIZE", int(os.environ.get("BCRYPT_QUEUE_SIZE", 32))
+        )
+        self.timeout = app.config.setdefault(
+            "BCRYPT_TIMEOUT", float(os.environ.get("BCRYPT_TIMEOUT", 5))
+        )
+        self.shutdown()
+
+    def _pool(self):
+        # Créé à la demande, et recréé après un fork de gunicorn : les
+        # threads du processus parent n'existent pas dans le fils
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.workers,
+                        thread_name_prefix="bcrypt"
+                    )
+                    self._slots = threading.BoundedSemaphore(
+                        self.workers + self.queue_size
+                    )
+                    self._pid = os.getpid()
+        return self._executor, self._slots
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False)
+            self._executor = None
+            self._pid = None
+
+    def _run(self, operation, function, *args):
+        executor, slots = self._pool()
+        if not slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = executor.submit(function, *args)
+        except Exception:
+            slots.release()
+            raise
+        future.add_done_callback(lambda _: slots.release())
+        started = time.perf_counter()
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PasswordHasherBusy()
+        finally:
+            observe_bcrypt(operation, time.perf_counter() - started)
+
+    def hash(self, password):
+        """Hash bcrypt d'un mot de passe au coût configuré"""
+        return self._run(
+            "hash",
+            bcrypt.hashpw,
+            password.encode("utf-8"),
+            bcrypt.gensalt(self.rounds)
+        ).decode("utf-8")
+
+    def verify(self, password, hashed):
+        return self._run(
+            "verify",
+            bcrypt.checkpw,
+            password.encode("utf-8"),
+            hashed.encode("utf-8")
+        )
+
+    def needs_rehash(self, hashed):
+        """Vrai si le hash a été calculé avec un autre coût"""
+        try:
+            return int(hashed.split("$")[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
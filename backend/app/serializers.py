@@ -0,0 +1,234 @@
+"""Formes de sortie JSON des modèles.
+
+Chaque sérialiseur déclare les relations dont il a besoin et les charge en
+même temps que la requête principale (joinedload pour les relations
+simples, selectinload pour les collections). Une liste se sérialise ainsi
+en un nombre constant de requêtes, quelle que soit la taille de la page.
+"""
+from functools import lru_cache
+
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+from app.models import Match, Ranking, Registration, Tournament, User
+
+
+class Serializer:
+    """Forme de sortie d'un modèle et relations à précharger"""
+
+    def __init__(self, model, dump, *loaders):
+        self.model = model
+        self.dump = dump
+        self.loaders = loaders
+
+    def query(self, query=None):
+        """Ajoute le préchargement des relations à une requête"""
+        if query is None:
+            query = self.model.query
+        return query.options(*self.loaders)
+
+    def get_or_404(self, ident):
+        return self.query().filter(
+            self.model.id == ident
+        ).first_or_404()
+
+    def many(self, items):
+        return [self.dump(item) for item in items]
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def split_fields(value):
+    """Noms séparés par des virgules (paramètres fields/include)"""
+    if not value:
+        return ()
+    return tuple(name.strip() for name in value.split(',') if name.strip())
+
+
+def user_summary(user):
+    return {
+        'id': user.id,
+        'name': user.name,
+        'profile_picture': user.profile_picture
+    } if user else None
+
+
+def tournament_summary(tournament):
+    return {
+        'id': tournament.id,
+        'name': tournament.name,
+        'start_date': tournament.start_date.isoformat(),
+        'end_date': tournament.end_date.isoformat()
+    }
+
+
+def _match_fields(match):
+    return {
+        'id': match.id,
+        'tournament_id': match.tournament_id,
+        'round': match.round,
+        'player1_id': match.player1_id,
+        'player2_id': match.player2_id,
+        'winner_id': match.winner_id,
+        'score': match.score,
+        'status': match.status,
+        'scheduled_time': (
+            match.start_time.isoformat() if match.start_time else None
+        )
+    }
+
+
+def _match(match):
+    return {
+        **_match_fields(match),
+        'player1': user_summary(match.player1),
+        'player2': user_summary(match.player2),
+        'winner': user_summary(match.winner)
+    }
+
+
+def _registration(registration):
+    return {
+        **registration.to_dict(),
+        'user': user_summary(registration.user)
+    }
+
+
+def _registration_detail(registration):
+    return {
+        **_registration(registration),
+        'tournament': tournament_summary(registration.tournament)
+    }
+
+
+def _tournament_ranking(ranking):
+    return {
+        'rank': ranking.rank,
+        'user': user_summary(ranking.user)
+    }
+
+
+def _user_ranking(ranking):
+    return {
+        'tournament': tournament_summary(ranking.tournament),
+        'rank': ranking.rank
+    }
+
+
+MATCH_FIELDS = Serializer(Match, _match_fields)
+MATCH = Serializer(
+    Match, _match,
+    joinedload(Match.player1),
+    joinedload(Match.player2),
+    joinedload(Match.winner)
+)
+MATCH_DETAIL = Serializer(
+    Match, Match.to_dict,
+    joinedload(Match.player1),
+    joinedload(Match.player2),
+    joinedload(Match.winner),
+    joinedload(Match.loser)
+)
+REGISTRATION = Serializer(
+    Registration, _registration,
+    joinedload(Registration.user)
+)
+REGISTRATION_DETAIL = Serializer(
+    Registration, _registration_detail,
+    joinedload(Registration.user),
+    joinedload(Registration.tournament)
+)
+TOURNAMENT_RANKING = Serializer(
+    Ranking, _tournament_ranking,
+    joinedload(Ranking.user)
+)
+USER_RANKING = Serializer(
+    Ranking, _user_ranking,
+    joinedload(Ranking.tournament)
+)
+
+# Champs disponibles pour les tournois : (colonne à charger, valeur)
+TOURNAMENT_FIELDS = {
+    'id': (Tournament.id, lambda t: t.id),
+    'name': (Tournament.name, lambda t: t.name),
+    'description': (Tournament.description, lambda t: t.description),
+    'start_date': (Tournament.start_date, lambda t: _iso(t.start_date)),
+    'end_date': (Tournament.end_date, lambda t: _iso(t.end_date)),
+    'registration_deadline': (
+        Tournament.registration_deadline,
+        lambda t: _iso(t.registration_deadline)
+    ),
+    'max_participants': (
+        Tournament.max_participants, lambda t: t.max_participants
+    ),
+    'current_participants': (
+        Tournament.current_participants, lambda t: t.current_participants
+    ),
+    'status': (Tournament.status, lambda t: t.status),
+    'format': (Tournament.format, lambda t: t.format),
+    'rules': (Tournament.rules, lambda t: t.rules),
+    'prize_pool': (Tournament.prize_pool, lambda t: t.prize_pool),
+    'organizer': (Tournament.organizer_id, lambda t: {
+        'id': t.organizer.id,
+        'name': t.organizer.name
+    } if t.organizer else None),
+    'created_at': (Tournament.created_at, lambda t: _iso(t.created_at)),
+    'updated_at': (Tournament.updated_at, lambda t: _iso(t.updated_at)),
+}
+TOURNAMENT_INCLUDES = {
+    'registrations': (
+        selectinload(Tournament.registrations),
+        lambda t: [r.to_dict() for r in t.registrations]
+    ),
+}
+# Les listes ne chargent pas les textes longs ni les inscriptions
+TOURNAMENT_SUMMARY_FIELDS = tuple(
+    name for name in TOURNAMENT_FIELDS
+    if name not in ('description', 'rules', 'prize_pool')
+)
+
+
+@lru_cache(maxsize=64)
+def tournament_serializer(fields=None, include=()):
+    """Sérialiseur de tournoi limité aux champs et relations demandés.
+
+    Seules les colonnes nécessaires sont chargées (load_only).
+    """
+    for name in fields or ():
+        if name not in TOURNAMENT_FIELDS:
+            raise ValueError(f'Champ inconnu : {name}')
+    for name in include:
+        if name not in TOURNAMENT_INCLUDES:
+            raise ValueError(f'Relation inconnue : {name}')
+    fields = fields or tuple(TOURNAMENT_FIELDS)
+
+    def dump(tournament):
+        data = {
+            name: TOURNAMENT_FIELDS[name][1](tournament) for name in fields
+        }
+        for name in include:
+            data[name] = TOURNAMENT_INCLUDES[name][1](tournament)
+        return data
+
+    return Serializer(
+        Tournament, dump,
+        load_only(*[TOURNAMENT_FIELDS[name][0] for name in fields]),
+        *[TOURNAMENT_INCLUDES[name][0] for name in include]
+    )
+
+
+def requested_tournament_serializer(args, fields=None, include=()):
+    """Sérialiseur correspondant aux paramètres fields/include d'une
+    requête, ceux passés en argument servant de valeurs par défaut"""
+    if 'fields' in args:
+        fields = split_fields(args.get('fields'))
+    if 'include' in args:
+        include = split_fields(args.get('include'))
+    return tournament_serializer(fields or None, include)
+
+
+USER = Serializer(
+    User, User.to_dict,
+    selectinload(User.roles)
+)
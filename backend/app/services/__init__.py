@@ -0,0 +1 @@
+# Services métier partagés par les routes (génération de brackets, etc.)
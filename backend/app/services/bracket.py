@@ -0,0 +1,356 @@
+"""Génération des brackets d'un tournoi.
+
+Le graphe complet des matchs (byes compris) est calculé en mémoire à partir
+des inscriptions, puis écrit en une seule insertion groupée.
+"""
+from sqlalchemy import tuple_
+
+from app import db, event_hub
+from app.models import Bracket, Match, Registration
+
+FORMATS = ('single_elimination', 'double_elimination', 'round_robin')
+
+# Les deux routes d'inscription n'utilisent pas le même statut
+ACTIVE_REGISTRATION_STATUSES = ('confirmed', 'registered')
+
+
+class BracketError(ValueError):
+    """Erreur de génération ou d'avancement d'un bracket"""
+
+
+class _Node:
+    """Match en cours de construction"""
+
+    __slots__ = (
+        'bracket', 'round', 'position', 'players', 'dead', 'winner',
+        'status', 'next', 'loser_next'
+    )
+
+    def __init__(self, bracket, round, position):
+        self.bracket = bracket
+        self.round = round
+        self.position = position
+        self.players = [None, None]
+        # Slot qui ne recevra jamais de joueur (bye)
+        self.dead = [False, False]
+        self.winner = None
+        self.status = 'pending'
+        self.next = None
+        self.loser_next = None
+
+    def to_row(self, tournament_id):
+        next_node, next_slot = self.next or (None, None)
+        loser_node, loser_slot = self.loser_next or (None, None)
+        return {
+            'tournament_id': tournament_id,
+            'bracket': self.bracket,
+            'round': self.round,
+            'bracket_position': self.position,
+            'player1_id': self.players[0],
+            'player2_id': self.players[1],
+            'winner_id': self.winner,
+            'status': self.status,
+            'next_match_position': next_node.position if next_node else None,
+            'next_match_slot': next_slot,
+            'loser_match_position': (
+                loser_node.position if loser_node else None
+            ),
+            'loser_match_slot': loser_slot,
+        }
+
+
+def seed_order(size):
+    """Ordre standard des têtes de série pour un bracket de `size` places"""
+    order = [1]
+    while len(order) < size:
+        total = len(order) * 2 + 1
+        order = [s for seed in order for s in (seed, total - seed)]
+    return order
+
+
+def _link(source, target, slot, loser=False):
+    if loser:
+        source.loser_next = (target, slot)
+    else:
+        source.next = (target, slot)
+
+
+def _elimination_nodes(player_ids, double):
+    """Construit les noeuds d'une simple ou double élimination"""
+    size = 2
+    while size < len(player_ids):
+        size *= 2
+    rounds = size.bit_length() - 1
+    nodes = []
+    round_counts = {}
+
+    def new_node(bracket, round):
+        node = _Node(bracket, round, len(nodes) + 1)
+        nodes.append(node)
+        return node
+
+    # Winners bracket : le premier round suit l'ordre des têtes de série
+    order = seed_order(size)
+    winners = []
+    current = []
+    for i in range(size // 2):
+        node = new_node('winners', 1)
+        for slot, seed in enumerate(order[2 * i:2 * i + 2]):
+            if seed <= len(player_ids):
+                node.players[slot] = player_ids[seed - 1]
+            else:
+                node.dead[slot] = True
+        current.append(node)
+    winners.append(current)
+    for r in range(2, rounds + 1):
+        previous, current = current, []
+        for j in range(len(previous) // 2):
+            node = new_node('winners', r)
+            _link(previous[2 * j], node, 1)
+            _link(previous[2 * j + 1], node, 2)
+            current.append(node)
+        winners.append(current)
+    round_counts['winners'] = rounds
+
+    if not double:
+        return nodes, round_counts
+
+    # Losers bracket : alterne rounds "mineurs" (perdants du winners
+    # bracket) et rounds "majeurs" (survivants du losers bracket entre eux)
+    losers_final = None
+    if rounds >= 2:
+        current = []
+        for j in range(size // 4):
+            node = new_node('losers', 1)
+            _link(winners[0][2 * j], node, 1, loser=True)
+            _link(winners[0][2 * j + 1], node, 2, loser=True)
+            current.append(node)
+        losers_round = 1
+        for r in range(1, rounds):
+            # Les perdants arrivent dans l'ordre inverse un round sur deux
+            # pour éviter les revanches immédiates
+            dropping = winners[r]
+            if r % 2:
+                dropping = dropping[::-1]
+            losers_round += 1
+            previous, current = current, []
+            for j, node_from_winners in enumerate(dropping):
+                node = new_node('losers', losers_round)
+                _link(previous[j], node, 1)
+                _link(node_from_winners, node, 2, loser=True)
+                current.append(node)
+            if len(current) == 1:
+                break
+            losers_round += 1
+            previous, current = current, []
+            for j in range(len(previous) // 2):
+                node = new_node('losers', losers_round)
+                _link(previous[2 * j], node, 1)
+                _link(previous[2 * j + 1], node, 2)
+                current.append(node)
+        losers_final = current[0]
+        round_counts['losers'] = losers_round
+
+    grand_final = new_node('grand_final', 1)
+    _link(winners[-1][0], grand_final, 1)
+    if losers_final is not None:
+        _link(losers_final, grand_final, 2)
+    else:
+        # Deux joueurs : la finale est une revanche du seul match
+        _link(winners[-1][0], grand_final, 2, loser=True)
+    round_counts['grand_final'] = 1
+    return nodes, round_counts
+
+
+def _push(target_slot, player, dead):
+    target, slot = target_slot
+    if dead:
+        target.dead[slot - 1] = True
+    elif player is not None:
+        target.players[slot - 1] = player
+
+
+def _resolve_byes(nodes):
+    """Propage les byes dans l'ordre topologique (ordre de création)"""
+    for node in nodes:
+        dead_count = node.dead.count(True)
+        if dead_count:
+            node.status = 'bye'
+            if dead_count == 1:
+                # Le joueur seul passe directement, dès qu'il est connu
+                node.winner = node.players[node.dead.index(False)]
+        if node.next:
+            _push(node.next, node.winner, dead_count == 2)
+        if node.loser_next:
+            _push(node.loser_next, None, dead_count > 0)
+
+
+def _round_robin_nodes(player_ids):
+    """Méthode du cercle : chaque joueur rencontre tous les autres"""
+    players = list(player_ids)
+    if len(players) % 2:
+        players.append(None)
+    count = len(players)
+    nodes = []
+    for r in range(1, count):
+        for i in range(count // 2):
+            first, second = players[i], players[count - 1 - i]
+            if first is None or second is None:
+                continue
+            node = _Node('round_robin', r, len(nodes) + 1)
+            node.players = [first, second]
+            nodes.append(node)
+        players = [players[0], players[-1]] + players[1:-1]
+    return nodes, {'round_robin': count - 1}
+
+
+def plan_bracket(format, player_ids, tournament_id=None):
+    """Calcule en mémoire les lignes de matchs d'un tournoi.
+
+    `player_ids` est trié par tête de série. Retourne le nombre de rounds par
+    type de bracket et la liste des lignes à insérer dans `matches`.
+    """
+    if format not in FORMATS:
+        raise BracketError(f'Format de tournoi inconnu : {format}')
+    if len(player_ids) < 2:
+        raise BracketError('Il faut au moins deux joueurs inscrits')
+
+    if format == 'round_robin':
+        nodes, round_counts = _round_robin_nodes(player_ids)
+    else:
+        nodes, round_counts = _elimination_nodes(
+            player_ids, double=format == 'double_elimination'
+        )
+        _resolve_byes(nodes)
+    return round_counts, [node.to_row(tournament_id) for node in nodes]
+
+
+def seeded_player_ids(tournament_id):
+    """Joueurs actifs d'un tournoi, triés par tête de série"""
+    rows = db.session.query(Registration.user_id).filter(
+        Registration.tournament_id == tournament_id,
+        Registration.status.in_(ACTIVE_REGISTRATION_STATUSES)
+    ).order_by(
+        Registration.seed.is_(None),
+        Registration.seed,
+        Registration.registration_date,
+        Registration.id
+    ).all()
+    return [row.user_id for row in rows]
+
+
+def generate_bracket(tournament, reset=False):
+    """Génère et enregistre tous les matchs d'un tournoi en une transaction"""
+    has_brackets = db.session.query(
+        Bracket.query.filter_by(tournament_id=tournament.id).exists()
+    ).scalar()
+    if has_brackets and not reset:
+        raise BracketError('Le bracket de ce tournoi a déjà été généré')
+
+    format = tournament.format or 'single_elimination'
+    round_counts, rows = plan_bracket(
+        format, seeded_player_ids(tournament.id), tournament.id
+    )
+
+    try:
+        if has_brackets:
+            Match.query.filter_by(tournament_id=tournament.id).delete(
+                synchronize_session=False
+            )
+            Bracket.query.filter_by(tournament_id=tournament.id).delete(
+                synchronize_session=False
+            )
+
+        brackets = {
+            type: Bracket(
+                tournament_id=tournament.id,
+                type=type,
+                round_count=round_count
+            )
+            for type, round_count in round_counts.items()
+        }
+        db.session.add_all(brackets.values())
+        db.session.flush()
+
+        for row in rows:
+            row['bracket_id'] = brackets[row.pop('bracket')].id
+        db.session.execute(Match.__table__.insert(), rows)
+        event_hub.notify(tournament.id, 'bracket', {'matches': len(rows)})
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return list(brackets.values()), len(rows)
+
+
+def load_targets(matches):
+    """Matchs suivants de plusieurs matchs, en une requête, indexés par
+    (tournoi, position) pour `advance_match`"""
+    keys = {
+        (m.tournament_id, position)
+        for m in matches
+        for position in (m.next_match_position, m.loser_match_position)
+        if position is not None
+    }
+    if not keys:
+        return {}
+    return {
+        (m.tournament_id, m.bracket_position): m
+        for m in Match.query.filter(
+            tuple_(Match.tournament_id, Match.bracket_position).in_(keys)
+        )
+    }
+
+
+def advance_match(match, targets=None):
+    """Place le gagnant et le perdant d'un match dans les matchs suivants.
+
+    Les matchs "bye" qui reçoivent leur unique joueur sont résolus en
+    cascade. `targets` (voir `load_targets`) évite de relire les matchs
+    suivants déjà chargés. Ne fait pas de commit.
+    """
+    if match.winner_id is None:
+        return
+    if match.winner_id not in (match.player1_id, match.player2_id):
+        raise BracketError("Le gagnant doit être l'un des deux joueurs")
+    if match.status != 'bye':
+        match.loser_id = (
+            match.player2_id if match.winner_id == match.player1_id
+            else match.player1_id
+        )
+
+    if targets is None:
+        targets = {}
+    pending = [match]
+    while pending:
+        current = pending.pop()
+        moves = [(current.next_match_position, current.next_match_slot,
+                  current.winner_id)]
+        if current.loser_id is not None:
+            moves.append((current.loser_match_position,
+                          current.loser_match_slot, current.loser_id))
+        moves = [move for move in moves if move[0] is not None]
+        if not moves:
+            continue
+
+        missing = [
+            position for position, _, _ in moves
+            if (current.tournament_id, position) not in targets
+        ]
+        if missing:
+            targets.update(
+                ((m.tournament_id, m.bracket_position), m)
+                for m in Match.query.filter(
+                    Match.tournament_id == current.tournament_id,
+                    Match.bracket_position.in_(missing)
+                )
+            )
+        for position, slot, player_id in moves:
+            target = targets.get((current.tournament_id, position))
+            if target is None:
+                continue
+            setattr(target, f'player{slot}_id', player_id)
+            if target.status == 'bye' and target.winner_id is None:
+                target.winner_id = player_id
+                pending.append(target)
@@ -0,0 +1,281 @@
+"""Statistiques d'utilisation des personnages.
+
+La table `character_usage` compte, pour chaque personnage, les matchs
+terminés où il a été joué et ceux gagnés, à trois niveaux : tous matchs
+confondus, par tournoi et par joueur. Elle est mise à jour par deltas
+quand un résultat est enregistré ou que les personnages d'un match
+changent, et peut être reconstruite entièrement avec
+`rebuild_character_usage`.
+
+Un match compte dès qu'il a un vainqueur.
+"""
+from sqlalchemy import case, delete, insert, literal, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app import db
+from app.models import Character, CharacterUsage, Match
+from app.models.character import match_characters
+from app.models.character_usage import ALL, usage_scope
+
+
+class CharacterUsageError(ValueError):
+    """Personnages d'un match invalides"""
+
+
+def _match_picks(match_id):
+    """(personnage, jeu, joueur) joués dans un match"""
+    return [pick for _, *pick in _picks_by_match([match_id])]
+
+
+def _picks_by_match(match_ids):
+    """(match, personnage, jeu, joueur) joués dans plusieurs matchs"""
+    return db.session.query(
+        match_characters.c.match_id,
+        match_characters.c.character_id,
+        Character.game,
+        match_characters.c.player_id
+    ).join(
+        Character, Character.id == match_characters.c.character_id
+    ).filter(
+        match_characters.c.match_id.in_(match_ids)
+    ).all()
+
+
+def _add_deltas(deltas, picks, tournament_id, winner_id, sign):
+    for character_id, game, player_id in picks:
+        win = sign if player_id == winner_id else 0
+        for key in (
+            (character_id, ALL, ALL),
+            (character_id, tournament_id, ALL),
+            (character_id, ALL, player_id),
+        ):
+            entry = deltas.setdefault(key, [game, 0, 0])
+            entry[1] += sign
+            entry[2] += win
+
+
+def _added_values(table, added):
+    """Affectations qui ajoutent la ligne proposée `added` à la ligne
+    existante. win_rate d'abord : MySQL évalue chaque affectation avec les
+    valeurs déjà mises à jour par les précédentes."""
+    matches = table.c.matches + added.matches
+    wins = table.c.wins + added.wins
+    return [
+        ("win_rate", case((matches > 0, wins * 1.0 / matches), else_=0.0)),
+        ("matches", matches),
+        ("wins", wins),
+    ]
+
+
+def _apply(deltas):
+    """Ajoute les deltas {clé: [jeu, matchs, victoires]} à la table, en un
+    seul INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE : pas de lecture
+    préalable, et deux transactions qui créent la même ligne s'additionnent
+    au lieu de se heurter à la clé primaire"""
+    rows = [
+        {
+            "character_id": key[0], "tournament_id": key[1],
+            "player_id": key[2], "game": game, "matches": matches,
+            "wins": wins, "win_rate": wins / matches if matches else 0.0
+        }
+        for key, (game, matches, wins) in deltas.items()
+        if (matches, wins) != (0, 0)
+    ]
+    if not rows:
+        return
+
+    table = CharacterUsage.__table__
+    if db.engine.dialect.name == 'mysql':
+        statement = mysql_insert(table)
+        statement = statement.on_duplicate_key_update(
+            _added_values(table, statement.inserted)
+        )
+    else:
+        statement = sqlite_insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=[
+                table.c.character_id, table.c.tournament_id,
+                table.c.player_id
+            ],
+            set_=dict(_added_values(table, statement.excluded))
+        )
+    db.session.execute(statement, rows)
+
+
+def record_match_usage(match, previous_winner_id=None):
+    """Met à jour les statistiques après l'enregistrement du résultat d'un
+    match. Ne fait pas de commit."""
+    record_matches_usage([(match, previous_winner_id)])
+
+
+def record_matches_usage(results):
+    """Version groupée de `record_match_usage` pour une liste de
+    (match, ancien gagnant) : une lecture des personnages, une écriture
+    des deltas. Ne fait pas de commit."""
+    changed = [
+        (match, previous_winner_id)
+        for match, previous_winner_id in results
+        if previous_winner_id != match.winner_id
+    ]
+    if not changed:
+        return
+    picks = {}
+    for match_id, *pick in _picks_by_match([m.id for m, _ in changed]):
+        picks.setdefault(match_id, []).append(pick)
+
+    deltas = {}
+    for match, previous_winner_id in changed:
+        match_picks = picks.get(match.id, [])
+        if previous_winner_id is not None:
+            _add_deltas(
+                deltas, match_picks, match.tournament_id,
+                previous_winner_id, -1
+            )
+        if match.winner_id is not None:
+            _add_deltas(
+                deltas, match_picks, match.tournament_id, match.winner_id, 1
+            )
+    _apply(deltas)
+
+
+def set_match_characters(match, picks):
+    """Remplace les personnages joués dans un match.
+
+    `picks` est une liste de {'player_id', 'character_id'}. Si le match a
+    déjà un vainqueur, les statistiques sont corrigées en conséquence. Ne
+    fait pas de commit.
+    """
+    players = {match.player1_id, match.player2_id} - {None}
+    rows = []
+    for pick in picks:
+        try:
+            player_id = int(pick['player_id'])
+            character_id = int(pick['character_id'])
+        except (KeyError, TypeError, ValueError):
+            raise CharacterUsageError(
+                'Chaque personnage doit avoir un player_id et un character_id'
+            )
+        if player_id not in players:
+            raise CharacterUsageError(
+                f'Le joueur {player_id} ne participe pas à ce match'
+            )
+        rows.append({
+            'match_id': match.id,
+            'player_id': player_id,
+            'character_id': character_id
+        })
+
+    character_ids = {row['character_id'] for row in rows}
+    if len(character_ids) != len(rows):
+        raise CharacterUsageError(
+            'Un personnage ne peut être joué qu\'une fois par match'
+        )
+    known = {
+        character_id for character_id, in db.session.query(
+            Character.id
+        ).filter(Character.id.in_(character_ids))
+    }
+    if known != character_ids:
+        raise CharacterUsageError(
+            f'Personnages inconnus : {sorted(character_ids - known)}'
+        )
+
+    deltas = {}
+    if match.winner_id is not None:
+        _add_deltas(
+            deltas, _match_picks(match.id), match.tournament_id,
+            match.winner_id, -1
+        )
+    db.session.execute(
+        delete(match_characters).where(
+            match_characters.c.match_id == match.id
+        )
+    )
+    if rows:
+        db.session.execute(match_characters.insert(), rows)
+    if match.winner_id is not None:
+        _add_deltas(
+            deltas, _match_picks(match.id), match.tournament_id,
+            match.winner_id, 1
+        )
+    _apply(deltas)
+
+
+def remove_match_usage(match):
+    """Retire un match des statistiques avant sa suppression, avec ses
+    personnages. Ne fait pas de commit."""
+    if match.winner_id is not None:
+        deltas = {}
+        _add_deltas(
+            deltas, _match_picks(match.id), match.tournament_id,
+            match.winner_id, -1
+        )
+        _apply(deltas)
+    db.session.execute(
+        delete(match_characters).where(
+            match_characters.c.match_id == match.id
+        )
+    )
+
+
+def rebuild_character_usage():
+    """Recalcule toute la table à partir de match_characters, en une
+    requête INSERT ... SELECT par niveau"""
+    db.session.execute(delete(CharacterUsage))
+
+    picks = select(
+        match_characters.c.character_id,
+        Character.game,
+        Match.tournament_id,
+        match_characters.c.player_id,
+        case((Match.winner_id == match_characters.c.player_id, 1), else_=0)
+        .label('won')
+    ).join(
+        Match, Match.id == match_characters.c.match_id
+    ).join(
+        Character, Character.id == match_characters.c.character_id
+    ).where(
+        Match.winner_id.isnot(None)
+    ).subquery()
+
+    matches = db.func.count()
+    wins = db.func.sum(picks.c.won)
+    # Regroupement sur les seules vraies colonnes : MySQL lirait une
+    # constante dans GROUP BY comme un numéro de colonne
+    for tournament_key, player_key, group_by in (
+        (literal(ALL), literal(ALL), ()),
+        (picks.c.tournament_id, literal(ALL), (picks.c.tournament_id,)),
+        (literal(ALL), picks.c.player_id, (picks.c.player_id,)),
+    ):
+        db.session.execute(
+            insert(CharacterUsage).from_select(
+                [
+                    'character_id', 'tournament_id', 'player_id', 'game',
+                    'matches', 'wins', 'win_rate'
+                ],
+                select(
+                    picks.c.character_id, tournament_key, player_key,
+                    picks.c.game, matches, wins, wins * 1.0 / matches
+                ).group_by(picks.c.character_id, picks.c.game, *group_by)
+            )
+        )
+    db.session.commit()
+    return CharacterUsage.query.filter_by(
+        tournament_id=ALL, player_id=ALL
+    ).count()
+
+
+def roster_usage(game=None, tournament_id=None, player_id=None):
+    """Statistiques de tous les personnages d'un niveau, les plus joués
+    d'abord (lecture sur l'index ix_character_usage_scope). Lève
+    UsageScopeError si tournoi et joueur sont donnés ensemble."""
+    tournament_id, player_id = usage_scope(tournament_id, player_id)
+    query = CharacterUsage.query.filter_by(
+        tournament_id=tournament_id, player_id=player_id
+    )
+    if game:
+        query = query.filter_by(game=game)
+    return query.order_by(
+        CharacterUsage.matches.desc(), CharacterUsage.character_id
+    ).all()
@@ -0,0 +1,164 @@
+"""Classement global matérialisé.
+
+La table `leaderboard` contient, pour chaque joueur classé, le nombre de
+tournois joués, son rang moyen et sa position déjà triée. Elle est mise à
+jour pour les seuls joueurs touchés lorsqu'un classement de tournoi change.
+"""
+from sqlalchemy import select, update
+
+from app import db
+from app.models import LeaderboardEntry, Ranking
+
+# Taille des lots pour les requêtes IN et les insertions groupées
+CHUNK_SIZE = 1000
+
+
+def _chunks(items, size=CHUNK_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _aggregates(user_ids=None):
+    """Nombre de tournois et rang moyen, calculés sur `rankings`"""
+    query = db.session.query(
+        Ranking.user_id,
+        db.func.count(Ranking.id),
+        db.func.sum(Ranking.rank)
+    ).group_by(Ranking.user_id)
+    if user_ids is not None:
+        query = query.filter(Ranking.user_id.in_(user_ids))
+    # La moyenne est calculée en Python pour être identique d'un appel à
+    # l'autre, quel que soit le moteur SQL
+    return {
+        user_id: (count, float(total) / count)
+        for user_id, count, total in query
+    }
+
+
+def _reposition(low, high):
+    """Renumérote les positions des entrées dont le rang moyen est entre
+    `low` et `high` ; les autres positions ne peuvent pas avoir changé."""
+    offset = LeaderboardEntry.query.filter(
+        LeaderboardEntry.average_rank < low
+    ).count()
+    ordered = select(
+        LeaderboardEntry.user_id,
+        (
+            db.func.row_number().over(
+                order_by=(
+                    LeaderboardEntry.average_rank,
+                    LeaderboardEntry.user_id
+                )
+            ) + offset
+        ).label('position')
+    ).where(
+        LeaderboardEntry.average_rank.between(low, high)
+    ).subquery()
+    db.session.execute(
+        update(LeaderboardEntry).where(
+            LeaderboardEntry.user_id == ordered.c.user_id
+        ).values(position=ordered.c.position),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def refresh_leaderboard(user_ids):
+    """Met à jour les entrées des joueurs donnés. Ne fait pas de commit."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+
+    db.session.flush()
+    keys = []
+    size_change = 0
+    for chunk in _chunks(user_ids):
+        existing = {
+            entry.user_id: entry
+            for entry in LeaderboardEntry.query.filter(
+                LeaderboardEntry.user_id.in_(chunk)
+            )
+        }
+        aggregates = _aggregates(chunk)
+        inserts = []
+        for user_id in chunk:
+            entry = existing.get(user_id)
+            aggregate = aggregates.get(user_id)
+            if entry is not None:
+                keys.append(entry.average_rank)
+            if aggregate is None:
+                if entry is not None:
+                    db.session.delete(entry)
+                    size_change -= 1
+                continue
+            count, average_rank = aggregate
+            keys.append(average_rank)
+            if entry is None:
+                inserts.append({
+                    'user_id': user_id,
+                    'tournaments_participated': count,
+                    'average_rank': average_rank,
+                    'position': 0
+                })
+            else:
+                entry.tournaments_participated = count
+                entry.average_rank = average_rank
+        db.session.flush()
+        if inserts:
+            db.session.execute(LeaderboardEntry.__table__.insert(), inserts)
+            size_change += len(inserts)
+
+    if not keys:
+        return
+    low, high = min(keys), max(keys)
+    _reposition(low, high)
+    if size_change:
+        # Les entrées ajoutées ou supprimées décalent toutes celles d'après
+        LeaderboardEntry.query.filter(
+            LeaderboardEntry.average_rank > high
+        ).update(
+            {LeaderboardEntry.position: LeaderboardEntry.position + size_change},
+            synchronize_session=False
+        )
+
+
+def refresh_tournament_leaderboard(tournament_id, ranks=None):
+    """Met à jour les joueurs classés dans un tournoi.
+
+    `ranks` limite la mise à jour à une plage (min, max) de rangs du
+    tournoi, celle qui vient de bouger.
+    """
+    query = db.session.query(Ranking.user_id).filter(
+        Ranking.tournament_id == tournament_id
+    )
+    if ranks is not None:
+        query = query.filter(Ranking.rank.between(*ranks))
+    refresh_leaderboard(user_id for user_id, in query)
+
+
+def rebuild_leaderboard():
+    """Reconstruit entièrement la table `leaderboard`"""
+    aggregates = _aggregates()
+    ordered = sorted(
+        aggregates.items(),
+        key=lambda item: (item[1][1], item[0])
+    )
+    try:
+        LeaderboardEntry.query.delete()
+        for start in range(0, len(ordered), CHUNK_SIZE):
+            db.session.execute(LeaderboardEntry.__table__.insert(), [
+                {
+                    'user_id': user_id,
+                    'tournaments_participated': count,
+                    'average_rank': average_rank,
+                    'position': position
+                }
+                for position, (user_id, (count, average_rank)) in enumerate(
+                    ordered[start:start + CHUNK_SIZE], start + 1
+                )
+            ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(ordered)
@@ -0,0 +1,124 @@
+"""Saisie groupée des résultats de matchs.
+
+Les mises à jour sont validées ensemble, les matchs visés lus en une
+requête et appliqués dans une seule transaction. Les traitements en aval
+ne sont faits qu'une fois pour tout le lot : un recalcul des classements
+par tournoi touché, une lecture des classements Glicko-2 et une écriture
+des statistiques de personnages.
+"""
+from datetime import datetime
+
+from app.models import Match
+from app.services.bracket import BracketError, advance_match, load_targets
+from app.services.character_usage import record_matches_usage
+from app.services.rankings import recompute_tournament_rankings
+from app.services.ratings import record_match_ratings
+
+STATUSES = ('scheduled', 'in_progress', 'completed', 'cancelled')
+FIELDS = ('winner_id', 'score', 'status')
+
+
+class MatchResultError(ValueError):
+    """Lot refusé ; `errors` donne l'erreur de chaque résultat fautif"""
+
+    def __init__(self, errors):
+        super().__init__('Résultats invalides')
+        self.errors = errors
+
+
+def _validate(updates):
+    errors, seen = [], set()
+
+    def error(index, update, message):
+        errors.append({
+            'index': index,
+            'match_id': update.get('match_id')
+            if isinstance(update, dict) else None,
+            'error': message
+        })
+
+    for index, update in enumerate(updates):
+        if not isinstance(update, dict):
+            error(index, update, 'Objet attendu')
+            continue
+        match_id = update.get('match_id')
+        if not isinstance(match_id, int):
+            error(index, update, 'Missing required field: match_id')
+        elif match_id in seen:
+            error(index, update, 'Match présent deux fois dans le lot')
+        elif not any(field in update for field in FIELDS):
+            error(index, update, 'Aucun champ à mettre à jour')
+        elif 'status' in update and update['status'] not in STATUSES:
+            error(index, update, 'Invalid status')
+        elif update.get('winner_id') is not None and not isinstance(
+            update['winner_id'], int
+        ):
+            error(index, update, 'winner_id invalide')
+        seen.add(match_id)
+    return errors
+
+
+def report_results(updates):
+    """Applique une liste de {match_id, winner_id, score, status}.
+
+    Lève MatchResultError sans rien modifier si un résultat est invalide ;
+    l'appelant doit alors annuler la transaction. Renvoie les matchs mis à
+    jour, dans l'ordre du lot. Ne fait pas de commit.
+    """
+    if not isinstance(updates, list) or not updates:
+        raise MatchResultError([{'error': 'Liste de résultats attendue'}])
+    errors = _validate(updates)
+    if errors:
+        raise MatchResultError(errors)
+
+    matches = {
+        m.id: m for m in Match.query.filter(
+            Match.id.in_([update['match_id'] for update in updates])
+        )
+    }
+    errors = [
+        {'index': index, 'match_id': update['match_id'],
+         'error': 'Match introuvable'}
+        for index, update in enumerate(updates)
+        if update['match_id'] not in matches
+    ]
+    if errors:
+        raise MatchResultError(errors)
+
+    # Matchs suivants de tout le lot chargés d'un coup ; un match du lot
+    # peut recevoir le gagnant d'un autre match du lot
+    targets = load_targets(matches.values())
+    results = []
+    for index, update in enumerate(updates):
+        match = matches[update['match_id']]
+        if 'score' in update:
+            match.score = update['score']
+        if 'status' in update:
+            match.status = update['status']
+        if 'winner_id' not in update:
+            continue
+
+        previous_winner_id = match.winner_id
+        match.winner_id = update['winner_id']
+        match.end_time = datetime.utcnow() if match.winner_id else None
+        try:
+            advance_match(match, targets)
+        except BracketError as e:
+            errors.append({
+                'index': index, 'match_id': match.id, 'error': str(e)
+            })
+            continue
+        results.append((match, previous_winner_id))
+    if errors:
+        raise MatchResultError(errors)
+
+    # Une seule passe en aval pour tout le lot
+    for tournament_id in sorted({
+        match.tournament_id for match, previous_winner_id in results
+        if previous_winner_id != match.winner_id
+    }):
+        recompute_tournament_rankings(tournament_id, commit=False)
+    record_match_ratings(results)
+    record_matches_usage(results)
+
+    return [matches[update['match_id']] for update in updates]
@@ -0,0 +1,224 @@
+"""Classements des tournois.
+
+Les classements sont mis à jour de façon incrémentale à chaque résultat de
+match ; le recalcul complet reste disponible pour vérifier ou réparer un
+tournoi et s'exécute en une seule requête ensembliste.
+"""
+from sqlalchemy import and_, case, literal, or_, select, union_all
+
+from app import db, event_hub
+from app.models import Match, Ranking, Registration
+from app.services.bracket import ACTIVE_REGISTRATION_STATUSES
+from app.services.leaderboard import (
+    refresh_leaderboard,
+    refresh_tournament_leaderboard
+)
+
+
+def _reorder(ranking, old_rank):
+    """Remonte un classement dont les points ont augmenté.
+
+    Seules les lignes dépassées (rangs entre le nouveau et l'ancien) sont
+    décalées, en un seul UPDATE.
+    """
+    db.session.flush()
+    better = Ranking.query.filter(
+        Ranking.tournament_id == ranking.tournament_id,
+        Ranking.id != ranking.id,
+        or_(
+            Ranking.points > ranking.points,
+            and_(
+                Ranking.points == ranking.points,
+                Ranking.user_id < ranking.user_id
+            )
+        )
+    ).count()
+    new_rank = better + 1
+    if new_rank < old_rank:
+        Ranking.query.filter(
+            Ranking.tournament_id == ranking.tournament_id,
+            Ranking.rank >= new_rank,
+            Ranking.rank < old_rank
+        ).update(
+            {Ranking.rank: Ranking.rank + 1},
+            synchronize_session='evaluate'
+        )
+    ranking.rank = new_rank
+    return new_rank
+
+
+def record_match_result(match, previous_winner_id=None):
+    """Met à jour les classements des deux joueurs d'un match terminé.
+
+    Un changement de gagnant déjà comptabilisé déclenche un recalcul
+    complet du tournoi. Ne fait pas de commit.
+    """
+    if previous_winner_id is not None:
+        if previous_winner_id != match.winner_id:
+            recompute_tournament_rankings(match.tournament_id, commit=False)
+        return
+    if match.winner_id is None or match.status == 'bye':
+        return
+
+    loser_id = (
+        match.player2_id if match.winner_id == match.player1_id
+        else match.player1_id
+    )
+    results = [(match.winner_id, 'win')]
+    if loser_id is not None:
+        results.append((loser_id, 'loss'))
+
+    rankings = {
+        r.user_id: r
+        for r in Ranking.query.filter(
+            Ranking.tournament_id == match.tournament_id,
+            Ranking.user_id.in_([user_id for user_id, _ in results])
+        )
+    }
+    size = None
+    moved = []
+    for user_id, result in results:
+        ranking = rankings.get(user_id)
+        if ranking is None:
+            # Nouveau classé : il entre en dernière position
+            if size is None:
+                size = Ranking.query.filter_by(
+                    tournament_id=match.tournament_id
+                ).count()
+            size += 1
+            ranking = Ranking(
+                tournament_id=match.tournament_id,
+                user_id=user_id,
+                rank=size
+            )
+            db.session.add(ranking)
+        old_rank = ranking.rank
+        ranking.calculate_points(result)
+        moved += [_reorder(ranking, old_rank), old_rank]
+
+    # Seuls les joueurs dont le rang a bougé changent de rang moyen
+    refresh_tournament_leaderboard(
+        match.tournament_id, ranks=(min(moved), max(moved))
+    )
+    event_hub.notify(match.tournament_id, 'rankings')
+
+
+def match_loser_id():
+    """Expression SQL du perdant d'un match, que loser_id soit rempli ou non"""
+    return case(
+        (Match.winner_id == Match.player1_id, Match.player2_id),
+        else_=Match.player1_id
+    )
+
+
+def standings_query(tournament_id):
+    """Classement complet d'un tournoi calculé à partir des matchs"""
+    finished = and_(
+        Match.tournament_id == tournament_id,
+        Match.winner_id.isnot(None),
+        Match.status != 'bye'
+    )
+    loser_id = match_loser_id()
+    results = union_all(
+        select(
+            Match.winner_id.label('user_id'),
+            literal(1).label('won'),
+            literal(0).label('lost')
+        ).where(finished),
+        select(loser_id, literal(0), literal(1)).where(finished),
+        # Les inscrits sans match terminé sont classés avec 0 point
+        select(Registration.user_id, literal(0), literal(0)).where(
+            Registration.tournament_id == tournament_id,
+            Registration.status.in_(ACTIVE_REGISTRATION_STATUSES)
+        )
+    ).subquery()
+
+    totals = select(
+        results.c.user_id,
+        db.func.sum(results.c.won).label('won'),
+        db.func.sum(results.c.lost).label('lost')
+    ).where(
+        results.c.user_id.isnot(None)
+    ).group_by(
+        results.c.user_id
+    ).subquery()
+
+    points = (
+        totals.c.won * Ranking.WIN_POINTS
+        + totals.c.lost * Ranking.LOSS_POINTS
+    )
+    return select(
+        literal(tournament_id).label('tournament_id'),
+        totals.c.user_id,
+        db.func.row_number().over(
+            order_by=(points.desc(), totals.c.user_id)
+        ).label('rank'),
+        points.label('points'),
+        (totals.c.won + totals.c.lost).label('matches_played'),
+        totals.c.won.label('matches_won'),
+        totals.c.lost.label('matches_lost')
+    )
+
+
+def recompute_tournament_rankings(tournament_id, commit=True):
+    """Reconstruit les classements d'un tournoi en INSERT ... SELECT"""
+    user_ids = db.session.query(Ranking.user_id).filter_by(
+        tournament_id=tournament_id
+    )
+    previous_user_ids = {user_id for user_id, in user_ids}
+    Ranking.query.filter_by(tournament_id=tournament_id).delete(
+        synchronize_session='fetch'
+    )
+    columns = [
+        'tournament_id', 'user_id', 'rank', 'points',
+        'matches_played', 'matches_won', 'matches_lost'
+    ]
+    db.session.execute(
+        Ranking.__table__.insert().from_select(
+            columns, standings_query(tournament_id)
+        )
+    )
+    refresh_leaderboard(
+        previous_user_ids | {user_id for user_id, in user_ids}
+    )
+    event_hub.notify(tournament_id, 'rankings')
+    if commit:
+        db.session.commit()
+
+
+def ranking_discrepancies(tournament_id):
+    """Compare les classements enregistrés au recalcul complet.
+
+    Les inscrits sans match terminé n'ont de ligne qu'après un recalcul
+    complet : ils sont ignorés des deux côtés. Un match rapporte au moins
+    un point, ils sont donc toujours derniers et le rang des autres n'en
+    dépend pas.
+    """
+    expected = {
+        row.user_id: row
+        for row in db.session.execute(standings_query(tournament_id))
+        if row.matches_played
+    }
+    stored = {
+        r.user_id: r
+        for r in Ranking.query.filter(
+            Ranking.tournament_id == tournament_id,
+            Ranking.matches_played > 0
+        )
+    }
+    fields = ('rank', 'points', 'matches_played', 'matches_won', 'matches_lost')
+    discrepancies = []
+    for user_id in sorted(set(expected) | set(stored)):
+        row, ranking = expected.get(user_id), stored.get(user_id)
+        differences = {
+            field: {
+                'expected': getattr(row, field) if row else None,
+                'stored': getattr(ranking, field) if ranking else None
+            }
+            for field in fields
+            if (getattr(row, field) if row else None)
+            != (getattr(ranking, field) if ranking else None)
+        }
+        if differences:
+            discrepancies.append({'user_id': user_id, 'fields': differences})
+    return discrepancies
@@ -0,0 +1,272 @@
+"""Classement Glicko-2 des joueurs.
+
+Chaque match terminé met à jour les deux joueurs (une période d'un seul
+match). Le rejeu complet de l'historique regroupe les matchs en périodes
+chronologiques et calcule chaque période sur des tableaux NumPy.
+"""
+import math
+import os
+
+import numpy as np
+from sqlalchemy import and_, select
+
+from app import db
+from app.models import Match, Rating
+from app.services.rankings import match_loser_id
+
+# Échelle Glicko-2 et paramètre de volatilité du système
+SCALE = 173.7178
+TAU = float(os.environ.get("RATING_TAU", 0.5))
+EPSILON = 1e-6
+PERIOD_DAYS = int(os.environ.get("RATING_PERIOD_DAYS", 7))
+CHUNK_SIZE = 10000
+
+
+def _volatility(delta, phi, sigma, v):
+    """Nouvelle volatilité (algorithme d'Illinois), vectorisé"""
+    a = np.log(sigma ** 2)
+    delta2, phi2 = delta ** 2, phi ** 2
+
+    def f(x):
+        ex = np.exp(x)
+        return (
+            ex * (delta2 - phi2 - v - ex) / (2 * (phi2 + v + ex) ** 2)
+            - (x - a) / TAU ** 2
+        )
+
+    A = a.copy()
+    B = np.where(
+        delta2 > phi2 + v,
+        np.log(np.maximum(delta2 - phi2 - v, EPSILON)),
+        a - TAU
+    )
+    # Recherche de la borne basse quand delta² <= phi² + v
+    searching = delta2 <= phi2 + v
+    k = np.ones_like(a)
+    while True:
+        below = searching & (f(a - k * TAU) < 0)
+        if not below.any():
+            break
+        k[below] += 1
+        searching = below
+    B = np.where(delta2 > phi2 + v, B, a - k * TAU)
+
+    fA, fB = f(A), f(B)
+    active = np.abs(B - A) > EPSILON
+    while active.any():
+        C = A + (A - B) * fA / (fB - fA)
+        fC = f(C)
+        swap = active & (fC * fB <= 0)
+        halve = active & ~(fC * fB <= 0)
+        A = np.where(swap, B, A)
+        fA = np.where(swap, fB, np.where(halve, fA / 2, fA))
+        B = np.where(active, C, B)
+        fB = np.where(active, fC, fB)
+        active = np.abs(B - A) > EPSILON
+    return np.exp(A / 2)
+
+
+def rate_period(mu, phi, sigma, winners, losers, seen=None):
+    """Applique une période de classement Glicko-2 sur place.
+
+    `mu`, `phi` et `sigma` sont indexés par joueur (échelle Glicko-2),
+    `winners`/`losers` sont les indices des joueurs de chaque match. Les
+    joueurs `seen` sans match dans la période voient leur incertitude
+    augmenter.
+    """
+    players = np.concatenate((winners, losers))
+    opponents = np.concatenate((losers, winners))
+    scores = np.concatenate((
+        np.ones(len(winners)), np.zeros(len(losers))
+    ))
+
+    g = 1 / np.sqrt(1 + 3 * phi[opponents] ** 2 / math.pi ** 2)
+    expected = 1 / (1 + np.exp(-g * (mu[players] - mu[opponents])))
+    v_inv = np.bincount(
+        players, g ** 2 * expected * (1 - expected), minlength=len(mu)
+    )
+    delta_sum = np.bincount(
+        players, g * (scores - expected), minlength=len(mu)
+    )
+
+    active = v_inv > 0
+    if seen is not None:
+        idle = seen & ~active
+        phi[idle] = np.sqrt(phi[idle] ** 2 + sigma[idle] ** 2)
+
+    v = 1 / v_inv[active]
+    new_sigma = _volatility(
+        v * delta_sum[active], phi[active], sigma[active], v
+    )
+    phi_star = np.sqrt(phi[active] ** 2 + new_sigma ** 2)
+    new_phi = 1 / np.sqrt(1 / phi_star ** 2 + 1 / v)
+    mu[active] += new_phi ** 2 * delta_sum[active]
+    phi[active] = new_phi
+    sigma[active] = new_sigma
+
+
+def replay_arrays(winners, losers, timestamps, player_count,
+                  period_seconds=PERIOD_DAYS * 86400):
+    """Rejoue des matchs triés chronologiquement.
+
+    Retourne les tableaux (rating, rating_deviation, volatility,
+    matches_played) indexés par joueur.
+    """
+    mu = np.zeros(player_count)
+    phi = np.full(player_count, Rating.DEFAULT_DEVIATION / SCALE)
+    sigma = np.full(player_count, Rating.DEFAULT_VOLATILITY)
+    seen = np.zeros(player_count, dtype=bool)
+    played = np.bincount(winners, minlength=player_count) + np.bincount(
+        losers, minlength=player_count
+    )
+
+    if len(winners):
+        periods = (timestamps - timestamps[0]) // period_seconds
+        bounds = np.flatnonzero(np.diff(periods)) + 1
+        for start, end in zip(
+            np.concatenate(([0], bounds)),
+            np.concatenate((bounds, [len(winners)]))
+        ):
+            rate_period(
+                mu, phi, sigma, winners[start:end], losers[start:end], seen
+            )
+            seen[winners[start:end]] = True
+            seen[losers[start:end]] = True
+
+    return (
+        mu * SCALE + Rating.DEFAULT_RATING,
+        phi * SCALE,
+        sigma,
+        played
+    )
+
+
+def _completed_matches():
+    """Matchs terminés, dans l'ordre chronologique"""
+    played_at = db.func.coalesce(Match.end_time, Match.start_time)
+    # Matchs sans date (antérieurs à l'enregistrement de end_time) en
+    # dernier, dans l'ordre de création
+    return select(
+        Match.winner_id, match_loser_id(), played_at
+    ).where(
+        and_(Match.winner_id.isnot(None), Match.status != 'bye')
+    ).order_by(played_at.is_(None), played_at, Match.id)
+
+
+def match_timestamps(played_at):
+    """Horodatages en secondes des matchs triés par `_completed_matches`.
+
+    Les matchs sans date, placés après les autres, sont comptés dans la
+    période du dernier match daté (ou de l'époque s'il n'y en a aucun).
+    """
+    timestamps = np.zeros(len(played_at), dtype=np.int64)
+    last = 0
+    for index, value in enumerate(played_at):
+        if value is not None:
+            last = int(value.timestamp())
+        timestamps[index] = last
+    return timestamps
+
+
+def replay_ratings():
+    """Recalcule le classement de tous les joueurs depuis l'historique"""
+    winner_ids, loser_ids, dates = [], [], []
+    result = db.session.execute(
+        _completed_matches(), execution_options={'yield_per': CHUNK_SIZE}
+    )
+    for winner_id, loser_id, played_at in result:
+        if loser_id is None:
+            continue
+        winner_ids.append(winner_id)
+        loser_ids.append(loser_id)
+        dates.append(played_at)
+
+    user_ids, indices = np.unique(
+        np.array(winner_ids + loser_ids, dtype=np.int64),
+        return_inverse=True
+    )
+    count = len(winner_ids)
+    ratings, deviations, volatilities, played = replay_arrays(
+        indices[:count], indices[count:],
+        match_timestamps(dates), len(user_ids)
+    )
+
+    try:
+        Rating.query.delete()
+        for start in range(0, len(user_ids), CHUNK_SIZE):
+            end = start + CHUNK_SIZE
+            db.session.execute(Rating.__table__.insert(), [
+                {
+                    'user_id': int(user_id),
+                    'rating': float(rating),
+                    'rating_deviation': float(deviation),
+                    'volatility': float(volatility),
+                    'matches_played': int(matches)
+                }
+                for user_id, rating, deviation, volatility, matches in zip(
+                    user_ids[start:end], ratings[start:end],
+                    deviations[start:end], volatilities[start:end],
+                    played[start:end]
+                )
+            ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(user_ids), count
+
+
+def record_match_rating(match, previous_winner_id=None):
+    """Met à jour le classement des deux joueurs d'un match terminé.
+
+    Les corrections de résultat ne sont pas rejouées ici : le classement
+    dépend de l'ordre des matchs, il faut relancer `replay_ratings`.
+    Ne fait pas de commit.
+    """
+    record_match_ratings([(match, previous_winner_id)])
+
+
+def record_match_ratings(results):
+    """Version groupée de `record_match_rating` pour une liste de
+    (match, ancien gagnant) : les classements des joueurs sont lus en une
+    requête, puis chaque match est appliqué dans l'ordre. Ne fait pas de
+    commit."""
+    pairs = []
+    for match, previous_winner_id in results:
+        if previous_winner_id is not None or match.winner_id is None:
+            continue
+        if match.status == 'bye':
+            continue
+        loser_id = (
+            match.player2_id if match.winner_id == match.player1_id
+            else match.player1_id
+        )
+        if loser_id is not None:
+            pairs.append((match.winner_id, loser_id))
+    if not pairs:
+        return
+
+    user_ids = {user_id for pair in pairs for user_id in pair}
+    ratings = {
+        r.user_id: r
+        for r in Rating.query.filter(Rating.user_id.in_(user_ids))
+    }
+    for user_id in user_ids:
+        if user_id not in ratings:
+            ratings[user_id] = Rating(user_id=user_id)
+            db.session.add(ratings[user_id])
+
+    for pair in pairs:
+        rows = [ratings[user_id] for user_id in pair]
+        mu = np.array([
+            (r.rating - Rating.DEFAULT_RATING) / SCALE for r in rows
+        ])
+        phi = np.array([r.rating_deviation / SCALE for r in rows])
+        sigma = np.array([r.volatility for r in rows])
+        rate_period(mu, phi, sigma, np.array([0]), np.array([1]))
+
+        for i, rating in enumerate(rows):
+            rating.rating = float(mu[i] * SCALE + Rating.DEFAULT_RATING)
+            rating.rating_deviation = float(phi[i] * SCALE)
+            rating.volatility = float(sigma[i])
+            rating.matches_played += 1
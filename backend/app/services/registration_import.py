@@ -0,0 +1,196 @@
+"""Import en masse des inscrits d'un tournoi.
+
+Le fichier (CSV avec en-tête, ou NDJSON) est lu ligne à ligne depuis le
+flux de la requête et traité par lots de CHUNK_SIZE lignes : une requête IN
+pour retrouver les joueurs par email, une pour les inscriptions existantes,
+une mise à jour du compteur de places et une insertion groupée, puis un
+commit. Chaque ligne reçoit un résultat dans le rapport.
+
+Les places restantes sont attribuées dans l'ordre du fichier ; au-delà,
+les inscrits sont mis en liste d'attente dans ce même ordre.
+"""
+import csv
+import json
+from datetime import datetime
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app import db, event_hub
+from app.models import Registration, User
+from app.services.registrations import (
+    WAITING,
+    RegistrationError,
+    add_participants,
+    free_spots,
+    register_player
+)
+
+CHUNK_SIZE = 1000
+
+FORMATS = ('csv', 'ndjson')
+
+
+class ImportFormatError(ValueError):
+    """Fichier d'import illisible"""
+
+
+def _decoded(lines):
+    for raw in lines:
+        yield raw.decode('utf-8-sig') if isinstance(raw, bytes) else raw
+
+
+def parse_csv(lines):
+    """(numéro de ligne, email, seed) pour chaque ligne d'un CSV avec
+    en-tête contenant au moins une colonne email"""
+    reader = csv.DictReader(_decoded(lines))
+    if not reader.fieldnames or 'email' not in reader.fieldnames:
+        raise ImportFormatError('La colonne email est requise')
+    for row in reader:
+        yield reader.line_num, row.get('email'), row.get('seed')
+
+
+def parse_ndjson(lines):
+    """(numéro de ligne, email, seed) pour chaque objet JSON d'un NDJSON"""
+    for line_num, line in enumerate(_decoded(lines), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            yield line_num, None, ValueError('JSON invalide')
+            continue
+        if not isinstance(row, dict):
+            yield line_num, None, ValueError('Objet JSON attendu')
+            continue
+        yield line_num, row.get('email'), row.get('seed')
+
+
+def _chunks(rows, size=CHUNK_SIZE):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _seed(value):
+    if value is None or value == '':
+        return None
+    if isinstance(value, ValueError):
+        raise value
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Seed invalide : {value}')
+
+
+def _import_chunk(tournament_id, chunk, seen, report):
+    emails = {
+        email.strip() for _, email, _ in chunk
+        if isinstance(email, str) and email.strip()
+    }
+    # IN sur la colonne indexée (avec aussi la forme en minuscules), la
+    # correspondance se faisant ensuite sans tenir compte de la casse
+    emails |= {email.lower() for email in emails}
+    users = {
+        email.lower(): user_id for email, user_id in db.session.execute(
+            select(User.email, User.id).where(User.email.in_(emails))
+        )
+    } if emails else {}
+    registered = set(db.session.execute(
+        select(Registration.user_id).where(
+            Registration.tournament_id == tournament_id,
+            Registration.user_id.in_(list(users.values()))
+        )
+    ).scalars()) if users else set()
+
+    accepted = []
+    for line_num, email, seed in chunk:
+        result = {'line': line_num, 'email': email}
+        report.append(result)
+        try:
+            seed = _seed(seed)
+        except ValueError as e:
+            result.update(status='error', error=str(e))
+            continue
+        key = email.strip().lower() if isinstance(email, str) else ''
+        user_id = users.get(key)
+        if not key:
+            result.update(status='error', error='Email manquant')
+        elif user_id is None:
+            result.update(status='error', error='Utilisateur inconnu')
+        elif user_id in registered:
+            result.update(status='error', error='Already registered')
+        elif user_id in seen:
+            result.update(status='error', error='Doublon dans le fichier')
+        else:
+            seen.add(user_id)
+            result.update(user_id=user_id, seed=seed)
+            accepted.append((result, user_id, seed))
+    if not accepted:
+        return
+
+    # Places libres lues sous verrou, puis prises en une mise à jour
+    free = free_spots(tournament_id)
+    free = len(accepted) if free is None else min(free, len(accepted))
+
+    now = datetime.utcnow()
+    rows = []
+    for index, (result, user_id, seed) in enumerate(accepted):
+        result['status'] = 'registered' if index < free else WAITING
+        rows.append({
+            'user_id': user_id,
+            'tournament_id': tournament_id,
+            'registration_date': now,
+            'status': result['status'],
+            'seed': seed
+        })
+    add_participants(tournament_id, free)
+    for status in ('registered', WAITING):
+        user_ids = [row['user_id'] for row in rows if row['status'] == status]
+        if user_ids:
+            event_hub.notify_registrations(tournament_id, status, user_ids)
+    # Insertion dans l'ordre du fichier : à date égale, l'id départage la
+    # liste d'attente
+    db.session.execute(Registration.__table__.insert(), rows)
+
+
+def _import_one_by_one(tournament, chunk_report):
+    """Repli quand une inscription concurrente fait échouer le lot"""
+    for result in chunk_report:
+        if 'user_id' not in result:
+            continue
+        try:
+            registration = register_player(tournament, result['user_id'])
+        except RegistrationError as e:
+            result.update(status='error', error=str(e))
+            continue
+        registration.seed = result['seed']
+        result['status'] = registration.status
+        db.session.commit()
+
+
+def import_registrations(tournament, lines, format='csv'):
+    """Importe les inscrits décrits par `lines` (itérable de lignes).
+
+    Renvoie le rapport ligne par ligne. Valide un commit par lot ; une
+    erreur de format du fichier lève ImportFormatError.
+    """
+    if format not in FORMATS:
+        raise ImportFormatError(f'Format inconnu : {format}')
+    parse = parse_csv if format == 'csv' else parse_ndjson
+
+    report, seen = [], set()
+    for chunk in _chunks(parse(lines)):
+        start = len(report)
+        try:
+            _import_chunk(tournament.id, chunk, seen, report)
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            _import_one_by_one(tournament, report[start:])
+    return report
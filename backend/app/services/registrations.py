@@ -0,0 +1,281 @@
+"""Inscriptions aux tournois.
+
+La capacité est garantie par un UPDATE conditionnel sur
+`tournaments.current_participants`, exécuté avant l'insertion : la base
+incrémente le compteur seulement s'il reste une place, et verrouille la
+ligne du tournoi jusqu'au commit. La contrainte unique (user_id,
+tournament_id) empêche les doubles inscriptions. Chaque inscription fait
+un nombre constant de requêtes, sans charger la liste des inscrits.
+
+Quand le tournoi est complet, l'inscription passe en liste d'attente
+(statut waiting_list), ordonnée par date d'inscription. Toute place libérée
+est redonnée dans la même transaction aux premiers de la file, en une seule
+mise à jour quel que soit le nombre de places (index
+ix_registrations_waitlist).
+"""
+from datetime import datetime
+
+from sqlalchemy import and_, case, delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db, event_hub
+from app.models import Registration, Tournament
+from app.services.bracket import ACTIVE_REGISTRATION_STATUSES
+
+WAITING = 'waiting_list'
+CANCELLED = 'cancelled'
+
+# Une valeur NULL compte comme 0 inscrit
+_PARTICIPANTS = db.func.coalesce(Tournament.current_participants, 0)
+
+
+class RegistrationError(ValueError):
+    """Inscription refusée"""
+
+
+class TournamentFull(RegistrationError):
+    pass
+
+
+def _is_active(status):
+    return status in ACTIVE_REGISTRATION_STATUSES
+
+
+def _claim_spot(tournament_id):
+    """Prend une place si le tournoi n'est pas complet"""
+    result = db.session.execute(
+        update(Tournament).where(
+            Tournament.id == tournament_id,
+            or_(
+                Tournament.max_participants.is_(None),
+                _PARTICIPANTS < Tournament.max_participants
+            )
+        ).values(
+            current_participants=_PARTICIPANTS + 1
+        ).execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def _release_spots(tournament_id, count=1):
+    db.session.execute(
+        update(Tournament).where(
+            Tournament.id == tournament_id
+        ).values(
+            current_participants=case(
+                (_PARTICIPANTS > count, _PARTICIPANTS - count), else_=0
+            )
+        ).execution_options(synchronize_session=False)
+    )
+
+
+def free_spots(tournament_id):
+    """Places restantes (None si illimité), la ligne du tournoi restant
+    verrouillée jusqu'à la fin de la transaction : deux appels simultanés
+    ne peuvent pas distribuer la même place"""
+    max_participants, participants = db.session.execute(
+        select(Tournament.max_participants, _PARTICIPANTS).where(
+            Tournament.id == tournament_id
+        ).with_for_update()
+    ).one()
+    if max_participants is None:
+        return None
+    return max(max_participants - participants, 0)
+
+
+def add_participants(tournament_id, count):
+    """Compte `count` places de plus, après `free_spots`"""
+    if count:
+        db.session.execute(
+            update(Tournament).where(
+                Tournament.id == tournament_id
+            ).values(
+                current_participants=_PARTICIPANTS + count
+            ).execution_options(synchronize_session=False)
+        )
+
+
+def register_player(tournament, user_id, status='registered', waitlist=True):
+    """Inscrit un joueur et prend une place, dans la transaction en cours.
+
+    Si le tournoi est complet, l'inscription est mise en liste d'attente,
+    ou refusée avec TournamentFull si `waitlist` est faux. Lève
+    RegistrationError (déjà inscrit, date limite dépassée) ; la transaction
+    est alors annulée. Ne fait pas de commit.
+    """
+    if (tournament.registration_deadline and
+            datetime.utcnow() > tournament.registration_deadline):
+        raise RegistrationError('Registration deadline has passed')
+
+    # La place d'abord : l'UPDATE verrouille la ligne du tournoi en
+    # exclusif avant l'INSERT. Dans l'autre ordre, la vérification de clé
+    # étrangère d'InnoDB y pose un verrou partagé, et deux inscriptions
+    # simultanées qui demandent ensuite le verrou exclusif s'interbloquent.
+    if not _claim_spot(tournament.id):
+        if not waitlist:
+            db.session.rollback()
+            raise TournamentFull('Tournament is full')
+        status = WAITING
+
+    registration = Registration(
+        user_id=user_id,
+        tournament_id=tournament.id,
+        registration_date=datetime.utcnow(),
+        status=status
+    )
+    db.session.add(registration)
+    try:
+        db.session.flush()
+    except IntegrityError:
+        # Doublon : le rollback rend aussi la place prise
+        db.session.rollback()
+        raise RegistrationError('Already registered')
+
+    # Publié au commit seulement (app/events.py)
+    event_hub.notify_registrations(
+        tournament.id, registration.status, [user_id]
+    )
+    return registration
+
+
+def waitlist_position(registration):
+    """Rang dans la liste d'attente (1 = prochain promu), None sinon"""
+    if registration.status != WAITING:
+        return None
+    return Registration.query.filter(
+        Registration.tournament_id == registration.tournament_id,
+        Registration.status == WAITING,
+        or_(
+            Registration.registration_date < registration.registration_date,
+            and_(
+                Registration.registration_date
+                == registration.registration_date,
+                Registration.id < registration.id
+            )
+        )
+    ).count() + 1
+
+
+def promote_waitlist(tournament_id):
+    """Donne les places libres aux premiers de la liste d'attente, en une
+    mise à jour. Renvoie les ids des inscriptions promues. Ne fait pas de
+    commit."""
+    free = free_spots(tournament_id)
+    head = select(Registration.id, Registration.user_id).where(
+        Registration.tournament_id == tournament_id,
+        Registration.status == WAITING
+    ).order_by(Registration.registration_date, Registration.id)
+    if free is not None:
+        if free <= 0:
+            return []
+        head = head.limit(free)
+
+    rows = db.session.execute(head).all()
+    if not rows:
+        return []
+    ids = [row.id for row in rows]
+    promoted = db.session.execute(
+        update(Registration).where(
+            Registration.id.in_(ids),
+            Registration.status == WAITING
+        ).values(
+            status='registered'
+        ).execution_options(synchronize_session='fetch')
+    ).rowcount
+    add_participants(tournament_id, promoted)
+    event_hub.notify_registrations(
+        tournament_id, 'registered', [row.user_id for row in rows]
+    )
+    return ids
+
+
+def unregister_players(tournament_id, user_ids):
+    """Supprime les inscriptions de plusieurs joueurs (une équipe qui se
+    retire) et promeut la liste d'attente une seule fois. Renvoie le nombre
+    d'inscriptions supprimées. Ne fait pas de commit."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    selected = and_(
+        Registration.tournament_id == tournament_id,
+        Registration.user_id.in_(user_ids)
+    )
+    # Seules les inscriptions actives occupaient une place : on libère
+    # exactement ce que leur DELETE a supprimé, pour que deux retraits
+    # simultanés ne rendent pas deux fois les mêmes places
+    active = db.session.execute(
+        delete(Registration).where(
+            selected, Registration.status.in_(ACTIVE_REGISTRATION_STATUSES)
+        ).execution_options(synchronize_session='fetch')
+    ).rowcount
+    deleted = active + db.session.execute(
+        delete(Registration).where(selected).execution_options(
+            synchronize_session='fetch'
+        )
+    ).rowcount
+    if deleted:
+        event_hub.notify_registrations(tournament_id, 'removed', user_ids)
+    if active:
+        _release_spots(tournament_id, active)
+        promote_waitlist(tournament_id)
+    return deleted
+
+
+def unregister_player(tournament_id, user_id):
+    """Supprime l'inscription d'un joueur, libère sa place et promeut le
+    premier de la liste d'attente. Renvoie False s'il n'était pas inscrit.
+    Ne fait pas de commit."""
+    return unregister_players(tournament_id, [user_id]) > 0
+
+
+def change_registration_status(registration, status):
+    """Change le statut d'une inscription en tenant à jour les places.
+
+    Une inscription active qui est annulée ou mise en attente libère sa
+    place au profit de la liste d'attente. Une inscription annulée qui
+    redevient active reprend une place s'il en reste et que personne
+    n'attend, sinon elle passe en fin de liste d'attente. Une inscription
+    en attente n'est promue que par la file. Ne fait pas de commit.
+    """
+    previous = registration.status
+    if status == previous or (_is_active(status) and _is_active(previous)):
+        registration.status = status
+        if status != previous:
+            event_hub.notify_registrations(
+                registration.tournament_id, registration.status,
+                [registration.user_id]
+            )
+        return registration
+
+    if _is_active(status):
+        if previous == WAITING:
+            raise RegistrationError(
+                'Waiting list registrations are promoted in order'
+            )
+        registration.registration_date = datetime.utcnow()
+        waiting = Registration.query.filter_by(
+            tournament_id=registration.tournament_id, status=WAITING
+        ).limit(1).count()
+        if not waiting and _claim_spot(registration.tournament_id):
+            registration.status = status
+        else:
+            registration.status = WAITING
+        event_hub.notify_registrations(
+            registration.tournament_id, registration.status,
+            [registration.user_id]
+        )
+        return registration
+
+    if status == WAITING:
+        # Remise en attente : en fin de file
+        registration.registration_date = datetime.utcnow()
+    registration.status = status
+    event_hub.notify_registrations(
+        registration.tournament_id, registration.status,
+        [registration.user_id]
+    )
+    if _is_active(previous):
+        db.session.flush()
+        _release_spots(registration.tournament_id)
+        promote_waitlist(registration.tournament_id)
+    return registration
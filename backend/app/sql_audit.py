@@ -0,0 +1,182 @@
+"""Détection des N+1 et budget de requêtes SQL par route, pour les tests.
+
+Activé par SQL_AUDIT ("off" par défaut, "warn" ou "raise") : chaque
+instruction SQL exécutée pendant une requête HTTP est enregistrée avec ses
+paramètres et l'endroit du code de l'application qui l'a déclenchée. En fin
+de requête :
+- une route décorée par `@query_budget(n)` qui dépasse n requêtes ;
+- une instruction répétée au moins SQL_AUDIT_N1_THRESHOLD fois (3) avec des
+  paramètres différents, signature d'une relation chargée en boucle,
+sont signalées avec les instructions fautives et leurs sites d'appel :
+message d'avertissement en "warn", exception `QueryAuditError` en "raise"
+(le client de test la reçoit directement).
+
+Hors audit, aucun écouteur n'est installé et le décorateur ne fait que
+poser un attribut sur la vue.
+"""
+import os
+import traceback
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+MODES = ("off", "warn", "raise")
+
+_THIS_FILE = os.path.abspath(__file__)
+_APP_DIR = os.path.dirname(_THIS_FILE)
+
+
+class QueryAuditError(AssertionError):
+    """Budget de requêtes dépassé ou N+1 détecté"""
+
+
+def query_budget(max_queries):
+    """Nombre maximal de requêtes SQL d'une route. À placer juste sous
+    `@bp.route`."""
+    def decorator(view):
+        view.query_budget = max_queries
+        return view
+    return decorator
+
+
+def _call_site():
+    """Derniers appels situés dans le code de l'application"""
+    frames = [
+        frame for frame in traceback.extract_stack()[:-1]
+        if frame.filename.startswith(_APP_DIR) and
+        frame.filename != _THIS_FILE
+    ]
+    return " <- ".join(
+        f"{os.path.relpath(frame.filename, _APP_DIR)}:{frame.lineno}"
+        f" in {frame.name}"
+        for frame in reversed(frames[-3:])
+    ) or "?"
+
+
+class QueryLog:
+    """Instructions exécutées, avec paramètres et sites d'appel"""
+
+    def __init__(self):
+        self.queries = []
+
+    def __len__(self):
+        return len(self.queries)
+
+    def add(self, statement, parameters):
+        self.queries.append((statement, repr(parameters), _call_site()))
+
+    def repeated(self, threshold=3):
+        """[(instruction, exécutions, sites)] des instructions répétées avec
+        au moins `threshold` jeux de paramètres différents"""
+        groups = {}
+        for statement, parameters, site in self.queries:
+            group = groups.setdefault(statement, [0, set(), []])
+            group[0] += 1
+            group[1].add(parameters)
+            if site not in group[2]:
+                group[2].append(site)
+        return [
+            (statement, count, sites)
+            for statement, (count, parameters, sites) in groups.items()
+            if len(parameters) >= threshold
+        ]
+
+    def report(self):
+        return "\n".join(
+            f"  [{index}] {' '.join(statement.split())}\n"
+            f"      params {parameters}\n      depuis {site}"
+            for index, (statement, parameters, site)
+            in enumerate(self.queries, start=1)
+        )
+
+
+@contextmanager
+def record_queries(*engines):
+    """Enregistre les instructions exécutées par les moteurs donnés
+    (principal et réplicas) dans le bloc"""
+    log = QueryLog()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        log.add(statement, parameters)
+
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    try:
+        yield log
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", record)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+    if has_request_context() and "sql_audit" in g:
+        g.sql_audit.add(statement, parameters)
+
+
+def _budget(view):
+    while view is not None:
+        budget = getattr(view, "query_budget", None)
+        if budget is not None:
+            return budget
+        view = getattr(view, "__wrapped__", None)
+    return None
+
+
+def _before_request():
+    g.sql_audit = QueryLog()
+
+
+def _after_request(response):
+    log = g.pop("sql_audit", None)
+    if log is None:
+        return response
+    problems = []
+    budget = _budget(current_app.view_functions.get(request.endpoint))
+    if budget is not None and len(log) > budget:
+        problems.append(
+            f"{len(log)} requêtes pour un budget de {budget}"
+        )
+    threshold = current_app.config["SQL_AUDIT_N1_THRESHOLD"]
+    for statement, count, sites in log.repeated(threshold):
+        problems.append(
+            f"N+1 probable : {count} exécutions de "
+            f"« {' '.join(statement.split())[:120]} » depuis "
+            + " ; ".join(sites)
+        )
+    if not problems:
+        return response
+
+    message = (
+        f"{request.method} {request.full_path.rstrip('?')} "
+        f"({request.endpoint}) :\n- " + "\n- ".join(problems) +
+        "\nInstructions exécutées :\n" + log.report()
+    )
+    if current_app.config["SQL_AUDIT"] == "raise":
+        raise QueryAuditError(message)
+    current_app.logger.warning(message)
+    return response
+
+
+def init_sql_audit(app):
+    """Installe l'audit si SQL_AUDIT vaut warn ou raise"""
+    app.config.setdefault("SQL_AUDIT", os.environ.get("SQL_AUDIT", "off"))
+    app.config.setdefault(
+        "SQL_AUDIT_N1_THRESHOLD",
+        int(os.environ.get("SQL_AUDIT_N1_THRESHOLD", 3))
+    )
+    mode = app.config["SQL_AUDIT"]
+    if mode not in MODES:
+        raise ValueError(f"SQL_AUDIT inconnu : {mode}")
+    if mode == "off" or "sqlalchemy" not in app.extensions:
+        return
+
+    with app.app_context():
+        for engine in app.extensions["sqlalchemy"].engines.values():
+            if not event.contains(engine, "before_cursor_execute",
+                                  _before_cursor_execute):
+                event.listen(engine, "before_cursor_execute",
+                             _before_cursor_execute)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
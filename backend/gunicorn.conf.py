@@ -0,0 +1,56 @@
+"""Configuration gunicorn, lue automatiquement depuis le dossier courant.
+
+Les options de ligne de commande (Dockerfile) restent prioritaires.
+"""
+import os
+import shutil
+
+# Importé ici et non dans child_exit : un second SIGCHLD pendant l'import
+# le ferait échouer (import circulaire partiel)
+from prometheus_client import multiprocess
+
+# Journal d'accès de gunicorn sans la chaîne de requête (%(U)s au lieu de
+# %(r)s) : le flux SSE reçoit le JWT en ?jwt=, et ce journal ne passe pas
+# par le masquage de app/logs.py
+access_log_format = (
+    '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+)
+
+
+def on_starting(server):
+    # Métriques multiprocessus : les fichiers d'un lancement précédent
+    # fausseraient les compteurs
+    path = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if path:
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path, exist_ok=True)
+
+
+def post_fork(server, worker):
+    # Un thread tient au plus une connexion par base : pool dimensionné sur
+    # les threads du worker, sauf DB_POOL_SIZE explicite (l'application
+    # n'est chargée qu'après le fork)
+    if worker.cfg.threads > 1:
+        os.environ.setdefault("DB_POOL_SIZE", str(worker.cfg.threads))
+
+
+def post_worker_init(worker):
+    # Connexions et catalogue des personnages prêts avant la première
+    # requête du worker
+    from app.catalog import preload_catalog
+    from app.database import warm_up
+    warmed = warm_up(worker.wsgi)
+    if warmed:
+        worker.log.info("Pool de connexions préchauffé : %s", warmed)
+    catalog = preload_catalog(worker.wsgi)
+    if catalog is not None:
+        worker.log.info(
+            "Catalogue des personnages préchargé : %d personnages",
+            len(catalog.by_id)
+        )
+
+
+def child_exit(server, worker):
+    # Les jauges d'un worker arrêté ne doivent plus être agrégées
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        multiprocess.mark_process_dead(worker.pid)
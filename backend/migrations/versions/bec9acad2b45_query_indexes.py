@@ -0,0 +1,96 @@
+"""Index composites et contraintes d'unicité des routes les plus lues
+
+Revision ID: bec9acad2b45
+Revises: 
+Create Date: 2026-10-18 09:12:40.512744
+
+Les index suivent les filtres et les tris des routes :
+- matchs d'un tournoi par round et statut, matchs suivants d'un bracket ;
+- matchs et statistiques d'un joueur (player1_id OR player2_id) ;
+- inscription d'un joueur à un tournoi (unique) et liste d'attente ;
+- classement d'un tournoi et classements d'un joueur, triés par rang ;
+  un seul classement par joueur et par tournoi (unique).
+
+Les bases créées par `db.create_all()` à partir des modèles ont déjà ces
+index : seuls ceux qui manquent sont créés, la migration peut donc être
+appliquée sur toute base existante. Les tables absentes sont ignorées.
+Des doublons (inscriptions, classements) font échouer la création des
+contraintes d'unicité et sont à supprimer avant.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'bec9acad2b45'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+# (table, nom, colonnes, unique)
+INDEXES = [
+    ('matches', 'ix_matches_tournament_round_status',
+     ['tournament_id', 'round', 'status'], False),
+    ('matches', 'ix_matches_tournament_position',
+     ['tournament_id', 'bracket_position'], False),
+    ('matches', 'ix_matches_player1_status', ['player1_id', 'status'], False),
+    ('matches', 'ix_matches_player2_status', ['player2_id', 'status'], False),
+    ('matches', 'ix_matches_winner_status', ['winner_id', 'status'], False),
+    ('brackets', 'ix_brackets_tournament_id', ['tournament_id'], False),
+    ('tournaments', 'ix_tournaments_status', ['status'], False),
+    ('rankings', 'uq_rankings_tournament_user',
+     ['tournament_id', 'user_id'], True),
+    ('rankings', 'ix_rankings_tournament_rank',
+     ['tournament_id', 'rank'], False),
+    ('rankings', 'ix_rankings_user_rank', ['user_id', 'rank'], False),
+]
+
+# Déjà déclarés par les modèles avant cette révision : créés s'ils
+# manquent, conservés par downgrade
+EXISTING_INDEXES = [
+    ('registrations', 'uq_registrations_user_tournament',
+     ['user_id', 'tournament_id'], True),
+    ('registrations', 'ix_registrations_waitlist',
+     ['tournament_id', 'status', 'registration_date', 'id'], False),
+]
+
+
+def _existing(inspector, table):
+    """Noms des index et contraintes d'unicité d'une table"""
+    names = {index['name'] for index in inspector.get_indexes(table)}
+    names.update(
+        constraint['name']
+        for constraint in inspector.get_unique_constraints(table)
+    )
+    return names
+
+
+def upgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for table, name, columns, unique in EXISTING_INDEXES + INDEXES:
+        if table not in tables or name in _existing(inspector, table):
+            continue
+        if unique:
+            # batch_op : SQLite ne sait pas ajouter de contrainte à une
+            # table existante, la table est recréée
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.create_unique_constraint(name, columns)
+        else:
+            op.create_index(name, table, columns)
+        inspector.clear_cache()
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for table, name, columns, unique in reversed(INDEXES):
+        if table not in tables or name not in _existing(inspector, table):
+            continue
+        if unique:
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.drop_constraint(name, type_='unique')
+        else:
+            op.drop_index(name, table_name=table)
+        inspector.clear_cache()
@@ -0,0 +1,87 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Base SQLite en mémoire, sauf si une autre base est fournie
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import create_app, db
+from app.models import Match, Registration, Tournament, User
+from app.services.bracket import generate_bracket, plan_bracket
+
+ENTRANTS = int(os.environ.get("BENCH_ENTRANTS", 1024))
+# Le round robin est quadratique (523 776 matchs pour 1024 joueurs)
+ROUND_ROBIN_ENTRANTS = int(os.environ.get("BENCH_ROUND_ROBIN_ENTRANTS", 128))
+FORMATS = ("single_elimination", "double_elimination", "round_robin")
+
+
+def seed_tournament(format, entrants):
+    """Crée un tournoi et ses inscriptions avec des insertions groupées"""
+    now = datetime.utcnow()
+    first_id = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    db.session.execute(User.__table__.insert(), [
+        {
+            "id": first_id + i,
+            "name": f"Joueur {first_id + i}",
+            "email": f"joueur{first_id + i}@example.com",
+            # Hash fixe : bcrypt n'est pas mesuré ici
+            "password": "x",
+        }
+        for i in range(entrants)
+    ])
+    tournament = Tournament(
+        name=f"Bench {format}",
+        start_date=now,
+        end_date=now + timedelta(days=1),
+        registration_deadline=None,
+        organizer_id=first_id,
+        format=format
+    )
+    db.session.add(tournament)
+    db.session.flush()
+    db.session.execute(Registration.__table__.insert(), [
+        {
+            "user_id": first_id + i,
+            "tournament_id": tournament.id,
+            "registration_date": now,
+            "status": "confirmed",
+            "seed": i + 1,
+        }
+        for i in range(entrants)
+    ])
+    db.session.commit()
+    return tournament
+
+
+def bench_bracket():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        for format in FORMATS:
+            entrants = (
+                ROUND_ROBIN_ENTRANTS if format == "round_robin" else ENTRANTS
+            )
+            tournament = seed_tournament(format, entrants)
+            player_ids = list(range(1, entrants + 1))
+
+            start = time.perf_counter()
+            plan_bracket(format, player_ids, tournament.id)
+            planned = time.perf_counter() - start
+
+            start = time.perf_counter()
+            generate_bracket(tournament)
+            generated = time.perf_counter() - start
+
+            count = Match.query.filter_by(tournament_id=tournament.id).count()
+            print(
+                f"{format:<20} {entrants} joueurs, {count} matchs : "
+                f"calcul {planned * 1000:.1f} ms, "
+                f"génération complète {generated * 1000:.1f} ms"
+            )
+
+
+if __name__ == '__main__':
+    bench_bracket()
@@ -0,0 +1,386 @@
+"""Benchmark des routes les plus sollicitées de chaque blueprint.
+
+Deux modes (BENCH_MODE) :
+- "client" : client de test Flask dans le processus ; le nombre de
+  requêtes SQL est compté directement sur le moteur ;
+- "gunicorn" : vrai serveur gunicorn lancé sur la même base
+  (BENCH_WORKERS workers gthread, BENCH_CONCURRENCY clients en parallèle) ;
+  le nombre de requêtes SQL vient de /metrics.
+
+La base est remplie par scripts/generate_dataset.py (mêmes variables
+DATASET_*) si elle est vide. Pour chaque route : débit, latences p50, p95
+et p99 et requêtes SQL par requête HTTP, écrits en JSON dans BENCH_OUTPUT.
+Avec BENCH_BASELINE, les résultats sont comparés à un fichier précédent ;
+le script échoue si une route fait plus de requêtes SQL qu'avant.
+
+    python scripts/generate_dataset.py
+    BENCH_MODE=client python scripts/bench_endpoints.py
+    BENCH_MODE=gunicorn BENCH_BASELINE=bench_client.json \\
+        python scripts/bench_endpoints.py
+
+Le cache des réponses est désactivé par défaut (RESPONSE_CACHE_BACKEND) :
+on mesure le chemin complet jusqu'à la base.
+"""
+import http.client
+import json
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/smash_bench.db")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "none")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func
+
+from app import create_app, db
+from app.models import Character, Match, Registration, Tournament, User
+from app.sql_audit import record_queries
+from generate_dataset import PASSWORD, generate, settings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MODE = os.environ.get("BENCH_MODE", "client")
+REQUESTS = int(os.environ.get("BENCH_REQUESTS", 200))
+WARMUP = int(os.environ.get("BENCH_WARMUP", 10))
+WORKERS = int(os.environ.get("BENCH_WORKERS", 4))
+THREADS = int(os.environ.get("BENCH_THREADS", 8))
+CONCURRENCY = int(os.environ.get("BENCH_CONCURRENCY", 16))
+PORT = int(os.environ.get("BENCH_PORT", 5055))
+OUTPUT = os.environ.get("BENCH_OUTPUT", f"bench_{MODE}.json")
+BASELINE = os.environ.get("BENCH_BASELINE")
+
+# (nom, méthode, route) ; les identifiants {tournament}, {user}, {match},
+# {registration} et {character} sont tirés au hasard dans la base
+ENDPOINTS = [
+    ("auth.me", "GET", "/api/auth/me"),
+    ("auth.login", "POST", "/api/auth/login"),
+    ("tournaments.list", "GET", "/api/tournaments?per_page=20"),
+    ("tournaments.detail", "GET", "/api/tournaments/{tournament}"),
+    ("registrations.list", "GET",
+     "/api/tournaments/{tournament}/registrations"),
+    ("registrations.detail", "GET", "/api/registrations/{registration}"),
+    ("users.list", "GET", "/api/users?per_page=20"),
+    ("users.detail", "GET", "/api/users/{user}"),
+    ("users.tournaments", "GET", "/api/users/{user}/tournaments"),
+    ("users.stats", "GET", "/api/users/{user}/stats"),
+    ("users.matches", "GET", "/api/users/{user}/matches"),
+    ("matches.list", "GET", "/api/matches/tournaments/{tournament}/matches"),
+    ("matches.detail", "GET", "/api/matches/matches/{match}"),
+    ("rankings.global", "GET", "/api/rankings?per_page=20"),
+    ("rankings.tournament", "GET", "/api/rankings/tournaments/{tournament}"),
+    ("rankings.user", "GET", "/api/rankings/users/{user}"),
+    ("rankings.ratings", "GET", "/api/rankings/ratings?per_page=20"),
+    ("characters.list", "GET", "/api/characters"),
+    ("characters.usage", "GET", "/api/characters/usage"),
+    ("characters.detail", "GET", "/api/characters/{character}"),
+    ("search", "GET", "/api/search?q={name}"),
+]
+
+METRIC_LINE = re.compile(
+    r'^smash_db_queries_per_request_(sum|count)\{(.*)\} ([0-9.e+-]+)$'
+)
+
+
+def percentile(durations, fraction):
+    return durations[min(int(len(durations) * fraction), len(durations) - 1)]
+
+
+def summarize(durations, elapsed, errors, queries):
+    durations = sorted(durations)
+    return {
+        "requests": len(durations),
+        "errors": errors,
+        "throughput_rps": round(len(durations) / elapsed, 1),
+        "p50_ms": round(percentile(durations, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(durations, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(durations, 0.99) * 1000, 2),
+        "queries_per_request": (
+            round(queries, 2) if queries is not None else None
+        ),
+    }
+
+
+class Targets:
+    """Identifiants existants, pour construire des URL valides"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.max = {
+            "tournament": db.session.query(func.max(Tournament.id)).scalar(),
+            "user": db.session.query(func.max(User.id)).scalar(),
+            "match": db.session.query(func.max(Match.id)).scalar(),
+            "registration": db.session.query(
+                func.max(Registration.id)
+            ).scalar(),
+            "character": db.session.query(func.max(Character.id)).scalar(),
+        }
+        self.names = [
+            name[:4] for name, in db.session.query(User.name).limit(100)
+        ]
+
+    def url(self, template):
+        values = {key: self.rng.randint(1, high or 1)
+                  for key, high in self.max.items()}
+        values["name"] = self.rng.choice(self.names)
+        return template.format(**values)
+
+    def path(self, template):
+        """Chemin d'exemple, sans consommer de tirage : les deux modes
+        envoient les mêmes requêtes"""
+        values = dict.fromkeys(self.max, 1)
+        values["name"] = ""
+        return template.format(**values).split("?")[0]
+
+    def body(self, method):
+        if method != "POST":
+            return None
+        user_id = self.rng.randint(1, self.max["user"])
+        return {"email": f"joueur{user_id}@example.com", "password": PASSWORD}
+
+
+def bench_client(app, targets, headers):
+    client = app.test_client()
+    results = {}
+    for name, method, template in ENDPOINTS:
+        for _ in range(WARMUP):
+            client.open(targets.url(template), method=method,
+                        json=targets.body(method), headers=headers)
+        durations, errors, queries = [], 0, 0
+        started = time.perf_counter()
+        for _ in range(REQUESTS):
+            url, body = targets.url(template), targets.body(method)
+            with record_queries(*db.engines.values()) as log:
+                start = time.perf_counter()
+                response = client.open(url, method=method, json=body,
+                                       headers=headers)
+                durations.append(time.perf_counter() - start)
+            queries += len(log)
+            errors += response.status_code >= 400
+        results[name] = summarize(
+            durations, time.perf_counter() - started, errors,
+            queries / REQUESTS
+        )
+        results[name]["route"] = template
+        print_result(name, results[name])
+    return results
+
+
+def scrape_queries():
+    """{endpoint: (somme, nombre)} de l'histogramme des requêtes SQL"""
+    with urllib.request.urlopen(f"http://127.0.0.1:{PORT}/metrics") as r:
+        text = r.read().decode()
+    totals = {}
+    for line in text.splitlines():
+        match = METRIC_LINE.match(line)
+        if match is None:
+            continue
+        kind, labels, value = match.groups()
+        endpoint = re.search(r'endpoint="([^"]*)"', labels).group(1)
+        total = totals.setdefault(endpoint, [0.0, 0.0])
+        total[kind == "count"] += float(value)
+    return totals
+
+
+def start_gunicorn():
+    env = dict(os.environ)
+    env["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(prefix="smash_bench_")
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "gunicorn",
+            "--bind", f"127.0.0.1:{PORT}",
+            "--workers", str(WORKERS),
+            "--worker-class", "gthread", "--threads", str(THREADS),
+            "--log-level", "warning", "wsgi:app",
+        ],
+        cwd=BACKEND_DIR, env=env
+    )
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("gunicorn s'est arrêté au démarrage")
+        try:
+            scrape_queries()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("gunicorn ne répond pas")
+
+
+def run_load(requests, headers):
+    """Envoie les requêtes avec CONCURRENCY connexions keep-alive"""
+    durations, errors = [], [0]
+    lock = threading.Lock()
+    pending = iter(requests)
+
+    def worker():
+        connection = http.client.HTTPConnection("127.0.0.1", PORT)
+        while True:
+            with lock:
+                item = next(pending, None)
+            if item is None:
+                break
+            method, url, body = item
+            request_headers = dict(headers)
+            if body is not None:
+                body = json.dumps(body)
+                request_headers["Content-Type"] = "application/json"
+            start = time.perf_counter()
+            connection.request(method, url, body=body,
+                               headers=request_headers)
+            response = connection.getresponse()
+            response.read()
+            elapsed = time.perf_counter() - start
+            with lock:
+                durations.append(elapsed)
+                errors[0] += response.status >= 400
+        connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(CONCURRENCY)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return durations, time.perf_counter() - started, errors[0]
+
+
+def bench_gunicorn(app, targets, headers):
+    adapter = app.url_map.bind("localhost")
+    server = start_gunicorn()
+    results = {}
+    try:
+        for name, method, template in ENDPOINTS:
+            endpoint, _ = adapter.match(
+                targets.path(template), method=method
+            )
+
+            def batch(size):
+                return [
+                    (method, targets.url(template), targets.body(method))
+                    for _ in range(size)
+                ]
+
+            run_load(batch(WARMUP), headers)
+            before = scrape_queries().get(endpoint, (0.0, 0.0))
+            durations, elapsed, errors = run_load(batch(REQUESTS), headers)
+            after = scrape_queries().get(endpoint, (0.0, 0.0))
+            count = after[1] - before[1]
+            results[name] = summarize(
+                durations, elapsed, errors,
+                (after[0] - before[0]) / count if count else None
+            )
+            results[name]["route"] = template
+            print_result(name, results[name])
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+def print_result(name, result):
+    print(
+        f"{name:<22}{result['throughput_rps']:>9} req/s  "
+        f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  "
+        f"p99 {result['p99_ms']:>8} ms  "
+        f"{result['queries_per_request']} requêtes SQL"
+        + (f"  {result['errors']} erreurs" if result["errors"] else "")
+    )
+
+
+def compare(results, baseline):
+    """Écarts avec un fichier de référence ; renvoie les routes qui font
+    plus de requêtes SQL qu'avant"""
+    regressions = []
+    print(f"\nComparaison avec {BASELINE} ({baseline['mode']}) :")
+    for name, result in results.items():
+        previous = baseline["endpoints"].get(name)
+        if previous is None:
+            print(f"{name:<22}nouvelle route")
+            continue
+        changes = [
+            f"{key} {previous[key]} -> {result[key]} "
+            f"({(result[key] - previous[key]) / previous[key]:+.0%})"
+            for key in ("throughput_rps", "p95_ms")
+            if previous[key]
+        ]
+        before = previous["queries_per_request"]
+        after = result["queries_per_request"]
+        if before is not None and after is not None:
+            changes.append(f"requêtes SQL {before} -> {after}")
+            if after > before:
+                regressions.append(name)
+        print(f"{name:<22}" + "  ".join(changes))
+    return regressions
+
+
+def bench_endpoints():
+    app = create_app()
+    app.testing = MODE == "client"
+    with app.app_context():
+        db.create_all()
+        if User.query.first() is None:
+            print("Base vide : génération du jeu de données")
+            generate(**settings())
+        rng = random.Random(int(os.environ.get("BENCH_SEED", 42)))
+        targets = Targets(rng)
+        headers = {
+            "Authorization": "Bearer " + create_access_token(
+                identity=str(rng.randint(1, targets.max["user"]))
+            )
+        }
+        database = db.engine.url.get_backend_name()
+        dataset = {
+            "users": targets.max["user"],
+            "tournaments": targets.max["tournament"],
+            "matches": targets.max["match"],
+            "registrations": targets.max["registration"],
+        }
+        print(f"Mode {MODE}, {REQUESTS} requêtes par route, base {dataset}")
+        if MODE == "client":
+            results = bench_client(app, targets, headers)
+        elif MODE == "gunicorn":
+            db.session.remove()
+            results = bench_gunicorn(app, targets, headers)
+        else:
+            raise ValueError(f"BENCH_MODE inconnu : {MODE}")
+
+    report = {
+        "mode": MODE,
+        "database": database,
+        "python": platform.python_version(),
+        "dataset": dataset,
+        "settings": {
+            "requests": REQUESTS,
+            "workers": WORKERS if MODE == "gunicorn" else 1,
+            "threads": THREADS if MODE == "gunicorn" else 1,
+            "concurrency": CONCURRENCY if MODE == "gunicorn" else 1,
+        },
+        "endpoints": results,
+    }
+    with open(OUTPUT, "w") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Résultats écrits dans {OUTPUT}")
+
+    if BASELINE:
+        with open(BASELINE) as f:
+            regressions = compare(results, json.load(f))
+        if regressions:
+            print("Plus de requêtes SQL qu'avant : " + ", ".join(regressions))
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    bench_endpoints()
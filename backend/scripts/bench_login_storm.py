@@ -0,0 +1,96 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Base SQLite temporaire : les threads ont chacun leur connexion
+_db_file = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{_db_file.name}")
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db, passwords
+from app.models import Character, User
+
+LOGIN_THREADS = int(os.environ.get("BENCH_LOGIN_THREADS", 16))
+READ_THREADS = int(os.environ.get("BENCH_READ_THREADS", 4))
+DURATION = float(os.environ.get("BENCH_DURATION", 5))
+ROUNDS = int(os.environ.get("BENCH_BCRYPT_ROUNDS", 10))
+
+
+def percentile(values, ratio):
+    values = sorted(values)
+    return values[min(int(len(values) * ratio), len(values) - 1)] * 1000
+
+
+def run(app, headers, storm):
+    """Lectures pendant `DURATION` secondes, avec ou sans rafale de logins"""
+    stop = threading.Event()
+    latencies, logins, rejected = [], [], []
+
+    def reader():
+        client = app.test_client()
+        while not stop.is_set():
+            start = time.perf_counter()
+            client.get("/api/characters", headers=headers)
+            latencies.append(time.perf_counter() - start)
+
+    def login():
+        client = app.test_client()
+        while not stop.is_set():
+            response = client.post("/api/auth/login", json={
+                "email": "joueur@example.com", "password": "password123"
+            })
+            (logins if response.status_code == 200 else rejected).append(1)
+
+    threads = [threading.Thread(target=reader) for _ in range(READ_THREADS)]
+    if storm:
+        threads += [threading.Thread(target=login) for _ in range(LOGIN_THREADS)]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return latencies, len(logins), len(rejected)
+
+
+def bench_login_storm():
+    app = create_app()
+    app.config["BCRYPT_ROUNDS"] = passwords.rounds = ROUNDS
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add(User(
+            name="Joueur", email="joueur@example.com", password="password123"
+        ))
+        db.session.add(Character(name="Mario", game="Ultimate"))
+        db.session.commit()
+        headers = {
+            "Authorization": f"Bearer {create_access_token(identity='1')}"
+        }
+
+    scenarios = [
+        ("sans logins", False, passwords.workers),
+        ("logins, pool non borné", True, LOGIN_THREADS),
+        (f"logins, pool de {passwords.workers}", True, passwords.workers),
+    ]
+    for label, storm, workers in scenarios:
+        passwords.shutdown()
+        passwords.workers = workers
+        latencies, logins, rejected = run(app, headers, storm)
+        print(
+            f"{label:<24} GET /api/characters : "
+            f"p50 {percentile(latencies, 0.5):.1f} ms, "
+            f"p99 {percentile(latencies, 0.99):.1f} ms "
+            f"({len(latencies)} requêtes) ; "
+            f"logins {logins} réussis, {rejected} refusés"
+        )
+    os.unlink(_db_file.name)
+
+
+if __name__ == '__main__':
+    bench_login_storm()
@@ -0,0 +1,75 @@
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ratings import (
+    PERIOD_DAYS,
+    match_timestamps,
+    rate_period,
+    replay_arrays
+)
+
+MATCHES = int(os.environ.get("BENCH_MATCHES", 1_000_000))
+PLAYERS = int(os.environ.get("BENCH_PLAYERS", 50_000))
+INCREMENTAL_MATCHES = int(os.environ.get("BENCH_INCREMENTAL_MATCHES", 10_000))
+# Part des matchs sans date (générés par l'arbre avant que end_time soit
+# renseigné), rangés en fin d'historique comme dans `replay_ratings`
+UNDATED = float(os.environ.get("BENCH_UNDATED", 0.1))
+DAYS = 365
+
+
+def synthetic_history(matches, players, undated=UNDATED, seed=42):
+    """Historique aléatoire trié chronologiquement sur un an, les matchs
+    sans date (None) à la fin"""
+    rng = np.random.default_rng(seed)
+    winners = rng.integers(0, players, matches)
+    losers = (winners + rng.integers(1, players, matches)) % players
+    dated = matches - int(matches * undated)
+    dates = [
+        datetime.utcfromtimestamp(int(timestamp)) for timestamp in
+        np.sort(rng.integers(0, DAYS * 86400, dated))
+    ]
+    return winners, losers, dates + [None] * (matches - dated)
+
+
+def bench_ratings():
+    winners, losers, dates = synthetic_history(MATCHES, PLAYERS)
+
+    start = time.perf_counter()
+    timestamps = match_timestamps(dates)
+    replay_arrays(winners, losers, timestamps, PLAYERS)
+    batch = time.perf_counter() - start
+    periods = len(np.unique(
+        (timestamps - timestamps[0]) // (PERIOD_DAYS * 86400)
+    ))
+    print(
+        f"Rejeu par périodes : {MATCHES} matchs dont "
+        f"{dates.count(None)} sans date, {PLAYERS} joueurs, {periods} "
+        f"périodes en {batch:.2f} s ({batch / MATCHES * 1e6:.2f} µs/match)"
+    )
+
+    # Chemin incrémental : une période de deux joueurs par match, comme
+    # lors d'un report de résultat (hors accès à la base)
+    mu = np.zeros(2)
+    phi = np.full(2, 350 / 173.7178)
+    sigma = np.full(2, 0.06)
+    winner, loser = np.array([0]), np.array([1])
+    start = time.perf_counter()
+    for _ in range(INCREMENTAL_MATCHES):
+        rate_period(mu, phi, sigma, winner, loser)
+    incremental = time.perf_counter() - start
+    per_match = incremental / INCREMENTAL_MATCHES
+    print(
+        f"Incrémental : {INCREMENTAL_MATCHES} matchs en {incremental:.2f} s "
+        f"({per_match * 1e6:.1f} µs/match, "
+        f"{per_match * MATCHES:.0f} s extrapolé pour {MATCHES} matchs)"
+    )
+
+
+if __name__ == '__main__':
+    bench_ratings()
@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.models import Registration, Tournament, User
+
+ENTRANTS = int(os.environ.get("BENCH_ENTRANTS", 10000))
+CAPACITY = int(os.environ.get("BENCH_CAPACITY", 8192))
+
+
+def seed():
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [
+        {"id": i, "name": f"Joueur {i}", "email": f"joueur{i}@example.com",
+         "password": "x"}
+        for i in range(1, ENTRANTS + 1)
+    ])
+    for _ in range(2):
+        db.session.add(Tournament(
+            name="Grand tournoi",
+            start_date=now + timedelta(days=7),
+            end_date=now + timedelta(days=8),
+            registration_deadline=None,
+            organizer_id=1,
+            max_participants=CAPACITY
+        ))
+    db.session.commit()
+
+
+def csv_body():
+    yield b"email,seed\n"
+    for i in range(1, ENTRANTS + 1):
+        yield f"joueur{i}@example.com,{i}\n".encode()
+    # Lignes en erreur : inconnu, doublon, seed invalide
+    yield b"inconnu@example.com,\n"
+    yield b"joueur1@example.com,\n"
+    yield b"joueur2@example.com,abc\n"
+
+
+def ndjson_body():
+    for i in range(1, ENTRANTS + 1):
+        yield f'{{"email": "joueur{i}@example.com"}}\n'.encode()
+
+
+def bench_registration_import():
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        seed()
+        client = app.test_client()
+        headers = {
+            "Authorization": f"Bearer {create_access_token(identity='1')}"
+        }
+
+        for tournament_id, content_type, body in (
+            (1, "text/csv", csv_body),
+            (2, "application/x-ndjson", ndjson_body),
+        ):
+            start = time.perf_counter()
+            response = client.post(
+                f"/api/tournaments/{tournament_id}/registrations/import",
+                headers=headers, data=b"".join(body()),
+                content_type=content_type
+            )
+            elapsed = time.perf_counter() - start
+            data = response.get_json()
+            assert response.status_code == 200, data
+
+            tournament = db.session.get(Tournament, tournament_id)
+            stored = Registration.query.filter_by(
+                tournament_id=tournament_id
+            ).count()
+            print(
+                f"{content_type:<22} {ENTRANTS} lignes en {elapsed:.2f} s : "
+                f"{data['registered']} inscrits, {data['waiting_list']} en "
+                f"attente, {data['errors']} erreurs ; {stored} en base, "
+                f"compteur {tournament.current_participants}"
+            )
+            assert data['registered'] == tournament.current_participants
+            assert data['registered'] + data['waiting_list'] == stored
+
+
+if __name__ == '__main__':
+    bench_registration_import()
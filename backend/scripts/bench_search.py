@@ -0,0 +1,89 @@
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Base SQLite en mémoire, sauf si une autre base est fournie
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app import create_app, db
+from app.models import User
+from app.search import apply_search
+
+USERS = int(os.environ.get("BENCH_USERS", 1_000_000))
+QUERIES = int(os.environ.get("BENCH_QUERIES", 50))
+CHUNK_SIZE = 50_000
+
+SYLLABLES = [
+    consonant + vowel
+    for consonant in "bdfgjklmnprstvz"
+    for vowel in ("a", "e", "i", "o", "u", "ai", "ou")
+]
+
+
+def random_name(rng):
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        for _ in range(2)
+    ).title()
+
+
+def seed_users(rng):
+    """Insère les joueurs par lots ; les triggers alimentent l'index"""
+    for start in range(0, USERS, CHUNK_SIZE):
+        db.session.execute(User.__table__.insert(), [
+            {
+                "id": i,
+                "name": random_name(rng),
+                "email": f"joueur{i}@example.com",
+                "password": "x",
+            }
+            for i in range(start + 1, min(start + CHUNK_SIZE, USERS) + 1)
+        ])
+    db.session.commit()
+
+
+def timed(queries, build):
+    """Première page et total, comme une route de liste paginée"""
+    durations = []
+    for text in queries:
+        start = time.perf_counter()
+        query = build(text)
+        query.limit(10).all()
+        query.order_by(None).count()
+        durations.append(time.perf_counter() - start)
+    durations.sort()
+    return (
+        durations[len(durations) // 2] * 1000,
+        durations[int(len(durations) * 0.95)] * 1000
+    )
+
+
+def bench_search():
+    rng = random.Random(42)
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        start = time.perf_counter()
+        seed_users(rng)
+        print(
+            f"{USERS} joueurs insérés et indexés en "
+            f"{time.perf_counter() - start:.1f} s"
+        )
+
+        # Saisies partielles, comme dans une barre de recherche
+        queries = [random_name(rng)[:rng.randint(3, 6)] for _ in range(QUERIES)]
+        base = db.session.query(User.id, User.name)
+
+        p50, p95 = timed(queries, lambda text: apply_search(base, User, text))
+        print(f"Index plein texte : p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+        p50, p95 = timed(
+            queries, lambda text: base.filter(User.name.ilike(f"%{text}%"))
+        )
+        print(f"LIKE '%...%'      : p50 {p50:.2f} ms, p95 {p95:.2f} ms")
+
+
+if __name__ == '__main__':
+    bench_search()
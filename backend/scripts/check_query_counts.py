@@ -0,0 +1,136 @@
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Base SQLite en mémoire, sauf si une autre base est fournie
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+# Budgets déclarés par les routes (@query_budget) et détection des N+1
+os.environ["SQL_AUDIT"] = "raise"
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.models import Match, Ranking, Registration, Role, Tournament, User
+from app.sql_audit import QueryAuditError, record_queries
+
+PLAYERS = 60
+
+# Routes de liste : le nombre de requêtes ne doit pas dépendre de per_page
+LIST_ENDPOINTS = [
+    "/api/tournaments",
+    "/api/users",
+    "/api/users/1/tournaments",
+    "/api/users/1/matches",
+    "/api/matches/tournaments/1/matches",
+]
+# Routes vérifiées contre leur budget (@query_budget)
+ENDPOINTS = [
+    "/api/auth/me",
+    "/api/characters",
+    "/api/characters/usage",
+    "/api/tournaments",
+    "/api/tournaments/1",
+    "/api/tournaments/1/registrations",
+    "/api/registrations/1",
+    "/api/users",
+    "/api/users/profile",
+    "/api/users/1",
+    "/api/users/1/tournaments",
+    "/api/users/1/stats",
+    "/api/users/1/matches",
+    "/api/matches/tournaments/1/matches",
+    "/api/matches/matches/1",
+    "/api/rankings",
+    "/api/rankings/ratings",
+    "/api/rankings/ratings/users/1",
+    "/api/rankings/tournaments/1",
+    "/api/rankings/users/1",
+    "/api/search?q=Joueur",
+]
+
+
+def seed():
+    """Jeu de données minimal avec des relations à charger"""
+    now = datetime.utcnow()
+    role = Role(name="joueur")
+    db.session.add(role)
+    db.session.execute(User.__table__.insert(), [
+        {"id": i, "name": f"Joueur {i}", "email": f"joueur{i}@example.com",
+         "password": "x"}
+        for i in range(1, PLAYERS + 1)
+    ])
+    db.session.flush()
+    for user in User.query:
+        user.roles.append(role)
+    for t in range(1, 21):
+        db.session.add(Tournament(
+            name=f"Tournoi {t}",
+            start_date=now,
+            end_date=now + timedelta(days=1),
+            registration_deadline=None,
+            organizer_id=1
+        ))
+    db.session.flush()
+    db.session.execute(Registration.__table__.insert(), [
+        {"user_id": u, "tournament_id": t, "registration_date": now,
+         "status": "confirmed"}
+        for t in range(1, 21) for u in range(1, PLAYERS + 1)
+    ])
+    db.session.execute(Match.__table__.insert(), [
+        {"tournament_id": 1 + i % 20, "player1_id": 1, "player2_id": u,
+         "winner_id": u, "loser_id": 1, "round": 1, "status": "completed"}
+        for i, u in enumerate(range(2, PLAYERS + 1))
+    ])
+    db.session.execute(Ranking.__table__.insert(), [
+        {"tournament_id": t, "user_id": u, "rank": u}
+        for t in range(1, 21) for u in range(1, PLAYERS + 1)
+    ])
+    db.session.commit()
+
+
+def count_queries(client, url, headers):
+    """Nombre de requêtes SQL d'une route ; QueryAuditError si elle dépasse
+    son budget ou fait un N+1"""
+    with record_queries(db.engine) as log:
+        response = client.get(url, headers=headers)
+    assert response.status_code == 200, (url, response.status_code)
+    return len(log)
+
+
+def check_query_counts():
+    app = create_app()
+    app.testing = True
+    failures = []
+    with app.app_context():
+        db.create_all()
+        seed()
+        client = app.test_client()
+        headers = {
+            "Authorization": f"Bearer {create_access_token(identity='1')}"
+        }
+
+        for url in ENDPOINTS:
+            try:
+                count = count_queries(client, url, headers)
+            except QueryAuditError as e:
+                print(f"ÉCHEC {e}")
+                failures.append(url)
+                continue
+            print(f"OK    {url}: {count} requêtes")
+
+        for url in LIST_ENDPOINTS:
+            small = count_queries(client, f"{url}?per_page=5", headers)
+            large = count_queries(client, f"{url}?per_page=50", headers)
+            if small != large:
+                print(f"ÉCHEC {url}: {small} requêtes pour 5, {large} pour 50")
+                failures.append(url)
+
+    if failures:
+        sys.exit(1)
+    print("Nombre de requêtes constant sur toutes les routes de liste")
+
+
+if __name__ == '__main__':
+    check_query_counts()
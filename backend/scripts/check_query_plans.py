@@ -0,0 +1,151 @@
+"""Vérifie qu'aucune route sollicitée ne parcourt une table entière.
+
+Chaque route de scripts/bench_endpoints.py est appelée sur le jeu de
+données de benchmark (généré s'il manque) ; chaque SELECT qu'elle exécute
+est repassé dans EXPLAIN. Le script échoue si un plan parcourt une table :
+- SQLite : toute étape « SCAN <table> », y compris « USING INDEX » ou
+  « USING COVERING INDEX », qui lisent l'index entier. Seules passent les
+  recherches (SEARCH), les parcours par clé primaire entière et les tables
+  virtuelles FTS5 ;
+- MySQL : ligne de type ALL ou index (parcours complet de l'index).
+
+Ne sont pas signalées les tables de référence qui ne grossissent pas avec
+l'activité (PLAN_STATIC_TABLES : personnages, rôles), quelle que soit la
+taille du jeu de données, ni les instructions sans WHERE, qui lisent la
+table volontairement (page non filtrée d'une liste et son total).
+
+    python scripts/generate_dataset.py
+    python scripts/check_query_plans.py
+"""
+import os
+import random
+import re
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/smash_bench.db")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "none")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from app import create_app, db
+from app.models import User
+from bench_endpoints import ENDPOINTS, Targets
+from generate_dataset import generate, settings
+
+STATIC_TABLES = set(
+    os.environ.get("PLAN_STATIC_TABLES", "characters,roles").split(",")
+)
+
+SQLITE_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)")
+
+
+def full_scans_sqlite(connection, statement, parameters):
+    """Tables ou index lus entièrement, d'après EXPLAIN QUERY PLAN"""
+    rows = connection.exec_driver_sql(
+        "EXPLAIN QUERY PLAN " + statement, parameters
+    )
+    scans = []
+    for row in rows:
+        detail = row[-1]
+        match = SQLITE_SCAN.match(detail)
+        if (match and "VIRTUAL TABLE" not in detail and
+                "USING INTEGER PRIMARY KEY" not in detail):
+            scans.append(match.group(1))
+    return scans
+
+
+def full_scans_mysql(connection, statement, parameters):
+    rows = connection.exec_driver_sql("EXPLAIN " + statement, parameters)
+    return [row.table for row in rows if row.type in ("ALL", "index")]
+
+
+EXPLAINERS = {
+    "sqlite": full_scans_sqlite,
+    "mysql": full_scans_mysql,
+}
+
+
+def capture_selects(client, method, url, body, headers):
+    """SELECT exécutés par une requête, avec leurs paramètres"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    # Moteur principal et réplicas : les plans sont lus sur le principal
+    engines = list(db.engines.values())
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", record)
+    try:
+        response = client.open(url, method=method, json=body,
+                               headers=headers)
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", record)
+    return response, statements
+
+
+def check_query_plans():
+    app = create_app()
+    app.testing = True
+    failures = []
+    with app.app_context():
+        backend = db.engine.url.get_backend_name()
+        explain = EXPLAINERS.get(backend)
+        if explain is None:
+            sys.exit(f"EXPLAIN non pris en charge pour {backend}")
+
+        db.create_all()
+        if User.query.first() is None:
+            print("Base vide : génération du jeu de données")
+            generate(**settings())
+        targets = Targets(random.Random(42))
+        client = app.test_client()
+        headers = {
+            "Authorization": "Bearer " + create_access_token(identity="1")
+        }
+
+        for name, method, template in ENDPOINTS:
+            url = targets.url(template)
+            response, statements = capture_selects(
+                client, method, url, targets.body(method), headers
+            )
+            if response.status_code >= 400:
+                print(f"ÉCHEC {name} {url}: statut {response.status_code}")
+                failures.append(name)
+                continue
+            connection = db.session.connection()
+            problems = []
+            for statement, parameters in statements:
+                if " WHERE " not in " ".join(statement.split()).upper():
+                    continue
+                scans = [
+                    table for table in explain(
+                        connection, statement, parameters
+                    )
+                    if table not in STATIC_TABLES
+                ]
+                if scans:
+                    problems.append(
+                        f"  parcours complet de {', '.join(scans)} :\n    "
+                        + " ".join(statement.split())[:300]
+                    )
+            db.session.rollback()
+            if problems:
+                print(f"ÉCHEC {name} {url}\n" + "\n".join(problems))
+                failures.append(name)
+            else:
+                print(f"OK    {name}: {len(statements)} requêtes indexées")
+
+    if failures:
+        sys.exit(1)
+    print("Aucun parcours complet de table sur les routes vérifiées")
+
+
+if __name__ == '__main__':
+    check_query_plans()
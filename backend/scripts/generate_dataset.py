@@ -0,0 +1,274 @@
+"""Jeu de données synthétique à grande échelle pour les benchmarks.
+
+Taille réglée par variables d'environnement :
+DATASET_USERS (joueurs), DATASET_TOURNAMENTS (tournois), DATASET_ENTRANTS
+(inscrits par tournoi), DATASET_MATCHES (matchs au total) et DATASET_SEED.
+Par exemple 1M joueurs, 50k tournois et 5M matchs :
+
+    DATASET_USERS=1000000 DATASET_TOURNAMENTS=50000 DATASET_ENTRANTS=64 \\
+    DATASET_MATCHES=5000000 python scripts/generate_dataset.py
+
+Toutes les tables sont remplies par insertions groupées, par lots de
+CHUNK_SIZE lignes avec un commit par lot. Les classements sont calculés en
+mémoire à partir des matchs générés ; le leaderboard et les statistiques de
+personnages sont reconstruits à la fin. Les cotes Glicko-2 ne sont pas
+calculées (scripts/replay_ratings.py). Le jeu est reproductible : même
+graine, mêmes données.
+"""
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/smash_bench.db")
+
+from app import create_app, db, passwords
+from app.models import (
+    Character, Match, Ranking, Registration, Role, Tournament, User
+)
+from app.models.character import match_characters
+from app.models.user import user_role
+from app.services.character_usage import rebuild_character_usage
+from app.services.leaderboard import rebuild_leaderboard
+
+CHUNK_SIZE = 50_000
+
+# Mot de passe de tous les joueurs générés (connexion dans les benchmarks)
+PASSWORD = "benchmark"
+
+FORMATS = ("single_elimination", "double_elimination", "round_robin")
+STATUSES = ("pending", "ongoing", "completed", "completed", "completed")
+CHARACTERS = 80
+
+SYLLABLES = [
+    consonant + vowel
+    for consonant in "bdfgjklmnprstvz"
+    for vowel in ("a", "e", "i", "o", "u", "ai", "ou")
+]
+
+
+def settings():
+    return {
+        "users": int(os.environ.get("DATASET_USERS", 10_000)),
+        "tournaments": int(os.environ.get("DATASET_TOURNAMENTS", 500)),
+        "entrants": int(os.environ.get("DATASET_ENTRANTS", 32)),
+        "matches": int(os.environ.get("DATASET_MATCHES", 20_000)),
+        "seed": int(os.environ.get("DATASET_SEED", 42)),
+    }
+
+
+def random_name(rng):
+    return " ".join(
+        "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4)))
+        for _ in range(2)
+    ).title()
+
+
+def insert_chunks(table, rows):
+    """Insère un itérable de lignes par lots de CHUNK_SIZE"""
+    count, chunk = 0, []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            db.session.execute(table.insert(), chunk)
+            db.session.commit()
+            count += len(chunk)
+            chunk = []
+    if chunk:
+        db.session.execute(table.insert(), chunk)
+        db.session.commit()
+        count += len(chunk)
+    return count
+
+
+def user_rows(rng, count, password):
+    now = datetime.utcnow()
+    for i in range(1, count + 1):
+        yield {
+            "id": i,
+            "name": random_name(rng),
+            "email": f"joueur{i}@example.com",
+            "password": password,
+            "registration_date": now - timedelta(minutes=i),
+            "country": "France",
+            "is_active": True,
+        }
+
+
+def tournament_rows(rng, count, users, entrants):
+    start = datetime.utcnow() - timedelta(days=count // 50)
+    for i in range(1, count + 1):
+        date = start + timedelta(hours=i)
+        yield {
+            "id": i,
+            "name": f"{random_name(rng)} Open #{i}",
+            "description": "Tournoi généré pour les benchmarks",
+            "start_date": date,
+            "end_date": date + timedelta(days=1),
+            "registration_deadline": None,
+            "max_participants": entrants,
+            "current_participants": entrants,
+            "status": rng.choice(STATUSES),
+            "format": rng.choice(FORMATS),
+            "organizer_id": rng.randint(1, users),
+            "created_at": date,
+            "updated_at": date,
+        }
+
+
+def generate(users, tournaments, entrants, matches, seed=42, log=print):
+    """Remplit la base (supposée vide) et renvoie le nombre de lignes par
+    table"""
+    rng = random.Random(seed)
+    entrants = min(entrants, users)
+    per_tournament = matches // tournaments if tournaments else 0
+    counts = {}
+
+    def step(name, function):
+        start = time.perf_counter()
+        counts[name] = function()
+        log(f"{name:<18}{counts[name]:>10} lignes en "
+            f"{time.perf_counter() - start:.1f} s")
+
+    # Un seul hash pour tous les joueurs : bcrypt n'est pas mesuré ici
+    password = passwords.hash(PASSWORD)
+    step("users", lambda: insert_chunks(
+        User.__table__, user_rows(rng, users, password)
+    ))
+
+    role = Role(name="joueur", description="Joueur participant aux tournois")
+    admin = Role(name="admin", description="Administrateur du système")
+    db.session.add_all([role, admin])
+    db.session.commit()
+    step("user_roles", lambda: insert_chunks(user_role, (
+        {"user_id": i, "role_id": admin.id if i == 1 else role.id}
+        for i in range(1, users + 1)
+    )))
+
+    step("characters", lambda: insert_chunks(Character.__table__, (
+        {"id": i, "name": f"Personnage {i}",
+         "game": "Ultimate" if i % 4 else "Melee"}
+        for i in range(1, CHARACTERS + 1)
+    )))
+
+    step("tournaments", lambda: insert_chunks(
+        Tournament.__table__,
+        tournament_rows(rng, tournaments, users, entrants)
+    ))
+
+    # Inscrits, matchs et classements tournoi par tournoi
+    fields = {}
+
+    def registrations():
+        now = datetime.utcnow()
+        for tournament_id in range(1, tournaments + 1):
+            players = rng.sample(range(1, users + 1), entrants)
+            fields[tournament_id] = players
+            for seed_number, user_id in enumerate(players, start=1):
+                yield {
+                    "user_id": user_id,
+                    "tournament_id": tournament_id,
+                    "registration_date": now,
+                    "status": "confirmed",
+                    "seed": seed_number,
+                }
+
+    step("registrations", lambda: insert_chunks(
+        Registration.__table__, registrations()
+    ))
+
+    results = {}
+    picks = []
+
+    def match_rows():
+        match_id = 0
+        pairs = max(entrants // 2, 1)
+        for tournament_id in range(1, tournaments + 1):
+            players = fields[tournament_id]
+            wins = results.setdefault(tournament_id, {})
+            for k in range(per_tournament):
+                match_id += 1
+                player1, player2 = rng.sample(players, 2)
+                done = k < per_tournament * 9 // 10
+                winner = loser = None
+                if done:
+                    winner, loser = rng.sample((player1, player2), 2)
+                    wins.setdefault(winner, [0, 0])[0] += 1
+                    wins.setdefault(loser, [0, 0])[1] += 1
+                    # Un personnage par joueur dans les matchs terminés
+                    first, second = rng.sample(range(1, CHARACTERS + 1), 2)
+                    picks.append((match_id, first, player1))
+                    picks.append((match_id, second, player2))
+                yield {
+                    "id": match_id,
+                    "tournament_id": tournament_id,
+                    "player1_id": player1,
+                    "player2_id": player2,
+                    "winner_id": winner,
+                    "loser_id": loser,
+                    "score": "2-1" if winner is not None else None,
+                    "round": 1 + k // pairs,
+                    "bracket_position": k + 1,
+                    "status": "completed" if done else "pending",
+                }
+
+    step("matches", lambda: insert_chunks(Match.__table__, match_rows()))
+    step("match_characters", lambda: insert_chunks(match_characters, (
+        {"match_id": match_id, "character_id": character_id,
+         "player_id": player_id}
+        for match_id, character_id, player_id in picks
+    )))
+    picks.clear()
+
+    def ranking_rows():
+        for tournament_id in range(1, tournaments + 1):
+            totals = results.get(tournament_id, {})
+            standings = sorted(
+                (
+                    -(won * Ranking.WIN_POINTS + lost * Ranking.LOSS_POINTS),
+                    user_id, won, lost
+                )
+                for user_id in fields[tournament_id]
+                for won, lost in [totals.get(user_id, (0, 0))]
+            )
+            for rank, (points, user_id, won, lost) in enumerate(
+                standings, start=1
+            ):
+                yield {
+                    "tournament_id": tournament_id,
+                    "user_id": user_id,
+                    "rank": rank,
+                    "points": -points,
+                    "matches_played": won + lost,
+                    "matches_won": won,
+                    "matches_lost": lost,
+                }
+
+    step("rankings", lambda: insert_chunks(
+        Ranking.__table__, ranking_rows()
+    ))
+    fields.clear()
+    results.clear()
+
+    step("leaderboard", rebuild_leaderboard)
+    step("character_usage", rebuild_character_usage)
+    return counts
+
+
+def main():
+    config = settings()
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        start = time.perf_counter()
+        generate(**config)
+        print(f"Jeu de données généré en {time.perf_counter() - start:.1f} s "
+              f"({config})")
+
+
+if __name__ == '__main__':
+    main()
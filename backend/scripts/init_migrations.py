@@ -18,9 +18,14 @@ def init_migrations():
         if not os.path.exists('migrations'):
             os.makedirs('migrations')
 
-        # Initialisation des migrations
+        # Initialisation des migrations (le dossier est versionné avec ses
+        # révisions : ne le recréer que s'il manque)
         from flask_migrate import init, migrate, upgrade
-        init()
+        if not os.path.exists(os.path.join('migrations', 'env.py')):
+            init()
+        # La base doit être à jour des révisions existantes avant de
+        # générer la suivante
+        upgrade()
         migrate()
         upgrade()
 
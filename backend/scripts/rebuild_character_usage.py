@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.character_usage import rebuild_character_usage
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        count = rebuild_character_usage()
+        print(f"Statistiques des personnages reconstruites : {count} personnages joués")
+
+
+if __name__ == '__main__':
+    main()
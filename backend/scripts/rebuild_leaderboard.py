@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.leaderboard import rebuild_leaderboard
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        count = rebuild_leaderboard()
+        print(f"Classement global reconstruit : {count} joueurs")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,18 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.search import rebuild_search_index
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        rebuild_search_index()
+        print("Index de recherche reconstruit")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.ratings import replay_ratings
+
+
+def main():
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        players, matches = replay_ratings()
+        elapsed = time.perf_counter() - start
+        print(
+            f"Classement Glicko-2 recalculé : {matches} matchs, "
+            f"{players} joueurs en {elapsed:.2f} s"
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+"""Test de charge du pool de connexions face à une coupure de la base.
+
+STRESS_THREADS threads appellent en continu des routes de lecture pendant
+STRESS_SECONDS secondes. À mi-parcours, toutes les connexions inactives du
+pool sont fermées côté pilote, comme après un redémarrage du serveur MySQL
+ou un wait_timeout dépassé. Le script compare les latences avant et après
+la coupure et échoue si une requête a échoué ou si le p95 après coupure
+dépasse STRESS_MAX_RATIO fois (3) celui d'avant.
+
+Avec DB_POOL_PRE_PING=true (défaut), chaque connexion coupée est remplacée
+à l'emprunt, sans erreur visible. Pour voir l'effet inverse :
+
+    DB_POOL_PRE_PING=false python scripts/stress_pool.py
+
+La base de benchmark est générée si elle est vide (voir
+scripts/generate_dataset.py).
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("DATABASE_URL", "sqlite:////tmp/smash_bench.db")
+os.environ.setdefault("RESPONSE_CACHE_BACKEND", "none")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+from flask_jwt_extended import create_access_token
+
+from app import create_app, db
+from app.database import warm_up
+from app.metrics import POOL_INVALIDATED, POOL_OPENED, pool_stats
+from app.models import User
+from bench_endpoints import Targets, percentile
+from generate_dataset import generate, settings
+
+THREADS = int(os.environ.get("STRESS_THREADS", 8))
+SECONDS = float(os.environ.get("STRESS_SECONDS", 6))
+MAX_RATIO = float(os.environ.get("STRESS_MAX_RATIO", 3))
+
+ROUTES = [
+    "/api/tournaments?per_page=20",
+    "/api/tournaments/{tournament}",
+    "/api/users/{user}",
+    "/api/users/{user}/matches",
+    "/api/matches/matches/{match}",
+]
+
+
+def drop_connections(engine):
+    """Ferme les connexions inactives du pool sans prévenir SQLAlchemy"""
+    dropped = 0
+    for record in list(engine.pool._pool.queue):
+        if record.dbapi_connection is not None:
+            record.dbapi_connection.close()
+            dropped += 1
+    return dropped
+
+
+def counter_value(counter):
+    return sum(
+        sample.value for metric in counter.collect()
+        for sample in metric.samples if sample.name.endswith("_total")
+    )
+
+
+def worker(app, urls, headers, stop, dropped_at, samples, errors):
+    client = app.test_client()
+    rng = random.Random()
+    while not stop.is_set():
+        url = rng.choice(urls)
+        start = time.perf_counter()
+        try:
+            status = client.get(url, headers=headers).status_code
+        except Exception as error:
+            status = type(error).__name__
+        now = time.perf_counter()
+        phase = "après" if dropped_at and start >= dropped_at[0] else "avant"
+        if status != 200:
+            errors.append((phase, url, status))
+        else:
+            samples[phase].append(now - start)
+
+
+def stress_pool():
+    app = create_app()
+    app.testing = True
+    with app.app_context():
+        engine = db.engine
+        if pool_stats(engine) is None:
+            sys.exit(f"Pas de pool à tester pour {engine.url}")
+        db.create_all()
+        if User.query.first() is None:
+            print("Base vide : génération du jeu de données")
+            generate(**settings())
+        targets = Targets(random.Random(42))
+        urls = [targets.url(route) for _ in range(50) for route in ROUTES]
+        headers = {
+            "Authorization": "Bearer " + create_access_token(identity="1")
+        }
+        db.session.remove()
+
+    print(f"Pré-ping : {engine.pool._pre_ping}")
+    print(f"Préchauffage : {warm_up(app)}")
+    opened = counter_value(POOL_OPENED)
+    invalidated = counter_value(POOL_INVALIDATED)
+
+    stop = threading.Event()
+    dropped_at = []
+    samples = {"avant": [], "après": []}
+    errors = []
+    threads = [
+        threading.Thread(
+            target=worker,
+            args=(app, urls, headers, stop, dropped_at, samples, errors),
+        )
+        for _ in range(THREADS)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(SECONDS / 2)
+    dropped_at.append(time.perf_counter())
+    print(f"Coupure : {drop_connections(engine)} connexions fermées")
+    time.sleep(SECONDS / 2)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    for phase, durations in samples.items():
+        durations.sort()
+        if not durations:
+            continue
+        print(
+            f"{phase:>6} : {len(durations)} requêtes, "
+            f"p50 {percentile(durations, 0.50) * 1000:.2f} ms, "
+            f"p95 {percentile(durations, 0.95) * 1000:.2f} ms, "
+            f"p99 {percentile(durations, 0.99) * 1000:.2f} ms"
+        )
+    print(
+        f"Connexions ouvertes : "
+        f"{counter_value(POOL_OPENED) - opened:.0f}, invalidées : "
+        f"{counter_value(POOL_INVALIDATED) - invalidated:.0f}"
+    )
+    print(f"Pool : {pool_stats(engine)}")
+
+    failed = False
+    if errors:
+        print(f"{len(errors)} requêtes en erreur, par exemple :")
+        for phase, url, status in errors[:5]:
+            print(f"  {phase} {url}: {status}")
+        failed = True
+    if not samples["avant"] or not samples["après"]:
+        print("Aucune requête réussie avant ou après la coupure")
+        failed = True
+    elif (percentile(samples["après"], 0.95) >
+          percentile(samples["avant"], 0.95) * MAX_RATIO):
+        print(f"p95 après coupure au-delà de {MAX_RATIO} fois celui d'avant")
+        failed = True
+    if failed:
+        sys.exit(1)
+    print("Latence stable malgré la coupure des connexions")
+
+
+if __name__ == '__main__':
+    stress_pool()
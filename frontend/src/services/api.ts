@@ -50,6 +50,21 @@ api.interceptors.response.use(
   }
 );
 
+const TOURNAMENT_LIST_FIELDS = [
+  'id',
+  'name',
+  'description',
+  'start_date',
+  'end_date',
+  'registration_deadline',
+  'max_participants',
+  'current_participants',
+  'status',
+  'format',
+  'prize_pool',
+  'organizer',
+];
+
 export const getTournaments = async (params: {
   page?: number;
   per_page?: number;
@@ -62,6 +77,8 @@ export const getTournaments = async (params: {
     if (params.per_page) queryParams.append('per_page', params.per_page.toString());
     if (params.search) queryParams.append('search', params.search);
     if (params.status && params.status !== 'all') queryParams.append('status', params.status);
+    // Le résumé par défaut n'inclut pas les textes longs affichés dans la liste
+    queryParams.append('fields', TOURNAMENT_LIST_FIELDS.join(','));
 
     const response = await api.get(`/tournaments?${queryParams.toString()}`);
 